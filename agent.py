@@ -2,53 +2,165 @@
 """
 Core AI agent module integrating memory management and search functionality.
 """
+import contextlib
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import ollama
 from colorama import Fore, Style
 
 from memory import HybridMemory
+from intent import IntentClassifier
 from search import SearchEngine
 from utils import get_limited_msgs
-from config import MODEL_NAME, OLLAMA_COMMON_OPTIONS, KEEP_ALIVE
+from context import build_context, format_report, estimate_tokens, PrefixLayout, MSG_OVERHEAD
+from rank import rank_docs, tokenize, parse_doc
+from tracing import tracer
+from config import (
+    MODEL_NAME, OLLAMA_COMMON_OPTIONS, KEEP_ALIVE, CONTEXT_HISTORY_MAX_MSGS, RANK_DOCS,
+    PIPELINED_SEARCH, PREFETCH_MATCH_THRESHOLD, TRACE_ENABLED, TRACE_PRINT_SUMMARY, CONTEXT_WINDOW,
+    CONTEXT_RESPONSE_RESERVE, PROGRESSIVE_ANSWER, PROGRESSIVE_MIN_DOCS, PROGRESSIVE_DEADLINE,
+    PROGRESSIVE_LATE_WAIT, PROGRESSIVE_REFINE, PROGRESSIVE_REFINE_MIN_SHARE, PROGRESSIVE_REFINE_MAX_TOKENS,
+    MEMORY_RECALL, MEMORY_COMPACTION, CONTEXT_LAYOUT,
+)
+
+# System prompt to guide assistant behavior (kept byte-identical across turns: it heads every prompt)
+SYSTEM_PROMPT = (
+    "You are a professional and helpful AI assistant. Answer based on the following principles:\n"
+    "1. Prefer using your own knowledge and conversation history to answer.\n"
+    "2. If [Live references] are provided, prioritize extracting information from them for facts, data, or recent information.\n"
+    "3. If references conflict with internal knowledge, prefer the references and cite sources.\n"
+    "4. Keep answers concise and accurate; avoid redundancy.\n"
+    "5. If references are insufficient to answer, state that you can only answer based on known information.\n"
+    "6. Avoid mentioning you are an AI model; do not say you don't know the source—integrate and answer directly.\n"
+)
+
+INTENT_REQUIREMENTS = (
+    "Requirements:\n"
+    "1. Decide whether a live web search is needed for facts or specific references.\n"
+    "2. Extract search keywords: combine with historical context and replace vague pronouns (e.g., 'he', 'that event', 'this person') with concrete entity names.\n"
+    "3. Keywords should be concise and precise, suitable for search engines.\n"
+    "4. If no search is needed, the keywords may be an empty string \"\".\n\n"
+    "Return strictly in the following JSON format with no extra characters:\n"
+    "{\"search\": true/false, \"keywords\": \"optimized keywords\"}"
+)
+
+REFINE_PROMPT = (
+    "More [Live references] arrived after you wrote the answer above; they are included in the earlier message. "
+    "Rewrite the answer: correct anything the new references contradict and add facts they provide. "
+    "Output only the revised answer."
+)
 
 class ChatAgent:
-    def __init__(self):
-        self.memory = HybridMemory()
-        self.searcher = SearchEngine()
-
-    def analyze_intent(self, current_query):
-        """Intent analysis: use a limited window of history to analyze and rewrite search keywords"""
-        full_history = self.memory.get_full_history()
-        limited_history = get_limited_msgs(full_history)
-        
-        # exclude system prompts, keep only actual conversation
-        history_for_prompt = []
-        for msg in limited_history:
-            if msg['role'] != 'system':
-                history_for_prompt.append(f"{msg['role']}: {msg['content']}")
-        history_text = "\n".join(history_for_prompt)
+    def __init__(self, memory=None, searcher=None):
+        self.memory = memory or HybridMemory()
+        self.searcher = searcher or SearchEngine()
+        self.cache_mode = "use"  # search cache: "use" | "refresh" | "bypass" (toggled with /cache)
+        self.intent = IntentClassifier()
+        self.on_token = None  # callback(label, text) per streamed chunk (server mode)
+        self.session = None   # server session id, recorded on this agent's trace spans
+        self.trace = None     # TurnTrace of the latest turn
+        self.echo = True      # print streamed answers to the terminal
+        self.llm_gate = contextlib.nullcontext()  # held around every Ollama request (server admission queue)
+        self.layout = PrefixLayout()  # history segment kept stable across turns (CONTEXT_LAYOUT = "prefix")
+        # Ollama's prompt_eval_count/duration totals next to our own (estimated) prompt size; Ollama does not
+        # report the full prompt length, so the KV-cache share derived from the two is an estimate
+        self.prefill = {'calls': 0, 'prompt_tokens_est': 0, 'prompt_eval_count': 0, 'seconds': 0.0}
+
+    def prompt_prefix(self):
+        """Prefix layout: the stable leading messages shared by the intent and answer requests. Returns (msgs, report)."""
+        pinned, rows = self.memory.get_recent_rows(CONTEXT_HISTORY_MAX_MSGS)
+        digest = self.memory.digest() if MEMORY_COMPACTION else ""
+        return self.layout.prefix(SYSTEM_PROMPT, pinned, rows, digest)
+
+    def pack_context(self, question, docs, recalled, budget=None):
+        """The answer prompt in the configured CONTEXT_LAYOUT. Returns (msgs, report)."""
+        if CONTEXT_LAYOUT == "prefix":
+            prefix, report = self.prompt_prefix()
+            return self.layout.build(prefix, report, docs, question, budget=budget, recalled=recalled)
+        history = self.memory.get_recent_history(CONTEXT_HISTORY_MAX_MSGS)
+        digest = self.memory.digest() if MEMORY_COMPACTION else ""
+        return build_context(SYSTEM_PROMPT, history, docs, question, budget=budget, recalled=recalled, digest=digest)
+
+    def record_prefill(self, span, res, msgs):
+        """Keep Ollama's prompt_eval_count/duration of a request next to the estimated prompt size."""
+        count, duration = res.get('prompt_eval_count'), res.get('prompt_eval_duration')
+        span['prompt_eval_count'] = count
+        span['prompt_eval_duration'] = duration
+        span['prompt_tokens_est'] = prompt = sum(estimate_tokens(m['content']) + MSG_OVERHEAD for m in msgs)
+        if count is None:
+            return
+        self.prefill['calls'] += 1
+        self.prefill['prompt_tokens_est'] += prompt
+        self.prefill['prompt_eval_count'] += count
+        self.prefill['seconds'] += (duration or 0) / 1e9
+        tracer.record("llm.prefill", (duration or 0) / 1e9, tokens=count, prompt_tokens=prompt)
+
+    def prefill_stats_text(self):
+        """Ollama's prefill totals; the KV-cache share compares them with the estimated prompt size."""
+        p = self.prefill
+        if not p['calls']:
+            return "no requests yet"
+        estimate, evaluated = p['prompt_tokens_est'], p['prompt_eval_count']
+        if estimate and evaluated <= estimate:
+            reused = f"est. {1 - evaluated / estimate:.0%} from KV cache"
+        else:
+            reused = "KV-cache share unknown: the prompt estimate is below Ollama's count"
+        return (f"{CONTEXT_LAYOUT} layout | {p['calls']} requests | Ollama prefilled {evaluated:,} tokens "
+                f"in {p['seconds']:.1f}s | prompt est. ~{estimate:,} tokens ({reused}) | "
+                f"{self.layout.resets} prefix resets")
+
+    def analyze_intent(self, current_query, force_search=False):
+        """
+        Intent analysis: use a limited window of history to analyze and rewrite search keywords.
+        force_search: keywords are needed regardless of the decision (/s), so a no-search shortcut is not taken.
+        """
+        # only the rows get_limited_msgs keeps are read from the memory journal
+        limited_history = get_limited_msgs(self.memory.get_recent_history())
+
+        # obvious cases are decided locally; the LLM prompt is only built when the fast path is unsure
+        with tracer.span("intent.fast") as span:
+            decision = self.intent.fast_path(current_query, limited_history)
+            if decision and force_search and not decision[1]:
+                decision = None
+            span['tier'] = decision[2] if decision else "none"
+        if decision:
+            need_search, keywords, tier, reason = decision
+            print(f"{Fore.BLUE}>> ⚡ Intent decided by {tier} ({reason}): "
+                  f"{'search' if need_search else 'no search'}{Style.RESET_ALL}")
+            return need_search, keywords
         
-        prompt = (
-            f"You are a search expert. Your task is to analyze the conversation history and extract the most suitable search keywords for the user's question.\n\n"
-            f"Conversation history:\n{history_text}\n"
-            f"User current input: {current_query}\n\n"
-            f"Requirements:\n"
-            f"1. Decide whether a live web search is needed for facts or specific references.\n"
-            f"2. Extract search keywords: combine with historical context and replace vague pronouns (e.g., 'he', 'that event', 'this person') with concrete entity names.\n"
-            f"3. Keywords should be concise and precise, suitable for search engines.\n"
-            f"4. If no search is needed, the keywords may be an empty string \"\".\n\n"
-            f"Return strictly in the following JSON format with no extra characters:\n"
-            f"{{\"search\": true/false, \"keywords\": \"optimized keywords\"}}"
-        )
+        if CONTEXT_LAYOUT == "prefix":
+            # same leading messages as the answer request, so the intent call warms the KV cache for it
+            messages = self.prompt_prefix()[0] + [{'role': 'user', 'content': (
+                f"Act as a search expert for the conversation above: decide whether the user's next input needs a live web search "
+                f"and extract the most suitable search keywords for it.\n"
+                f"User current input: {current_query}\n\n" + INTENT_REQUIREMENTS)}]
+        else:
+            # exclude system prompts, keep only actual conversation
+            history_for_prompt = []
+            for msg in limited_history:
+                if msg['role'] != 'system':
+                    history_for_prompt.append(f"{msg['role']}: {msg['content']}")
+            history_text = "\n".join(history_for_prompt)
+
+            prompt = (
+                f"You are a search expert. Your task is to analyze the conversation history and extract the most suitable search keywords for the user's question.\n\n"
+                f"Conversation history:\n{history_text}\n"
+                f"User current input: {current_query}\n\n" + INTENT_REQUIREMENTS
+            )
+            messages = [{'role': 'user', 'content': prompt}]
         try:
             print(f"{Fore.BLUE}>> 🤖 Analyzing context and rewriting search keywords...{Style.RESET_ALL}")
-            res = ollama.chat(
-                model=MODEL_NAME, 
-                messages=[{'role':'user', 'content':prompt}], 
-                format='json',
-                keep_alive=KEEP_ALIVE,
-                options=OLLAMA_COMMON_OPTIONS
-            )
+            with self.llm_gate, tracer.span("intent", model=MODEL_NAME) as span:
+                res = ollama.chat(
+                    model=MODEL_NAME, 
+                    messages=messages, 
+                    format='json',
+                    keep_alive=KEEP_ALIVE,
+                    options=OLLAMA_COMMON_OPTIONS
+                )
+                self.record_prefill(span, res, messages)
             data = json.loads(res['message']['content'])
             
             # Regardless of whether the model returns search True/False, use keywords if present
@@ -57,122 +169,276 @@ class ChatAgent:
             if not isinstance(keywords, str): # prevent model returning non-string types
                 keywords = current_query 
             
+            self.intent.remember(current_query, limited_history, data.get('search', False), keywords)
             return data.get('search', False), keywords
         except Exception as e:
             print(f"{Fore.RED}>> ⚠️ Intent analysis error: {e}. Falling back to original input and defaulting to no search.{Style.RESET_ALL}")
             return False, current_query
 
+    def analyze_with_prefetch(self, current_query, force_search=False):
+        """
+        Pipelined mode: run analyze_intent in a worker thread while the SERP for the raw input is fetched
+        here (Playwright must stay on this thread). The prefetch stops paginating as soon as the model
+        says no search is needed. Returns (need_search, keywords, reusable links or None).
+        """
+        timing = {}
+
+        def timed_intent():
+            t0 = time.perf_counter()
+            try:
+                return self.analyze_intent(current_query, force_search)
+            finally:
+                timing['intent'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(tracer.bind(timed_intent))
+            no_search = lambda: not force_search and future.done() and not future.result()[0]
+            print(f"{Fore.LIGHTBLACK_EX}   ⏩ Speculative search on raw input while analyzing intent...{Style.RESET_ALL}")
+            links = self.searcher.prefetch_links(current_query, cache_mode=self.cache_mode, should_stop=no_search)
+            timing['prefetch'] = time.perf_counter() - t0
+            need_search, kw = future.result()
+        elapsed = time.perf_counter() - t0
+        need_search = need_search or force_search
+
+        # Reuse the speculative links only if the rewritten keywords are close to the raw input
+        a, b = set(tokenize(kw)), set(tokenize(current_query))
+        similarity = len(a & b) / len(a | b) if a and b else 0.0
+        reused = bool(need_search and kw and links and similarity >= PREFETCH_MATCH_THRESHOLD)
+        if reused:
+            # Sequential would have cost intent + SERP; pipelined costs the longer of the two
+            note = f"reused (similarity {similarity:.2f}), saved ~{timing['intent'] + timing['prefetch'] - elapsed:.1f}s"
+        elif not need_search:
+            note = "discarded (no search needed)"
+        else:
+            note = f"discarded (similarity {similarity:.2f} < {PREFETCH_MATCH_THRESHOLD})"
+        print(f"{Fore.LIGHTBLACK_EX}   ⏱️ intent {timing['intent']:.1f}s | prefetch {timing['prefetch']:.1f}s | "
+              f"stage {elapsed:.1f}s | speculative links {note}{Style.RESET_ALL}")
+        return need_search, kw, (links if reused else None)
+
+    def stream_answer(self, msgs, span_name="llm.generate", label="AI", max_tokens=None):
+        """Stream the answer to the terminal; records time-to-first-token and generation speed."""
+        options = OLLAMA_COMMON_OPTIONS if not max_tokens else {**OLLAMA_COMMON_OPTIONS, 'num_predict': max_tokens}
+        ttft_name = "llm.ttft" if span_name == "llm.generate" else f"{span_name}.ttft"
+        with self.llm_gate, tracer.span(span_name, model=MODEL_NAME) as span:
+            t0 = time.perf_counter()
+            stream = ollama.chat(
+                model=MODEL_NAME, 
+                messages=msgs, 
+                stream=True, 
+                options=options,
+                keep_alive=KEEP_ALIVE
+            )
+            
+            if self.echo:
+                print(f"{Fore.MAGENTA}{label}: {Style.RESET_ALL}", end="", flush=True)
+            full = ""
+            first_token = None
+            chunks = 0
+            for chunk in stream:
+                c = chunk['message']['content']
+                if c and first_token is None:
+                    first_token = time.perf_counter() - t0
+                    tracer.record(ttft_name, first_token, model=MODEL_NAME)
+                if self.echo:
+                    print(c, end="", flush=True)
+                if c and self.on_token:
+                    self.on_token(label, c)
+                full += c
+                chunks += 1
+                if chunk.get('done'):
+                    # Ollama's final chunk carries token counts and durations in nanoseconds
+                    for key in ('eval_count', 'eval_duration'):
+                        span[key] = chunk.get(key)
+                    self.record_prefill(span, chunk, msgs)
+            if self.echo:
+                print("\n" + "-"*50)
+
+            generating = time.perf_counter() - t0 - (first_token or 0)
+            if span.get('eval_count') and span.get('eval_duration'):
+                span['tokens_per_s'] = round(span['eval_count'] / (span['eval_duration'] / 1e9), 1)
+            elif generating > 0:
+                span['tokens_per_s'] = round(chunks / generating, 1)  # one chunk per token when streaming
+            span['ttft_ms'] = round((first_token or 0) * 1000, 1)
+        return full
+
+    def refine_answer(self, recalled, docs, kw, question, draft):
+        """
+        Progressive mode: collect the pages that finished while the draft was streaming and, when they make up
+        at least PROGRESSIVE_REFINE_MIN_SHARE of the re-ranked references, revise the draft in one bounded pass.
+        Returns the answer to keep (the draft or its revision).
+        """
+        late = self.searcher.collect_late(PROGRESSIVE_LATE_WAIT)
+        if not late:
+            return draft
+        if not PROGRESSIVE_REFINE:
+            print(f"{Fore.LIGHTBLACK_EX}   ⏩ {len(late)} late pages cached for later questions (refinement off){Style.RESET_ALL}")
+            return draft
+
+        with tracer.span("rank", late=len(late)):
+            ranked = rank_docs(docs + late, kw) if RANK_DOCS else docs + late
+        late_urls = {parse_doc(d)[1] for d in late}
+        share = sum(len(d) for d in ranked if parse_doc(d)[1] in late_urls) / (sum(len(d) for d in ranked) or 1)
+        if share < PROGRESSIVE_REFINE_MIN_SHARE:
+            print(f"{Fore.LIGHTBLACK_EX}   ⏩ {len(late)} late pages add {share:.0%} of the references "
+                  f"(< {PROGRESSIVE_REFINE_MIN_SHARE:.0%}); keeping the draft{Style.RESET_ALL}")
+            return draft
+
+        # the draft and the revision request are added after the packed prompt, so keep room for them
+        budget = (CONTEXT_WINDOW - CONTEXT_RESPONSE_RESERVE - estimate_tokens(draft) - estimate_tokens(REFINE_PROMPT) - 8)
+        msgs, report = self.pack_context(question, ranked, recalled, budget=budget)
+        msgs.append({'role': 'assistant', 'content': draft})
+        msgs.append({'role': 'user', 'content': REFINE_PROMPT})
+        print(f"\n{Fore.BLUE}🔁 {len(late)} late pages add {share:.0%} of the references, revising the answer...{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}   🧮 Context: {format_report(report)}{Style.RESET_ALL}")
+        revised = self.stream_answer(msgs, span_name="llm.refine", label="AI (revised)",
+                                     max_tokens=PROGRESSIVE_REFINE_MAX_TOKENS)
+        return revised.strip() or draft
+
+    def print_stats(self):
+        """/stats: per-span latency table for this session plus search and cache counters."""
+        print(f"{Fore.CYAN}{tracer.summary_table()}{Style.RESET_ALL}")
+        if self.trace and self.trace.spans:
+            print(f"{Fore.LIGHTBLACK_EX}Last turn: {tracer.turn_summary(self.trace)}{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}Deep-read paths: {self.searcher.fetch_stats}{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}Browser: {self.searcher.browser_stats_text()}{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}Search providers: {self.searcher.providers.stats_text()}{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}Intent tiers: {self.intent.stats_text()}{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}Prefill: {self.prefill_stats_text()}{Style.RESET_ALL}")
+        print(f"{Fore.LIGHTBLACK_EX}Memory compaction: {self.memory.compaction_stats()}{Style.RESET_ALL}")
+        if self.searcher.cache is not None:
+            print(f"{Fore.LIGHTBLACK_EX}Search cache: {self.searcher.cache.stats_text()}{Style.RESET_ALL}")
+        if TRACE_ENABLED:
+            print(f"{Fore.LIGHTBLACK_EX}Trace file: {tracer.path}{Style.RESET_ALL}")
+
+    def handle_cache_command(self, arg):
+        """/cache [on|off|refresh|clear]: switch the search cache mode or clear it; no argument shows stats."""
+        cache = self.searcher.cache
+        if cache is None:
+            print(f"{Fore.LIGHTBLACK_EX}Search cache is disabled in config (SEARCH_CACHE_ENABLED).{Style.RESET_ALL}")
+            return
+        modes = {'on': 'use', 'off': 'bypass', 'refresh': 'refresh'}
+        if arg in modes:
+            self.cache_mode = modes[arg]
+            print(f"{Fore.BLUE}>> Search cache mode: {self.cache_mode}{Style.RESET_ALL}")
+        elif arg == "clear":
+            cache.clear()
+            print(f"{Fore.YELLOW}Search cache cleared!{Style.RESET_ALL}")
+        elif arg:
+            print(f"{Fore.RED}Error: usage /cache [on|off|refresh|clear]{Style.RESET_ALL}")
+            return
+        print(f"{Fore.LIGHTBLACK_EX}   [{self.cache_mode}] {cache.stats_text()}{Style.RESET_ALL}")
+
+    def handle_input(self, user_in):
+        """Process one line of user input (command or question). Returns False once the user asks to exit."""
+        
+        if user_in.lower() in ['exit', 'quit', 'q']: 
+            print(f"{Fore.YELLOW}Goodbye!{Style.RESET_ALL}")
+            return False
+        if not user_in: return True
+
+        if user_in.startswith("/"):
+            if user_in == "/raw": self.memory.set_mode('raw'); return True
+            if user_in == "/zip": self.memory.set_mode('zip'); return True
+            if user_in == "/clear": self.memory.clear(); print(f"{Fore.YELLOW}Memory cleared!{Style.RESET_ALL}"); return True
+            if user_in.startswith("/cache"): self.handle_cache_command(user_in[6:].strip()); return True
+            if user_in == "/stats": self.print_stats(); return True
+        
+        self.trace = tracer.begin_turn(session=self.session)
+        turn_started = time.perf_counter()
+        need_search = False
+        prefetched = None # links from the speculative SERP fetch (pipelined mode)
+        kw = user_in # default keywords are the user's raw input
+        target_question = user_in # actual question submitted to the AI
+
+        if user_in.startswith("/s "):
+            target_question = user_in[3:].strip()
+            if not target_question:
+                print(f"{Fore.RED}Error: /s requires content after the command.{Style.RESET_ALL}")
+                return True
+            need_search = True
+            # call analyze_intent to get history-rewritten keywords; ignore model's search decision
+            if PIPELINED_SEARCH:
+                _, kw, prefetched = self.analyze_with_prefetch(target_question, force_search=True)
+            else:
+                _, kw = self.analyze_intent(target_question, force_search=True)
+            print(f"{Fore.MAGENTA}🔧 [manual force-search] Assistant rewrote keywords -> {Fore.WHITE}{kw}{Style.RESET_ALL}")
+        
+        elif user_in.startswith("/n "):
+            target_question = user_in[3:].strip()
+            if not target_question:
+                print(f"{Fore.RED}Error: /n requires content after the command.{Style.RESET_ALL}")
+                return True
+            need_search = False
+            kw = "" # explicitly no search; set keywords empty
+            print(f"{Fore.MAGENTA}🔧 [manual no-search] Answering based only on known memory{Style.RESET_ALL}")
+        
+        else:
+            # automatic mode
+            if PIPELINED_SEARCH:
+                need_search, kw, prefetched = self.analyze_with_prefetch(user_in)
+            else:
+                need_search, kw = self.analyze_intent(user_in)
+            target_question = user_in # in automatic mode, the submitted question is the user input
+            if need_search:
+                if kw: # only notify if keywords are non-empty
+                    print(f"{Fore.MAGENTA}💡 [auto suggestion] Web search keywords -> {Fore.WHITE}{kw}{Style.RESET_ALL}")
+                else: # if AI suggests search but provides empty keywords, skip
+                    print(f"{Fore.LIGHTBLACK_EX}💡 [auto suggestion] AI recommends searching but provided no keywords; skipping search.{Style.RESET_ALL}")
+                    need_search = False
+
+        docs = []
+        if need_search and kw: # only run search when need_search is True and kw is non-empty
+            with tracer.span("search", keywords=kw, prefetched=prefetched is not None) as span:
+                early = (PROGRESSIVE_MIN_DOCS, PROGRESSIVE_DEADLINE) if PROGRESSIVE_ANSWER else None
+                docs = self.searcher.search(kw, cache_mode=self.cache_mode, links=prefetched, early=early)
+                span['docs'] = len(docs)
+            raw_docs = docs
+            if docs and RANK_DOCS:
+                with tracer.span("rank"):
+                    docs = rank_docs(docs, kw)
+            if not docs:
+                print(f"{Fore.LIGHTBLACK_EX}   [-] No valid search results were obtained.{Style.RESET_ALL}")
+
+        # generate answer
+        # pack system prompt, history, references and the current question into the token budget
+        with tracer.span("context") as span:
+            recalled = self.memory.recall(target_question) if MEMORY_RECALL else []
+            msgs, report = self.pack_context(target_question, docs, recalled)
+            span.update(report)
+        print(f"{Fore.LIGHTBLACK_EX}   🧮 Context: {format_report(report)}{Style.RESET_ALL}")
+
+        print(f"\n{Fore.BLUE}AI is thinking...{Style.RESET_ALL}")
+        full = self.stream_answer(msgs)
+        if docs and self.searcher.late:
+            full = self.refine_answer(recalled, raw_docs, kw, target_question, full)
+        
+        self.memory.add_turn(target_question, full) # record the actual user question (not the command)
+        tracer.record("turn", time.perf_counter() - turn_started, searched=bool(docs))
+        if TRACE_PRINT_SUMMARY:
+            print(f"{Fore.LIGHTBLACK_EX}   ⏱️ {tracer.turn_summary(self.trace)}{Style.RESET_ALL}")
+        return True
+
     def run(self):
         self.searcher.start()
         print(f"\n{Fore.CYAN}=== Smart Online Assistant V7.0 (Deep Historical Awareness) ==={Style.RESET_ALL}")
-        print(f"Commands: {Fore.GREEN}/s <text>{Style.RESET_ALL} force-search (assistant rewrites query) | {Fore.GREEN}/n <text>{Style.RESET_ALL} no-search | {Fore.GREEN}/raw{Style.RESET_ALL} raw memory | {Fore.GREEN}/zip{Style.RESET_ALL} summarize memory | {Fore.GREEN}/clear{Style.RESET_ALL} clear memory")
+        print(f"Commands: {Fore.GREEN}/s <text>{Style.RESET_ALL} force-search (assistant rewrites query) | {Fore.GREEN}/n <text>{Style.RESET_ALL} no-search | {Fore.GREEN}/raw{Style.RESET_ALL} raw memory | {Fore.GREEN}/zip{Style.RESET_ALL} summarize memory | {Fore.GREEN}/clear{Style.RESET_ALL} clear memory | {Fore.GREEN}/cache [on|off|refresh|clear]{Style.RESET_ALL} search cache | {Fore.GREEN}/stats{Style.RESET_ALL} latency stats")
         print("-" * 50)
 
         try:
             while True:
                 mode_icon = "📝 raw" if self.memory.mode == 'raw' else "📉 zip"
                 user_in = input(f"\n{Fore.GREEN}You [{mode_icon}]: {Style.RESET_ALL}").strip()
-                
-                if user_in.lower() in ['exit', 'quit', 'q']: 
-                    print(f"{Fore.YELLOW}Goodbye!{Style.RESET_ALL}")
+                if not self.handle_input(user_in):
                     break
-                if not user_in: continue
-
-                if user_in.startswith("/"):
-                    if user_in == "/raw": self.memory.set_mode('raw'); continue
-                    if user_in == "/zip": self.memory.set_mode('zip'); continue
-                    if user_in == "/clear": self.memory.history=[]; self.memory.save(); print(f"{Fore.YELLOW}Memory cleared!{Style.RESET_ALL}"); continue
-                
-                need_search = False
-                kw = user_in # default keywords are the user's raw input
-                target_question = user_in # actual question submitted to the AI
-
-                if user_in.startswith("/s "):
-                    target_question = user_in[3:].strip()
-                    if not target_question:
-                        print(f"{Fore.RED}Error: /s requires content after the command.{Style.RESET_ALL}")
-                        continue
-                    need_search = True
-                    # call analyze_intent to get history-rewritten keywords; ignore model's search decision
-                    _, kw = self.analyze_intent(target_question)
-                    print(f"{Fore.MAGENTA}🔧 [manual force-search] Assistant rewrote keywords -> {Fore.WHITE}{kw}{Style.RESET_ALL}")
-                
-                elif user_in.startswith("/n "):
-                    target_question = user_in[3:].strip()
-                    if not target_question:
-                        print(f"{Fore.RED}Error: /n requires content after the command.{Style.RESET_ALL}")
-                        continue
-                    need_search = False
-                    kw = "" # explicitly no search; set keywords empty
-                    print(f"{Fore.MAGENTA}🔧 [manual no-search] Answering based only on known memory{Style.RESET_ALL}")
-                
-                else:
-                    # automatic mode
-                    need_search, kw = self.analyze_intent(user_in)
-                    target_question = user_in # in automatic mode, the submitted question is the user input
-                    if need_search:
-                        if kw: # only notify if keywords are non-empty
-                            print(f"{Fore.MAGENTA}💡 [auto suggestion] Web search keywords -> {Fore.WHITE}{kw}{Style.RESET_ALL}")
-                        else: # if AI suggests search but provides empty keywords, skip
-                            print(f"{Fore.LIGHTBLACK_EX}💡 [auto suggestion] AI recommends searching but provided no keywords; skipping search.{Style.RESET_ALL}")
-                            need_search = False
-
-                search_data = ""
-                if need_search and kw: # only run search when need_search is True and kw is non-empty
-                    docs = self.searcher.search(kw)
-                    if docs: 
-                        search_data = "\n\n[Live references]:\n" + "\n".join(docs)
-                    else:
-                        print(f"{Fore.LIGHTBLACK_EX}   [-] No valid search results were obtained.{Style.RESET_ALL}")
-
-                # generate answer
-                full_history = self.memory.get_full_history()
-                limited_history = get_limited_msgs(full_history)
-                
-                # System prompt to guide assistant behavior
-                system_prompt = (
-                    "You are a professional and helpful AI assistant. Answer based on the following principles:\n"
-                    "1. Prefer using your own knowledge and conversation history to answer.\n"
-                    "2. If [Live references] are provided, prioritize extracting information from them for facts, data, or recent information.\n"
-                    "3. If references conflict with internal knowledge, prefer the references and cite sources.\n"
-                    "4. Keep answers concise and accurate; avoid redundancy.\n"
-                    "5. If references are insufficient to answer, state that you can only answer based on known information.\n"
-                    "6. Avoid mentioning you are an AI model; do not say you don't know the source—integrate and answer directly.\n"
-                )
-                msgs = [{'role':'system', 'content': system_prompt}]
-                
-                # add limited conversation history
-                msgs.extend(limited_history)
-                
-                # add current user question and search data
-                final_user_content = f"{search_data}\n----------------\nCurrent question: {target_question}"
-                msgs.append({'role':'user', 'content': final_user_content})
-
-                print(f"\n{Fore.BLUE}AI is thinking...{Style.RESET_ALL}")
-                stream = ollama.chat(
-                    model=MODEL_NAME, 
-                    messages=msgs, 
-                    stream=True, 
-                    options=OLLAMA_COMMON_OPTIONS,
-                    keep_alive=KEEP_ALIVE
-                )
-                
-                print(f"{Fore.MAGENTA}AI: {Style.RESET_ALL}", end="", flush=True)
-                full = ""
-                for chunk in stream:
-                    c = chunk['message']['content']
-                    print(c, end="", flush=True)
-                    full += c
-                print("\n" + "-"*50)
-                
-                self.memory.add_turn(target_question, full) # record the actual user question (not the command)
-                # To prevent memory bloat, periodically compress or clean old memory (optional)
-                # if len(self.memory.history) > 100: # example: compress old turns if conversation rounds exceed 100
-                #     self.memory.compress_old_turns()
 
         except KeyboardInterrupt: 
             print(f"\n{Fore.YELLOW}User interrupted, exiting.{Style.RESET_ALL}")
         except Exception as e:
             print(f"{Fore.RED}An exception occurred: {e}{Style.RESET_ALL}")
         finally: 
+            self.memory.close()
             self.searcher.stop()
+            if self.searcher.cache:
+                self.searcher.cache.close()
+            tracer.close()
@@ -0,0 +1,606 @@
+# benchmark.py
+"""
+Offline benchmarks against the local mock server.
+
+Usage:
+    python benchmark.py deepread [--slow 3] [--fast 9] [--spa 2] [--delay 8]
+    python benchmark.py pagination [--per-page 5] [--load-delay 0.3] [--clicks 2]
+    python benchmark.py memory [--turns 10000 100000]
+    python benchmark.py browser [--modes eager lazy background] [--think 2]
+    python benchmark.py providers [--searches 12] [--slow-delay 10] [--browser]
+    python benchmark.py replay [--source real_chat.txt] [--repeat 3] [--tokens-per-s 100] [--serp links]
+                               [--slow 3 --slow-delay 6] [--progressive]
+    python benchmark.py server [--clients 8] [--turns 6] [--llm-slots 2] [--tokens-per-s 100]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from colorama import init, Fore, Style
+
+import config
+from mock_server import MockServer, MockOllamaHandler
+
+
+def bench_deepread(args):
+    """Compare sequential, concurrent and http deep-read on a mix of fast, slow, JS-rendered and dead pages."""
+    from search import SearchEngine
+
+    with MockServer() as srv:
+        links = []
+        for i in range(args.fast):
+            links.append({'title': f"fast {i}", 'url': srv.url(f"/article/{i}")})
+        for i in range(args.slow):
+            links.append({'title': f"slow {i}", 'url': srv.url(f"/article/s{i}?delay={args.delay}")})
+        for i in range(args.spa):
+            links.append({'title': f"spa {i}", 'url': srv.url(f"/spa/{i}")})
+        links.append({'title': "dead", 'url': srv.url("/dead")})
+
+        engine = SearchEngine()
+        engine.start(mode="eager")
+        try:
+            rows = []
+            for mode in ("sequential", "concurrent", "http"):
+                page = engine.context.new_page()
+                t0 = time.perf_counter()
+                if mode == "http":
+                    docs = engine._deep_read_http(links, len(links))
+                elif mode == "concurrent":
+                    docs = engine._deep_read_concurrent(links, len(links))
+                else:
+                    docs = engine._deep_read_sequential(page, links)
+                rows.append((mode, time.perf_counter() - t0, len(docs)))
+                page.close()
+        finally:
+            engine.stop()
+
+    print(f"\n{Fore.CYAN}{'mode':<12}{'seconds':>10}{'docs':>6}{Style.RESET_ALL}")
+    for mode, secs, n in rows:
+        print(f"{mode:<12}{secs:>10.2f}{n:>6}")
+    print(f"{Fore.LIGHTBLACK_EX}http mode paths: {engine.fetch_stats}{Style.RESET_ALL}")
+
+
+def bench_pagination(args):
+    """Time each SERP pagination step against the mock result page."""
+    import search
+    from search import SearchEngine
+
+    search.MAX_PAGES_TO_SCAN = args.clicks
+    with MockServer() as srv:
+        search.SEARCH_URL = srv.url(f"/serp?q={{query}}&total=60&per_page={args.per_page}"
+                                    f"&load_delay={args.load_delay}&render_delay={args.render_delay}")
+        engine = SearchEngine()
+        engine.start(mode="eager")
+        try:
+            page = engine.context.new_page()
+            t0 = time.perf_counter()
+            links = engine._collect_links(page, "mock query")
+            total = time.perf_counter() - t0
+            page.close()
+        finally:
+            engine.stop()
+
+    clicks = sum(1 for name, _ in engine.last_pagination_steps if name.startswith("click"))
+    print(f"\n{Fore.CYAN}{'step':<16}{'seconds':>10}{Style.RESET_ALL}")
+    for name, secs in engine.last_pagination_steps:
+        print(f"{name:<16}{secs:>10.3f}")
+    print(f"{'total':<16}{total:>10.3f}   ({len(links)} links, {clicks} clicks)")
+    # The previous implementation slept 1.5 s after scrolling and 2.5 s after every click
+    print(f"{Fore.LIGHTBLACK_EX}fixed sleeps the old loop would have added: {clicks * 4.0:.1f}s{Style.RESET_ALL}")
+
+
+def bench_memory(args):
+    """Per-turn save and startup load cost: legacy full JSON rewrite vs the SQLite journal."""
+    from memory import HybridMemory
+
+    answer = "Paderborn bearing dataset: vibration and motor current signals, several fault types. " * 4
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for turns in args.turns:
+            history = []
+            for i in range(turns):
+                history.append({'role': 'user', 'content': f"question {i}"})
+                history.append({'role': 'assistant', 'content': answer})
+
+            # Legacy: every turn rewrote the whole file, every start parsed all of it
+            json_path = os.path.join(tmp, f"memory_{turns}.json")
+            t0 = time.perf_counter()
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({'mode': 'raw', 'history': history}, f, ensure_ascii=False, indent=2)
+            json_save = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            with open(json_path, 'r', encoding='utf-8') as f:
+                json.load(f)
+            json_load = time.perf_counter() - t0
+
+            # Journal: seeded through the one-time migration, then timed per append and per start
+            db_path = os.path.join(tmp, f"memory_{turns}.db")
+            memory = HybridMemory(mode='raw', path=db_path, legacy_path=json_path)
+            t0 = time.perf_counter()
+            for i in range(args.appends):
+                memory._append(f"question {turns + i}", answer)
+            db_save = (time.perf_counter() - t0) / args.appends
+            memory.close()
+
+            t0 = time.perf_counter()
+            memory = HybridMemory(mode='raw', path=db_path, legacy_path=None)
+            memory.get_recent_history()
+            db_load = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for i in range(args.recalls):
+                memory.recall(f"what did question {i * 37 % turns} say about motor current signals")
+            db_recall = (time.perf_counter() - t0) / args.recalls
+            memory.close()
+            rows.append((turns, json_save, json_load, db_save, db_load, db_recall))
+
+    print(f"\n{Fore.CYAN}{'turns':>8}{'json save':>12}{'json load':>12}{'journal save':>14}{'journal load':>14}"
+          f"{'recall':>10}{Style.RESET_ALL}")
+    for turns, js, jl, ds, dl, dr in rows:
+        print(f"{turns:>8}{js * 1000:>10.1f}ms{jl * 1000:>10.1f}ms{ds * 1000:>12.2f}ms{dl * 1000:>12.2f}ms{dr * 1000:>8.2f}ms")
+    print(f"{Fore.LIGHTBLACK_EX}save = cost of recording (and indexing) one turn; load = startup until the prompt window is "
+          f"available; recall = top-{config.MEMORY_RECALL_TOP_K} older rounds for one question{Style.RESET_ALL}")
+
+
+def bench_browser(args):
+    """
+    Browser lifecycle timings per start mode against the mock SERP: the wait before the first prompt,
+    the first SERP after a simulated typing pause (cold), a second SERP (warm), a SERP in a recycled
+    context and the first SERP after a simulated Chromium crash (restart + retry).
+    """
+    import search
+    from search import SearchEngine
+
+    with MockServer() as srv:
+        search.SEARCH_URL = srv.url(f"/serp?q={{query}}&total=10&per_page=10&load_delay={args.load_delay}")
+        search.MAX_PAGES_TO_SCAN = 0
+        rows = []
+        out = open(os.devnull, 'w', encoding='utf-8')
+        for mode in args.modes:
+            engine = SearchEngine()
+            engine.cache = None
+            times = {}
+
+            def timed(name, fn, *a):
+                t0 = time.perf_counter()
+                fn(*a)
+                times[name] = time.perf_counter() - t0
+
+            def serp(query):
+                engine._in_browser(engine._serp_links, query)
+
+            def crash():
+                # close the browser behind the engine's back: it sees the same disconnect as a crash
+                browser = engine.host.browser if engine.host is not None else engine.browser
+                engine._call(browser.close)
+
+            with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(out):
+                try:
+                    timed('startup', engine.start, None, mode)
+                    time.sleep(args.think)
+                    timed('first', serp, "first query")
+                    timed('warm', serp, "second query")
+                    engine._close_context()
+                    timed('recycled', serp, "third query")
+                    crash()
+                    timed('crash', serp, "fourth query")
+                finally:
+                    engine.stop()
+            rows.append((mode, times, engine.browser_stats['restarts']))
+        out.close()
+
+    print(f"\n{Fore.CYAN}{'start mode':<12}{'before prompt':>15}{'first SERP':>12}{'warm SERP':>11}"
+          f"{'new context':>13}{'after crash':>13}{Style.RESET_ALL}")
+    for mode, t, restarts in rows:
+        print(f"{mode:<12}{t['startup']:>14.2f}s{t['first']:>11.2f}s{t['warm']:>10.2f}s"
+              f"{t['recycled']:>12.2f}s{t['crash']:>12.2f}s  ({restarts} restart)")
+    print(f"{Fore.LIGHTBLACK_EX}first SERP runs {args.think:g}s after startup (simulated typing); "
+          f"cold start = warm SERP + the part of the launch still left then{Style.RESET_ALL}")
+
+
+CHAT_INPUT_RE = re.compile(r"^You \[[^\]]*\]: (.*)$")
+CHAT_KEYWORDS_RE = re.compile(r"(?:Web search keywords|Assistant rewrote keywords) -> (.*)$")
+CHAT_RULE = "-" * 50
+
+
+def load_script(path):
+    """
+    Recorded turns as [{'input', 'search', 'keywords', 'answer'}]. Accepts a console transcript like
+    real_chat.txt (commands are kept, the recorded search decision and answer are reused) or a memory
+    file like hybrid_memory.json (every user message becomes an auto-mode turn).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith(".json"):
+        history = json.loads(text).get('history', [])
+        return [{'input': m['content'].strip(), 'search': True, 'keywords': m['content'].strip(),
+                 'answer': history[i + 1]['content'] if i + 1 < len(history) else ""}
+                for i, m in enumerate(history) if m['role'] == 'user']
+
+    script, turn, answer = [], None, None
+    for line in text.splitlines():
+        m = CHAT_INPUT_RE.match(line)
+        if m:
+            turn = {'input': m.group(1).strip(), 'search': False, 'keywords': "", 'answer': ""}
+            if turn['input'].lower() not in ('exit', 'quit', 'q'):
+                script.append(turn)
+            answer = None
+        elif turn is None:
+            continue
+        elif answer is not None:
+            if line == CHAT_RULE:
+                turn['answer'] = "\n".join(answer).strip()
+                answer = None
+            else:
+                answer.append(line)
+        elif line.startswith("AI: "):
+            answer = [line[4:]]
+        elif CHAT_KEYWORDS_RE.search(line):
+            turn['search'] = True
+            turn['keywords'] = CHAT_KEYWORDS_RE.search(line).group(1).strip()
+    return script
+
+
+def bench_providers(args):
+    """
+    Search provider fan-out against mock endpoints: a fast DuckDuckGo HTML page, a Lite endpoint stuck on a
+    bot check, a SearXNG instance that overlaps the HTML results and answers after --slow-delay, and a local
+    index folder. Reports search latency, merged link yield and which providers each selection mode queries.
+    """
+    import providers
+    import search
+    from search import SearchEngine
+    from tracing import percentile
+
+    with tempfile.TemporaryDirectory() as tmp, MockServer() as web:
+        index = os.path.join(tmp, "local_index")
+        os.makedirs(index)
+        for i in range(5):
+            with open(os.path.join(index, f"note{i}.md"), 'w', encoding='utf-8') as f:
+                f.write(f"# Note {i}\nBearing fault diagnosis notes, query {i}: vibration and motor current datasets.\n")
+        providers.DuckDuckGoHtmlProvider.url = web.url(f"/ddg_html?q={{query}}&total=20&delay={args.delay}")
+        providers.DuckDuckGoLiteProvider.url = web.url("/ddg_lite?q={query}&status=202")
+        providers.SEARXNG_URL = web.url(f"/searx?q={{query}}&total=20&offset=10&delay={args.slow_delay}")
+        providers.LOCAL_INDEX_DIR_PATH = index
+        search.SEARCH_URL = web.url("/serp?q={query}&total=30&per_page=10&load_delay=0.3")
+
+        rows = []
+        out = open(os.devnull, 'w', encoding='utf-8')
+        for select in args.select:
+            providers.SEARCH_PROVIDER_SELECT = select
+            engine = SearchEngine()
+            engine.providers.stats = providers.ProviderStats(path=os.path.join(tmp, f"stats_{select}.json"))
+            times, yields, picks = [], [], []
+            with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(out):
+                engine.start(mode="eager" if args.browser else "off")
+                try:
+                    for i in range(args.searches):
+                        t0 = time.perf_counter()
+                        links = engine.providers.links(f"bearing fault query {i}")
+                        times.append(time.perf_counter() - t0)
+                        yields.append(len(links))
+                        picks.append("+".join(name for name, *_ in engine.providers.last))
+                finally:
+                    engine.stop()
+            rows.append((select, times, yields, picks, engine.providers.stats_text()))
+        out.close()
+
+    for select, times, yields, picks, stats in rows:
+        print(f"\n{Fore.CYAN}select={select}: {len(times)} searches{Style.RESET_ALL}")
+        print(f"search latency: p50 {percentile(times, 50):.2f}s | p95 {percentile(times, 95):.2f}s | "
+              f"unique links avg {sum(yields) / max(len(yields), 1):.1f}")
+        print(f"queried: first {picks[0]} | last {picks[-1]}")
+        print(f"{Fore.LIGHTBLACK_EX}{stats}{Style.RESET_ALL}")
+
+
+def replay_questions(script):
+    """Recorded intent decisions and answers keyed by question, for the mock Ollama server."""
+    questions = {}
+    for t in script:
+        q = t['input'][3:].strip() if t['input'][:3] in ("/s ", "/n ") else t['input']
+        questions[q] = t
+    intents = {q: {'search': t['search'], 'keywords': t['keywords']} for q, t in questions.items()}
+    answers = {q: t['answer'] for q, t in questions.items() if t['answer']}
+    return intents, answers
+
+
+def canned_serp_engine(web, args):
+    """SearchEngine subclass handing the mock result links straight to deep-read (no browser)."""
+    from search import SearchEngine
+    canned = [{'title': f"Result {i}",
+               'url': web.url(f"/article/{i}?delay={args.slow_delay if i % 3 == 0 and i // 3 < args.slow else args.page_delay}")}
+              for i in range(args.results)]
+
+    class CannedSerpEngine(SearchEngine):
+        def search(self, query, cache_mode="use", links=None, **kwargs):
+            return super().search(query, cache_mode=cache_mode, links=links or canned, **kwargs)
+    return CannedSerpEngine
+
+
+def bench_replay(args):
+    """
+    Replay a recorded conversation through ChatAgent with the mock Ollama server and mock SERP/article
+    pages, then report turn latency percentiles, the per-stage span table and memory growth.
+    """
+    script = load_script(args.source)
+    intents, answers = replay_questions(script)
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            MockServer() as web, \
+            MockServer(handler=MockOllamaHandler, ttft=args.ttft, prefill_tps=args.prefill_tps,
+                       tokens_per_s=args.tokens_per_s, answer_tokens=args.answer_tokens,
+                       intents=intents, answers=answers, kv_slots=args.kv_slots) as llm:
+        # The ollama module reads OLLAMA_HOST when it is first imported
+        os.environ['OLLAMA_HOST'] = llm.url("")
+        import agent as agent_module
+        import search
+        from agent import ChatAgent
+        from cache import SearchCache
+        from memory import HybridMemory
+        from search import SearchEngine
+        from tracing import tracer, percentile
+
+        tracer.path = os.path.join(tmp, "trace.jsonl")
+        search.SEARCH_URL = web.url(f"/serp?q={{query}}&total={args.results}&per_page=10"
+                                    f"&load_delay={args.load_delay}&page_delay={args.page_delay}")
+        agent_module.PROGRESSIVE_ANSWER = args.progressive
+        agent_module.CONTEXT_LAYOUT = args.layout
+        CannedSerpEngine = canned_serp_engine(web, args)
+        engine = CannedSerpEngine() if args.serp == "links" else SearchEngine()
+        if engine.cache is not None:
+            engine.cache = SearchCache(path=os.path.join(tmp, "search_cache.db"), legacy_path=None)
+        db_path = os.path.join(tmp, "memory.db")
+
+        tracemalloc.start()
+        rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out = open(os.devnull, 'w', encoding='utf-8')
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(out):
+            memory = HybridMemory(mode=args.mode, path=db_path, legacy_path=args.seed)
+            agent = ChatAgent(memory=memory, searcher=engine)
+            agent.cache_mode = "use" if args.cache else "bypass"
+            engine.start(mode="eager" if args.serp == "browser" else "off")
+            heap = [tracemalloc.get_traced_memory()[0]]
+            try:
+                for _ in range(args.repeat):
+                    for turn in script:
+                        agent.handle_input(turn['input'])
+                        heap.append(tracemalloc.get_traced_memory()[0])
+                t0 = time.perf_counter()
+                memory.wait_for_summaries()
+                drain = time.perf_counter() - t0
+                stored = memory.count()
+                compaction = memory.compaction_stats()
+            finally:
+                memory.close()
+                engine.stop()
+                tracer.close()
+        out.close()
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rss_end = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        db_bytes = sum(os.path.getsize(db_path + s) for s in ("", "-wal") if os.path.exists(db_path + s))
+
+    turns = tracer.recent('turn')
+    print(f"\n{Fore.CYAN}Replayed {len(turns)} turns from {os.path.basename(args.source)} "
+          f"(x{args.repeat}, serp={args.serp}, progressive={args.progressive}, layout={args.layout}, mock LLM {args.tokens_per_s:g} tok/s, ttft {args.ttft:g}s){Style.RESET_ALL}")
+    print(f"turn latency: p50 {percentile(turns, 50):.2f}s | p95 {percentile(turns, 95):.2f}s | "
+          f"max {max(turns, default=0):.2f}s | summary drain after last turn {drain:.2f}s")
+    print(f"\n{tracer.summary_table()}")
+    per_turn = (heap[-1] - heap[0]) / max(len(heap) - 1, 1)
+    print(f"\n{Fore.CYAN}memory growth{Style.RESET_ALL}")
+    print(f"python heap: {heap[0] / 1e6:.1f} MB -> {heap[-1] / 1e6:.1f} MB (peak {heap_peak / 1e6:.1f} MB, "
+          f"{per_turn / 1e3:+.1f} KB/turn)")
+    print(f"max RSS: {rss_start / 1024:.0f} MB -> {rss_end / 1024:.0f} MB")  # ru_maxrss is in KB on Linux
+    print(f"journal: {stored} messages, {db_bytes / 1e3:.0f} KB on disk")
+    print(f"compaction: {compaction}")
+    print(f"prefill: {agent.prefill_stats_text()}")
+    print(f"{Fore.LIGHTBLACK_EX}deep-read paths: {engine.fetch_stats}{Style.RESET_ALL}")
+    print(f"{Fore.LIGHTBLACK_EX}intent tiers: {agent.intent.stats_text()}{Style.RESET_ALL}")
+
+
+async def _server_client(base, script, turns, results):
+    """One simulated user: open a session and send its turns one after another, retrying on 503."""
+    import aiohttp
+    async with aiohttp.ClientSession() as http:
+        async with http.post(f"{base}/sessions", json={}) as r:
+            sid = (await r.json())['session']
+        for turn in script[:turns]:
+            while True:
+                t0 = time.perf_counter()
+                ttft = None
+                async with http.post(f"{base}/sessions/{sid}/messages", json={'message': turn['input']}) as r:
+                    if r.status == 503:
+                        results['rejected'] += 1
+                        await asyncio.sleep(float(r.headers.get('Retry-After', 1)))
+                        continue
+                    if r.status != 200:
+                        results['errors'].append(f"HTTP {r.status}: {await r.text()}")
+                        break
+                    last = None
+                    async for line in r.content:
+                        if not line.strip():
+                            continue
+                        last = json.loads(line)
+                        if last['type'] == 'token' and ttft is None:
+                            ttft = time.perf_counter() - t0
+                if last and last['type'] == 'done':
+                    results['turns'].append(time.perf_counter() - t0)
+                    if ttft is not None:
+                        results['ttft'].append(ttft)
+                else:
+                    results['errors'].append(last.get('error') if last else f"HTTP {r.status}")
+                break
+        while True:
+            async with http.delete(f"{base}/sessions/{sid}") as r:
+                if r.status != 409:  # 409: the last turn has not released the session yet
+                    break
+            await asyncio.sleep(0.05)
+
+
+async def _run_server_load(server, args, script):
+    from aiohttp import web as aioweb
+    runner = aioweb.AppRunner(server.app)
+    await runner.setup()
+    site = aioweb.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    results = {'turns': [], 'ttft': [], 'errors': [], 'rejected': 0}
+    try:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_server_client(f"http://127.0.0.1:{port}", script, args.turns, results)
+                               for _ in range(args.clients)))
+        results['wall'] = time.perf_counter() - t0
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def bench_server(args):
+    """
+    Load test of server.py: concurrent clients, one session each, replay the recorded turns against an
+    in-process ChatServer backed by the mock Ollama server (with limited parallel slots) and mock pages.
+    Reports throughput, turn latency / time to first token percentiles, rejections and LLM queue wait.
+    """
+    script = load_script(args.source)
+    intents, answers = replay_questions(script)
+    if not args.turns:
+        args.turns = len(script)
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            MockServer() as web, \
+            MockServer(handler=MockOllamaHandler, ttft=args.ttft, prefill_tps=args.prefill_tps,
+                       tokens_per_s=args.tokens_per_s, answer_tokens=args.answer_tokens,
+                       intents=intents, answers=answers, slots=args.llm_slots) as llm:
+        os.environ['OLLAMA_HOST'] = llm.url("")
+        from cache import SearchCache
+        from server import ChatServer, LLMGate
+        from tracing import tracer, percentile
+
+        tracer.path = os.path.join(tmp, "trace.jsonl")
+        server = ChatServer(engine_factory=canned_serp_engine(web, args), use_browser=False,
+                            session_dir=os.path.join(tmp, "sessions"))
+        server.cache = SearchCache(path=os.path.join(tmp, "search_cache.db"), legacy_path=None) if args.cache else None
+        server.gate = LLMGate(args.llm_concurrency)
+        out = open(os.devnull, 'w', encoding='utf-8')
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(out):
+            results = asyncio.run(_run_server_load(server, args, script))
+        out.close()
+
+    turns, ttft = results['turns'], results['ttft']
+    print(f"\n{Fore.CYAN}{args.clients} clients x {args.turns} turns against server.py "
+          f"(LLM gate {args.llm_concurrency}, mock LLM {args.llm_slots or 'unlimited'} slots, "
+          f"{args.tokens_per_s:g} tok/s){Style.RESET_ALL}")
+    print(f"completed {len(turns)} turns in {results['wall']:.1f}s -> {len(turns) / results['wall']:.2f} turns/s | "
+          f"rejected (503, retried) {results['rejected']} | errors {len(results['errors'])}")
+    print(f"turn latency: p50 {percentile(turns, 50):.2f}s | p95 {percentile(turns, 95):.2f}s | "
+          f"p99 {percentile(turns, 99):.2f}s")
+    print(f"time to first token: p50 {percentile(ttft, 50):.2f}s | p95 {percentile(ttft, 95):.2f}s")
+    queue = tracer.recent('llm.queue')
+    print(f"LLM queue wait: p50 {percentile(queue, 50):.2f}s | p95 {percentile(queue, 95):.2f}s "
+          f"over {len(queue)} requests")
+    print(f"\n{tracer.summary_table()}")
+    for error in sorted(set(results['errors']))[:5]:
+        print(f"{Fore.RED}error: {error}{Style.RESET_ALL}")
+
+
+def main():
+    init(autoreset=True)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("deepread", help="sequential vs concurrent deep-read")
+    p.add_argument("--fast", type=int, default=9, help="number of fast pages")
+    p.add_argument("--slow", type=int, default=3, help="number of slow pages")
+    p.add_argument("--spa", type=int, default=2, help="number of JS-rendered pages")
+    p.add_argument("--delay", type=float, default=config.DEEP_READ_URL_TIMEOUT / 2, help="slow page delay (s)")
+    p.set_defaults(func=bench_deepread)
+
+    p = sub.add_parser("pagination", help="per-step timing of SERP pagination")
+    p.add_argument("--per-page", type=int, default=5, help="results added per 'More Results' click")
+    p.add_argument("--load-delay", type=float, default=0.3, help="mock SERP delay before results appear (s)")
+    p.add_argument("--render-delay", type=float, default=0.1, help="mock SERP delay before the button renders (s)")
+    p.add_argument("--clicks", type=int, default=config.MAX_PAGES_TO_SCAN, help="max 'More Results' clicks")
+    p.set_defaults(func=bench_pagination)
+
+    p = sub.add_parser("memory", help="memory save/load cost at large history sizes")
+    p.add_argument("--turns", type=int, nargs="+", default=[10_000, 100_000], help="history sizes (turns)")
+    p.add_argument("--appends", type=int, default=200, help="appends timed per size")
+    p.add_argument("--recalls", type=int, default=50, help="recall lookups timed per size")
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("browser", help="browser start modes, warm/recycled contexts and crash recovery")
+    p.add_argument("--modes", nargs="+", choices=["eager", "lazy", "background"],
+                   default=["eager", "lazy", "background"], help="BROWSER_START modes to compare")
+    p.add_argument("--think", type=float, default=2.0, help="seconds between startup and the first search")
+    p.add_argument("--load-delay", type=float, default=0.1, help="mock SERP delay before results appear (s)")
+    p.add_argument("--verbose", action="store_true", help="show the engine's console output")
+    p.set_defaults(func=bench_browser)
+
+    p = sub.add_parser("providers", help="search provider fan-out, deadlines and automatic selection")
+    p.add_argument("--searches", type=int, default=12, help="searches per selection mode")
+    p.add_argument("--select", nargs="+", choices=["auto", "all"], default=["auto", "all"],
+                   help="SEARCH_PROVIDER_SELECT modes to compare")
+    p.add_argument("--delay", type=float, default=0.1, help="mock DuckDuckGo HTML response delay (s)")
+    p.add_argument("--slow-delay", type=float, default=3.0, help="mock SearXNG response delay (s)")
+    p.add_argument("--browser", action="store_true", help="include the Playwright scraper (needs Chromium)")
+    p.add_argument("--verbose", action="store_true", help="show the engine's console output")
+    p.set_defaults(func=bench_providers)
+
+    p = sub.add_parser("replay", help="replay a recorded conversation against mock Ollama and mock search pages")
+    p.add_argument("--source", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "real_chat.txt"),
+                   help="console transcript (real_chat.txt) or memory file (hybrid_memory.json)")
+    p.add_argument("--seed", default=None, help="memory file imported as existing history before the replay")
+    p.add_argument("--repeat", type=int, default=3, help="times the recorded turns are replayed")
+    p.add_argument("--mode", choices=["zip", "raw"], default="zip", help="initial memory mode")
+    p.add_argument("--serp", choices=["links", "browser"], default="links",
+                   help="links = canned result links, HTTP deep-read only; browser = paginate the mock SERP in Chromium")
+    p.add_argument("--results", type=int, default=15, help="result links on the mock SERP")
+    p.add_argument("--load-delay", type=float, default=0.3, help="mock SERP delay before results appear (s)")
+    p.add_argument("--page-delay", type=float, default=0.2, help="mock article response delay (s)")
+    p.add_argument("--slow", type=int, default=0, help="canned links (every third one) served after --slow-delay")
+    p.add_argument("--slow-delay", type=float, default=6.0, help="delay of the slow canned links (s)")
+    p.add_argument("--progressive", action="store_true", help="answer before every page is read (PROGRESSIVE_ANSWER)")
+    p.add_argument("--layout", choices=["budget", "prefix"], default=config.CONTEXT_LAYOUT,
+                   help="prompt layout (CONTEXT_LAYOUT)")
+    p.add_argument("--kv-slots", type=int, default=4, help="prompt caches kept by the mock LLM (0 = no KV-cache reuse)")
+    p.add_argument("--ttft", type=float, default=0.2, help="mock LLM time to first token (s)")
+    p.add_argument("--prefill-tps", type=float, default=2000, help="mock LLM prompt tokens processed per second")
+    p.add_argument("--tokens-per-s", type=float, default=100, help="mock LLM generation speed")
+    p.add_argument("--answer-tokens", type=int, default=150, help="answer length when no recorded answer exists")
+    p.add_argument("--cache", action="store_true", help="use the search cache (fresh file per run)")
+    p.add_argument("--verbose", action="store_true", help="show the agent's console output")
+    p.set_defaults(func=bench_replay)
+
+    p = sub.add_parser("server", help="concurrent clients against server.py with a mock Ollama of limited parallelism")
+    p.add_argument("--source", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "real_chat.txt"),
+                   help="console transcript or memory file whose turns every client sends")
+    p.add_argument("--clients", type=int, default=8, help="concurrent clients (one session each)")
+    p.add_argument("--turns", type=int, default=0, help="turns per client (0 = the whole script)")
+    p.add_argument("--llm-slots", type=int, default=config.SERVER_LLM_CONCURRENCY,
+                   help="requests the mock LLM processes at once (0 = unlimited)")
+    p.add_argument("--llm-concurrency", type=int, default=config.SERVER_LLM_CONCURRENCY,
+                   help="server LLM gate size (SERVER_LLM_CONCURRENCY)")
+    p.add_argument("--results", type=int, default=15, help="canned result links per search")
+    p.add_argument("--page-delay", type=float, default=0.2, help="mock article response delay (s)")
+    p.add_argument("--slow", type=int, default=0, help="canned links (every third one) served after --slow-delay")
+    p.add_argument("--slow-delay", type=float, default=6.0, help="delay of the slow canned links (s)")
+    p.add_argument("--ttft", type=float, default=0.2, help="mock LLM time to first token (s)")
+    p.add_argument("--prefill-tps", type=float, default=2000, help="mock LLM prompt tokens processed per second")
+    p.add_argument("--tokens-per-s", type=float, default=100, help="mock LLM generation speed")
+    p.add_argument("--answer-tokens", type=int, default=150, help="answer length when no recorded answer exists")
+    p.add_argument("--cache", action="store_true", help="share a search cache between sessions (fresh file per run)")
+    p.add_argument("--verbose", action="store_true", help="show the agent's console output")
+    p.set_defaults(func=bench_server)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
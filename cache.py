@@ -0,0 +1,173 @@
+# cache.py
+"""
+On-disk search cache: query -> link list and URL -> cleaned page text
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from colorama import Fore, Style
+
+from config import (
+    SEARCH_CACHE_FILE_PATH, SEARCH_CACHE_LEGACY_FILE_PATH, SEARCH_CACHE_LINKS_TTL, SEARCH_CACHE_PAGES_TTL,
+    SEARCH_CACHE_MAX_LINKS, SEARCH_CACHE_MAX_PAGES,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    layer TEXT NOT NULL,
+    key TEXT NOT NULL,
+    t REAL NOT NULL,
+    a REAL,
+    v TEXT NOT NULL,
+    PRIMARY KEY (layer, key)
+);
+"""
+
+UPSERT = ("INSERT INTO entries (layer, key, t, a, v) VALUES (?, ?, ?, ?, ?) "
+          "ON CONFLICT(layer, key) DO UPDATE SET t = excluded.t, a = excluded.a, v = excluded.v")
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive cache key for a search query."""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    Two-layer LRU cache persisted as one row per entry in SQLite (WAL mode).
+    - 'links': normalized query -> [{'title', 'url'}, ...]
+    - 'pages': URL -> cleaned page text
+    Each layer has its own TTL (seconds) and entry cap; the least recently used entries are evicted first.
+    Entries are {'t': written, 'a': last read, 'v': value}. Writes, evictions and read times are queued
+    in memory and save() commits only those rows, so a search never rewrites the whole cache.
+    """
+    def __init__(self, path=SEARCH_CACHE_FILE_PATH, legacy_path=SEARCH_CACHE_LEGACY_FILE_PATH):
+        self.path = path
+        self.layers = {'links': OrderedDict(), 'pages': OrderedDict()}
+        self.ttl = {'links': SEARCH_CACHE_LINKS_TTL, 'pages': SEARCH_CACHE_PAGES_TTL}
+        self.cap = {'links': SEARCH_CACHE_MAX_LINKS, 'pages': SEARCH_CACHE_MAX_PAGES}
+        self.counters = {name: {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0} for name in self.layers}
+        self.pending = {}  # (layer, key) -> entry to upsert, or None to delete
+        self.lock = threading.RLock()  # shared by every session in server mode
+        self.conn = None
+        self.load(legacy_path)
+
+    def load(self, legacy_path=None):
+        is_new = not os.path.exists(self.path)
+        try:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")  # a lost tail after a power cut only costs cache entries
+            self.conn.executescript(SCHEMA)
+            if is_new and legacy_path and os.path.exists(legacy_path):
+                self._migrate_json(legacy_path)
+            for name in self.layers:
+                rows = self.conn.execute(
+                    "SELECT key, t, a, v FROM entries WHERE layer = ? ORDER BY COALESCE(a, t)", (name,))
+                self.layers[name] = OrderedDict(  # least recently used first
+                    (key, {'t': t, 'a': a, 'v': json.loads(v)}) for key, t, a, v in rows)
+        except Exception as e:
+            print(f"{Fore.RED}>> ⚠️ Failed to load search cache: {e}. Starting with an empty cache.{Style.RESET_ALL}")
+            self.layers = {name: OrderedDict() for name in self.layers}
+
+    def _migrate_json(self, legacy_path):
+        """One-time import of the old search_cache.json (the file itself is left untouched)."""
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self.conn:
+            for name in self.layers:
+                self.conn.executemany(UPSERT, [
+                    (name, key, e['t'], e.get('a'), json.dumps(e['v'], ensure_ascii=False))
+                    for key, e in data.get(name, {}).items()])
+        print(f"{Fore.GREEN}>> 📂 Migrated search cache from {os.path.basename(legacy_path)}{Style.RESET_ALL}")
+
+    def save(self):
+        """Commit the queued upserts and deletes in one transaction."""
+        with self.lock:
+            if not self.pending or self.conn is None:
+                return
+            upserts, deletes = [], []
+            for (name, key), entry in self.pending.items():
+                if entry is None:
+                    deletes.append((name, key))
+                else:
+                    upserts.append((name, key, entry['t'], entry.get('a'),
+                                    json.dumps(entry['v'], ensure_ascii=False)))
+            with self.conn:
+                self.conn.executemany("DELETE FROM entries WHERE layer = ? AND key = ?", deletes)
+                self.conn.executemany(UPSERT, upserts)
+            self.pending.clear()
+
+    def clear(self):
+        with self.lock:
+            for layer in self.layers.values():
+                layer.clear()
+            self.pending.clear()
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("DELETE FROM entries")
+
+    def close(self):
+        with self.lock:
+            self.save()
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def _get(self, name, key):
+        with self.lock:
+            return self._get_locked(name, key)
+
+    def _get_locked(self, name, key):
+        layer = self.layers[name]
+        entry = layer.get(key)
+        if entry is None:
+            self.counters[name]['misses'] += 1
+            return None
+        if time.time() - entry['t'] > self.ttl[name]:
+            del layer[key]
+            self.pending[(name, key)] = None
+            self.counters[name]['expired'] += 1
+            self.counters[name]['misses'] += 1
+            return None
+        entry['a'] = time.time()
+        layer.move_to_end(key)
+        self.pending[(name, key)] = entry  # the read time keeps the LRU order across restarts
+        self.counters[name]['hits'] += 1
+        return entry['v']
+
+    def _put(self, name, key, value):
+        with self.lock:
+            layer = self.layers[name]
+            entry = {'t': time.time(), 'a': None, 'v': value}
+            layer[key] = entry
+            layer.move_to_end(key)
+            self.pending[(name, key)] = entry
+            while len(layer) > self.cap[name]:
+                old_key, _ = layer.popitem(last=False)
+                self.pending[(name, old_key)] = None
+                self.counters[name]['evicted'] += 1
+
+    def get_links(self, query):
+        return self._get('links', normalize_query(query))
+
+    def put_links(self, query, links):
+        self._put('links', normalize_query(query), links)
+
+    def get_page(self, url):
+        return self._get('pages', url)
+
+    def put_page(self, url, text):
+        self._put('pages', url, text)
+
+    def stats_text(self):
+        parts = []
+        for name, c in self.counters.items():
+            lookups = c['hits'] + c['misses']
+            rate = (c['hits'] / lookups * 100) if lookups else 0.0
+            parts.append(f"{name}: {len(self.layers[name])} entries, {c['hits']} hits / {c['misses']} misses ({rate:.0f}%), "
+                         f"{c['expired']} expired, {c['evicted']} evicted")
+        return " | ".join(parts)
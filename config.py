@@ -13,8 +13,118 @@ CONTEXT_WINDOW = 32768              # context window size
 # === ⚙️ Tunable configuration parameters ===
 MAX_SEARCH_RESULTS = 15      # max number of pages to fetch and extract content from
 MAX_PAGES_TO_SCAN = 2        # how many search result pages to scan (each page adds ~10-15 links)
-HISTORY_LIMIT = 5                   
-MEMORY_FILE = "hybrid_memory.json" # path to memory file
+
+# Pipelined mode: fetch the SERP for the raw input while intent analysis runs
+PIPELINED_SEARCH = False
+PREFETCH_MATCH_THRESHOLD = 0.5  # token Jaccard between rewritten keywords and raw input needed to reuse the links
+
+# Search providers: result links are gathered from these at once and merged by URL
+SEARCH_PROVIDERS = ["ddg_html", "ddg_lite", "searxng", "local", "browser"]  # unconfigured ones (no SEARXNG_URL, no LOCAL_INDEX_DIR) are skipped
+SEARCH_PROVIDER_SELECT = "auto"    # "auto" = the fastest reliable providers by recorded latency and yield, "all" = every available provider
+SEARCH_PROVIDER_FANOUT = 2         # providers queried per search in auto mode (untried and re-probed ones come on top)
+SEARCH_PROVIDER_DEADLINES = {'ddg_html': 6, 'ddg_lite': 6, 'searxng': 8, 'local': 2, 'browser': 30}  # seconds each provider is waited for
+SEARCH_PROVIDER_MIN_SUCCESS = 0.6  # success rate (moving average) a provider needs to count as reliable
+SEARCH_PROVIDER_PROBES = 3         # searches a provider is always tried in before its stats are trusted
+SEARCH_PROVIDER_REPROBE = 1800     # seconds after which a provider left out by auto mode is tried again
+SEARCH_PROVIDER_STATS_FILE = "provider_stats.json"
+DDG_HTML_URL = "https://html.duckduckgo.com/html/?q={query}"
+DDG_LITE_URL = "https://lite.duckduckgo.com/lite/?q={query}"
+SEARXNG_URL = ""                   # e.g. "http://127.0.0.1:8888/search?q={query}&format=json" (JSON output must be enabled)
+LOCAL_INDEX_DIR = "local_index"    # .txt/.md/.html files searched with BM25 (provider skipped if the folder does not exist)
+
+# SERP pagination: upper bounds (seconds) for the DOM conditions waited on instead of fixed sleeps
+SEARCH_URL = "https://duckduckgo.com/?q={query}&ia=web"
+PAGINATION_RESULTS_TIMEOUT = 8   # first results to appear
+PAGINATION_BUTTON_TIMEOUT = 3    # 'More Results' button to become visible after scrolling
+PAGINATION_LOAD_TIMEOUT = 5      # result count to grow after clicking
+PAGINATION_RETRY_TIMEOUT = 2     # result count to grow after a second scroll
+
+# Deep-read stage (opening result pages and extracting their text)
+DEEP_READ_MODE = "http"        # "http" = pooled HTTP client with browser fallback, "concurrent" = pool of pages in the shared context, "sequential" = one page at a time
+DEEP_READ_CONCURRENCY = 4      # number of pages loading in parallel in concurrent mode
+DEEP_READ_URL_TIMEOUT = 15     # seconds a single URL may take before it is abandoned
+DEEP_READ_TOTAL_TIMEOUT = 45   # seconds the whole deep-read stage may take
+DEEP_READ_TARGET_DOCS = 8      # stop early once this many good documents exist (0 = read every link)
+DEEP_READ_SETTLE = 0.5         # seconds to let a page settle after DOMContentLoaded before extraction
+DEEP_READ_HTTP_CONCURRENCY = 8    # parallel downloads in http mode (also the keep-alive pool size per host)
+DEEP_READ_HTTP_MIN_CHARS = 300    # extracted text shorter than this is re-read in the browser
+DEEP_READ_HTTP_MAX_BYTES = 2_000_000  # pages larger than this are truncated before extraction
+
+# Progressive answers (http deep-read only): start generating before every page has been read
+PROGRESSIVE_ANSWER = False
+PROGRESSIVE_MIN_DOCS = 3             # answer as soon as this many docs are read...
+PROGRESSIVE_DEADLINE = 4.0           # ...or after this many seconds of deep-read, once at least one doc exists
+PROGRESSIVE_LATE_WAIT = 2.0          # seconds to keep waiting for background pages after the draft answer
+PROGRESSIVE_REFINE = True            # revise the draft once when late pages add enough material
+PROGRESSIVE_REFINE_MIN_SHARE = 0.3   # share of the re-ranked reference text late pages must provide
+PROGRESSIVE_REFINE_MAX_TOKENS = 1024 # length cap of the revision pass
+
+# Browser lifecycle
+BROWSER_START = "background"   # "eager" = launch before the first prompt, "lazy" = on the first search that needs it, "background" = launch on a helper thread at startup
+BROWSER_RECYCLE_PAGES = 200    # open a fresh browser context after this many pages (0 = never)
+BROWSER_RECYCLE_RSS_MB = 1500  # relaunch Chromium once the browser processes use more memory than this (0 = never; needs /proc)
+BROWSER_HOST_MAX_PAGES = 8     # pages open at once in a browser shared through a BrowserHost (all server sessions together)
+BROWSER_CALL_TIMEOUT = 30      # longest wait for one queued browser step when the caller gives no deadline of its own
+BROWSER_WAIT_SLICE = 0.25      # shared browser: DOM waits run in slices of this many seconds so other sessions' steps run in between
+
+# Request interception: resources the text extractor never uses are aborted before download
+BLOCK_RESOURCES = True
+SERP_BLOCK_RESOURCE_TYPES = ["image", "media", "font"]  # SERP keeps CSS so the 'More Results' button stays clickable
+DEEP_READ_BLOCK_RESOURCE_TYPES = ["image", "media", "font", "stylesheet", "texttrack", "manifest"]
+BLOCK_DOMAINS = [  # ads and trackers, blocked for every resource type (subdomains included)
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "adservice.google.com", "amazon-adsystem.com", "facebook.net",
+    "scorecardresearch.com", "hotjar.com", "criteo.com", "taboola.com", "outbrain.com",
+]
+
+# Ranking of search documents before prompting
+RANK_DOCS = True              # chunk, deduplicate and BM25-rank docs against the search keywords
+DOC_MAX_CHARS = 6000          # cleaned text kept per page (ranking then selects the passages that go into the prompt)
+RANK_PASSAGE_CHARS = 500      # target passage size when chunking pages
+RANK_TOP_K = 24               # max passages passed to the prompt
+RANK_MAX_CHARS = 16000        # max characters of passages passed to the prompt
+RANK_DEDUP_THRESHOLD = 0.6    # shingle Jaccard similarity above which a passage counts as a near-duplicate
+
+# On-disk search cache (query -> links, URL -> cleaned text)
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_FILE = "search_cache.db"          # one row per cached entry (SQLite, WAL mode)
+SEARCH_CACHE_LEGACY_FILE = "search_cache.json"  # legacy JSON cache, imported on first start
+SEARCH_CACHE_LINKS_TTL = 6 * 3600    # seconds a cached query -> link list stays valid
+SEARCH_CACHE_PAGES_TTL = 24 * 3600   # seconds a cached URL -> page text stays valid
+SEARCH_CACHE_MAX_LINKS = 200         # max cached queries (least recently used evicted first)
+SEARCH_CACHE_MAX_PAGES = 2000        # max cached pages (least recently used evicted first)
+
+HISTORY_LIMIT = 5                   # rounds of history used for intent analysis
+
+# Intent fast path: local rules and a decision cache before the LLM intent call
+INTENT_FAST_PATH = True
+INTENT_CONFIDENCE_THRESHOLD = 0.8   # rule decisions below this confidence are left to the LLM (1.0 = always ask the LLM)
+INTENT_CACHE_SIZE = 256             # remembered LLM decisions (least recently used evicted first)
+
+# Prompt assembly (token budget for the answer prompt)
+CONTEXT_RESPONSE_RESERVE = 4096  # tokens kept free in CONTEXT_WINDOW for the reply
+CONTEXT_HISTORY_SHARE = 0.3      # share of the free budget reserved for recent history before references
+CONTEXT_HISTORY_MAX_MSGS = 40    # most recent messages considered for the answer prompt
+CHARS_PER_TOKEN = 4              # token estimator: non-CJK characters per token
+CONTEXT_LAYOUT = "budget"        # "budget" = refit recent history every turn, "prefix" = append-only history segment kept stable for Ollama's KV-cache reuse
+PREFIX_RESET_KEEP = 0.5          # prefix layout: share of the history budget kept when the segment outgrows it and is restarted
+MEMORY_FILE = "hybrid_memory.json" # legacy JSON memory file, imported into the journal on first start
+MEMORY_DB_FILE = "hybrid_memory.db" # append-only memory journal (SQLite, WAL mode)
+MEMORY_COMPACT_EVERY = 200 # checkpoint the WAL back into the database after this many writes
+MEMORY_MMAP_SIZE = 256 * 1024 * 1024 # bytes of the journal read through mmap (0 = off)
+MEMORY_RECALL = True # pull older exchanges relevant to the question back into the prompt (BM25 over past turns)
+MEMORY_RECALL_TOP_K = 3 # older exchanges recalled per question
+MEMORY_RECALL_MAX_TOKENS = 2000 # prompt tokens recalled exchanges may use
+MEMORY_RECALL_MAX_DF = 0.05 # query terms found in more than this share of past turns are ignored by recall
+MEMORY_RECALL_MIN_DF = 50 # ...but terms found in up to this many turns are always kept (short histories keep their recurring topics)
+MEMORY_COMPACTION = True # fold old rounds into rolling summaries (in the background) and move them to cold storage
+MEMORY_HOT_ROUNDS = CONTEXT_HISTORY_MAX_MSGS // 2 # most recent rounds always kept verbatim in the journal
+MEMORY_BLOCK_ROUNDS = 10 # older rounds summarized together into one level-1 block
+MEMORY_BLOCK_FANOUT = 10 # blocks of one level folded into one block of the next (10 -> 100 rounds)
+MEMORY_BLOCK_LEVELS = 2 # highest block level; top-level blocks accumulate
+MEMORY_BLOCK_SUMMARY_WORDS = 150 # target length of a block summary
+MEMORY_DIGEST_MAX_TOKENS = 1500 # prompt tokens the block summaries may use (newest kept first)
+SUMMARY_ASYNC = True # zip mode: summarize replies in a background thread instead of blocking the next prompt
 HIDE_WINDOW = True # hide the browser window off-screen (Playwright arg: --window-position)
 
 # Common Ollama model options
@@ -23,7 +133,32 @@ OLLAMA_COMMON_OPTIONS = {
     'temperature': 0.6,
 }
 KEEP_ALIVE = "60m" 
+
+# Server mode (server.py): several sessions over HTTP/WebSocket
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_SESSION_DIR = "sessions"     # one memory journal per session: sessions/<id>.db
+SERVER_MAX_SESSIONS = 64            # open sessions (each holds a memory journal and a browser context)
+SERVER_MAX_INFLIGHT_TURNS = 8       # turns processed at once; further requests get 503 (backpressure)
+SERVER_LLM_CONCURRENCY = 2          # Ollama requests admitted at once (match OLLAMA_NUM_PARALLEL); the rest queue
+SERVER_MAX_LLM_QUEUE = 16           # new turns are refused while this many requests wait for the LLM
+SERVER_TURN_TIMEOUT = 300           # seconds a turn may take before it is cancelled
+SERVER_SESSION_IDLE_TIMEOUT = 1800  # idle sessions are closed after this many seconds
+SERVER_STREAM_BUFFER = 256          # events queued per turn for the client; a slow reader's further tokens are merged until the model is done
+
+# Latency tracing (spans per turn, see /stats)
+TRACE_ENABLED = True
+TRACE_FILE = "trace.jsonl"      # one JSON line per span, appended
+TRACE_PRINT_SUMMARY = False     # print a per-turn span summary after every answer
+TRACE_STATS_WINDOW = 1000       # latest spans per name kept for /stats percentiles (counts and totals cover the whole run)
 # ===================================
 
 # Ensure the memory file path is absolute or relative to the script directory
 MEMORY_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), MEMORY_FILE)
+MEMORY_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), MEMORY_DB_FILE)
+TRACE_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), TRACE_FILE)
+SEARCH_CACHE_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), SEARCH_CACHE_FILE)
+SEARCH_CACHE_LEGACY_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), SEARCH_CACHE_LEGACY_FILE)
+SEARCH_PROVIDER_STATS_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), SEARCH_PROVIDER_STATS_FILE)
+LOCAL_INDEX_DIR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), LOCAL_INDEX_DIR)
+SERVER_SESSION_DIR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), SERVER_SESSION_DIR)
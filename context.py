@@ -0,0 +1,280 @@
+# context.py
+"""
+Token-budget-aware prompt assembly
+"""
+import re
+
+from config import (
+    CONTEXT_WINDOW, CONTEXT_RESPONSE_RESERVE, CONTEXT_HISTORY_SHARE, CHARS_PER_TOKEN, MEMORY_RECALL_MAX_TOKENS,
+    CONTEXT_HISTORY_MAX_MSGS, PREFIX_RESET_KEEP,
+)
+
+# CJK ideographs, kana and hangul are roughly one token each; other text averages CHARS_PER_TOKEN chars/token
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+MSG_OVERHEAD = 4  # role markers and separators the chat template adds around each message
+
+REFERENCES_HEADER = "\n\n[Live references]:\n"
+RECALLED_HEADER = "[Earlier exchanges that may be relevant]:\n"
+QUESTION_SEPARATOR = "\n----------------\nCurrent question: "
+
+
+def estimate_tokens(text):
+    """Fast tokenizer-free estimate of the token count of `text`."""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut `text` from the end so that it fits in `max_tokens` (estimated)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    lo, hi = 0, len(text)
+    while lo < hi:  # longest prefix that fits
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def _msg_tokens(msg):
+    return estimate_tokens(msg['content']) + MSG_OVERHEAD
+
+
+def _fit_docs(docs, free):
+    """Reference docs in order within `free` tokens; the last one that fits is truncated. Returns (docs, tokens)."""
+    used_docs = []
+    refs_tokens = estimate_tokens(REFERENCES_HEADER) if docs else 0
+    if docs and refs_tokens < free:
+        for doc in docs:
+            cost = estimate_tokens(doc) + 1
+            if refs_tokens + cost <= free:
+                used_docs.append(doc)
+                refs_tokens += cost
+                continue
+            room = free - refs_tokens - 1
+            if room > 100:  # a truncated doc is only worth it if a useful chunk survives
+                used_docs.append(truncate_to_tokens(doc, room))
+                refs_tokens += estimate_tokens(used_docs[-1]) + 1
+            break
+    if not used_docs:
+        refs_tokens = 0
+    return used_docs, refs_tokens
+
+
+def build_context(system_prompt, history, docs, question, budget=None, recalled=None, digest=""):
+    """
+    Pack the prompt into `budget` tokens (default: CONTEXT_WINDOW minus the reply reserve).
+    Priority, highest first:
+      1. system prompt and current question (always kept)
+      2. the first conversation round (pinned, as get_limited_msgs did)
+      3. the digest of compacted rounds (HybridMemory.digest), if it fits in the history share
+      4. recent history, newest first, up to CONTEXT_HISTORY_SHARE of what is left
+      5. recalled older rounds (HybridMemory.recall), whole rounds up to MEMORY_RECALL_MAX_TOKENS
+      6. reference docs in the order given (most relevant first); the last one that fits is truncated
+      7. older history, if the references left room
+    The digest (a system message) and the recalled rounds are placed after the first round, before the
+    rest of the history.
+    Returns (msgs, report) where report holds the estimated tokens per section.
+    """
+    if budget is None:
+        budget = CONTEXT_WINDOW - CONTEXT_RESPONSE_RESERVE
+
+    system_tokens = estimate_tokens(system_prompt) + MSG_OVERHEAD
+    question_tokens = estimate_tokens(QUESTION_SEPARATOR + question) + MSG_OVERHEAD
+    free = max(budget - system_tokens - question_tokens, 0)
+
+    # 2. pinned first round
+    pinned = history[:2]
+    others = history[2:]
+    pinned_tokens = sum(_msg_tokens(m) for m in pinned)
+    if pinned_tokens > free * CONTEXT_HISTORY_SHARE:
+        pinned, pinned_tokens = [], 0
+    free -= pinned_tokens
+
+    # 3. digest of compacted rounds
+    digest_msgs = [{'role': 'system', 'content': digest}] if digest else []
+    digest_tokens = sum(_msg_tokens(m) for m in digest_msgs)
+    if digest_tokens > free * CONTEXT_HISTORY_SHARE:
+        digest_msgs, digest_tokens = [], 0
+    free -= digest_tokens
+
+    # 4. recent history newest first, whole rounds only, within the history share
+    def take_history(limit, start):
+        kept, used = [], 0
+        for i in range(len(others) - 1 - start, -1, -1):
+            cost = _msg_tokens(others[i])
+            if used + cost > limit:
+                break
+            kept.append(i)
+            used += cost
+        if len(kept) % 2 and kept:  # never split a user/assistant pair
+            used -= _msg_tokens(others[kept.pop()])
+        return kept, used
+
+    history_cap = max(int((free + pinned_tokens + digest_tokens) * CONTEXT_HISTORY_SHARE)
+                      - pinned_tokens - digest_tokens, 0)
+    recent, history_tokens = take_history(history_cap, 0)
+    free -= history_tokens
+
+    # 5. recalled rounds
+    kept_recalled, recalled_tokens = [], 0
+    recall_cap = min(MEMORY_RECALL_MAX_TOKENS, free)
+    for i in range(0, len(recalled or []) - 1, 2):
+        pair = recalled[i:i + 2]
+        cost = sum(_msg_tokens(m) for m in pair)
+        if recalled_tokens + cost <= recall_cap:
+            kept_recalled.extend(pair)
+            recalled_tokens += cost
+    free -= recalled_tokens
+
+    # 6. references
+    used_docs, refs_tokens = _fit_docs(docs, free)
+    free -= refs_tokens
+
+    # 7. older history with whatever is left
+    if free > 0 and len(recent) < len(others):
+        older, older_tokens = take_history(free, len(recent))
+        recent += older
+        history_tokens += older_tokens
+        free -= older_tokens
+
+    kept_history = pinned + digest_msgs + kept_recalled + [others[i] for i in sorted(recent)]
+    search_data = (REFERENCES_HEADER + "\n".join(used_docs)) if used_docs else ""
+    msgs = [{'role': 'system', 'content': system_prompt}]
+    msgs.extend(kept_history)
+    msgs.append({'role': 'user', 'content': f"{search_data}{QUESTION_SEPARATOR}{question}"})
+
+    report = {
+        'system': system_tokens,
+        'history': pinned_tokens + history_tokens,
+        'history_msgs': (len(kept_history) - len(kept_recalled) - len(digest_msgs), len(history)),
+        'digest': digest_tokens,
+        'recalled': recalled_tokens,
+        'recalled_msgs': len(kept_recalled),
+        'references': refs_tokens,
+        'docs': (len(used_docs), len(docs)),
+        'question': question_tokens,
+        'budget': budget,
+    }
+    report['total'] = (report['system'] + report['history'] + report['digest'] + report['recalled']
+                       + report['references'] + report['question'])
+    return msgs, report
+
+
+class PrefixLayout:
+    """
+    Prompt layout built for Ollama's KV-cache reuse (CONTEXT_LAYOUT = "prefix").
+    Ollama only prefills what follows the longest prefix shared with the previous request, so every part
+    that changes from turn to turn goes last:
+      [system] [first round] [digest] [history segment ...] [user: recalled + references + question]
+    The history segment is append-only: it starts at a fixed message (`anchor`) and grows by one round per
+    turn. It is restarted at a later round only when it outgrows the history share of the budget or the
+    CONTEXT_HISTORY_MAX_MSGS window (keeping the newest PREFIX_RESET_KEEP of both), or when the digest
+    changes after a compaction. Only those turns prefill the history again.
+    One instance per conversation: the anchor is the state that keeps consecutive prompts aligned.
+    """
+
+    def __init__(self):
+        self.anchor = 0        # journal id of the first message of the history segment (0 = not started)
+        self.digest = None
+        self.resets = 0
+
+    def _restart(self, rows, cap):
+        kept, used = [], 0
+        max_msgs = int(CONTEXT_HISTORY_MAX_MSGS * PREFIX_RESET_KEEP)
+        for i in range(len(rows) - 2, -1, -2):  # newest whole rounds first
+            cost = sum(estimate_tokens(r[2]) + MSG_OVERHEAD for r in rows[i:i + 2])
+            if used + cost > cap * PREFIX_RESET_KEEP or len(kept) + 2 > max_msgs:
+                break
+            kept[:0] = rows[i:i + 2]
+            used += cost
+        self.anchor = kept[0][0] if kept else (rows[-1][0] + 1 if rows else self.anchor)
+
+    def prefix(self, system_prompt, pinned, rows, digest=""):
+        """
+        The stable leading messages for this turn from the first round, the later journal rows
+        (HybridMemory.get_recent_rows) and the digest. Returns (msgs, report).
+        """
+        budget = CONTEXT_WINDOW - CONTEXT_RESPONSE_RESERVE
+        system_tokens = estimate_tokens(system_prompt) + MSG_OVERHEAD
+        share = max(budget - system_tokens, 0) * CONTEXT_HISTORY_SHARE
+        pinned_tokens = sum(_msg_tokens(m) for m in pinned)
+        if pinned_tokens > share:
+            pinned, pinned_tokens = [], 0
+        digest_msgs = [{'role': 'system', 'content': digest}] if digest else []
+        digest_tokens = sum(_msg_tokens(m) for m in digest_msgs)
+        if digest_tokens > share - pinned_tokens:
+            digest_msgs, digest_tokens = [], 0
+        cap = max(int(share) - pinned_tokens - digest_tokens, 0)
+
+        if len(rows) % 2:  # a round is being written: leave its first half out
+            rows = rows[:-1]
+        restart = digest != self.digest and self.digest is not None
+        self.digest = digest
+        if not self.anchor and rows:
+            restart, self.anchor = False, rows[0][0]
+        elif rows and rows[0][0] > self.anchor:  # the segment start has left the window
+            restart = True
+        segment = [r for r in rows if r[0] >= self.anchor]
+        if restart or sum(estimate_tokens(r[2]) + MSG_OVERHEAD for r in segment) > cap:
+            self.resets += 1
+            self._restart(rows, cap)
+            segment = [r for r in rows if r[0] >= self.anchor]
+
+        history = [{'role': role, 'content': content} for _, role, content in segment]
+        msgs = [{'role': 'system', 'content': system_prompt}] + pinned + digest_msgs + history
+        report = {
+            'system': system_tokens,
+            'history': pinned_tokens + sum(_msg_tokens(m) for m in history),
+            'history_msgs': (len(pinned) + len(history), len(pinned) + len(rows)),
+            'digest': digest_tokens,
+        }
+        return msgs, report
+
+    def build(self, prefix, report, docs, question, budget=None, recalled=None):
+        """Append the per-turn tail (recalled rounds, references, question) to `prefix`. Returns (msgs, report)."""
+        if budget is None:
+            budget = CONTEXT_WINDOW - CONTEXT_RESPONSE_RESERVE
+        question_tokens = estimate_tokens(QUESTION_SEPARATOR + question) + MSG_OVERHEAD
+        prefix_tokens = report['system'] + report['history'] + report['digest']
+        free = max(budget - prefix_tokens - question_tokens, 0)
+
+        lines, recalled_tokens = [], 0
+        recall_cap = min(MEMORY_RECALL_MAX_TOKENS, free)
+        for i in range(0, len(recalled or []) - 1, 2):
+            text = "".join(f"{m['role'].capitalize()}: {m['content']}\n" for m in recalled[i:i + 2])
+            cost = estimate_tokens(text)
+            if recalled_tokens + cost <= recall_cap:
+                lines.append(text)
+                recalled_tokens += cost
+        if lines:
+            recalled_tokens += estimate_tokens(RECALLED_HEADER)
+        free -= recalled_tokens
+
+        used_docs, refs_tokens = _fit_docs(docs, free)
+        recalled_text = (RECALLED_HEADER + "\n".join(lines)) if lines else ""
+        search_data = (REFERENCES_HEADER + "\n".join(used_docs)) if used_docs else ""
+        msgs = prefix + [{'role': 'user', 'content': f"{recalled_text}{search_data}{QUESTION_SEPARATOR}{question}"}]
+
+        report = dict(report, recalled=recalled_tokens, recalled_msgs=len(lines) * 2, references=refs_tokens,
+                      docs=(len(used_docs), len(docs)), question=question_tokens, budget=budget,
+                      prefix=prefix_tokens, resets=self.resets)
+        report['total'] = prefix_tokens + recalled_tokens + refs_tokens + question_tokens
+        return msgs, report
+
+
+def format_report(report):
+    text = (f"system {report['system']:,} | history {report['history']:,} "
+            f"({report['history_msgs'][0]}/{report['history_msgs'][1]} msgs) | digest {report['digest']:,} | "
+            f"recalled {report['recalled']:,} ({report['recalled_msgs']} msgs) | "
+            f"refs {report['references']:,} ({report['docs'][0]}/{report['docs'][1]} docs) | "
+            f"question {report['question']:,} | total {report['total']:,} / {report['budget']:,} tokens")
+    if 'prefix' in report:
+        text += f" | stable prefix {report['prefix']:,} ({report['resets']} resets)"
+    return text
@@ -0,0 +1,102 @@
+# intent.py
+"""
+Fast path for intent analysis: local rules and a decision cache answer the obvious cases
+so the LLM is only asked when they are unsure
+"""
+import re
+from collections import OrderedDict
+
+from cache import normalize_query
+from config import INTENT_FAST_PATH, INTENT_CONFIDENCE_THRESHOLD, INTENT_CACHE_SIZE
+
+# Whole-input patterns (matched against the normalized query)
+GREETING_RE = re.compile(
+    r"^(hi|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|great|nice|got it|bye|good (morning|night|evening)"
+    r"|你好|您好|谢谢|好的|嗯|再见|明白了)[\s!.?~！。]*$")
+MATH_RE = re.compile(r"^(what is |what's |calculate |compute |计算)?[\d\s.,+\-*/^()%x×÷=]+[?？]?$")
+OPERATOR_RE = re.compile(r"\d\s*[+\-*/^%x×÷]\s*\(?\d")
+FOLLOW_UP_RE = re.compile(
+    r"^((please |pls )?(make it |answer )?(in|within|under|about) \d+ (words|characters|sentences|lines)"
+    r"|shorter|longer|more details?|in more detail|go on|continue|keep going|summari[sz]e( it| that)?"
+    r"|explain (it|that|this|more)|elaborate|simplify( it)?|give (me )?an example|translate( it)?( to| into) \w+"
+    r"|as a (table|list)|in (english|chinese)|继续|详细点|简短点|翻译成?\S*"
+    r"|用中文回答|举个例子)[\s!.?！。？]*$")
+# Words that ask for fresh facts the model cannot know
+FRESH_RE = re.compile(
+    r"\b(latest|newest|news|today|tonight|yesterday|this week|currently|right now|price|weather|forecast"
+    r"|score|release date|stock|exchange rate|20[2-3]\d)\b"
+    r"|https?://|最新|新闻|今天|昨天|现在|价格|天气|股价|汇率")
+
+TIERS = ("rules", "cache", "llm")
+
+
+class IntentClassifier:
+    """
+    Tiered intent decisions: (search, keywords) for a user input.
+      1. rules  - greetings, arithmetic and formatting follow-ups need no search; inputs asking for
+                  fresh facts at the start of a conversation search for themselves
+      2. cache  - earlier decisions, keyed on the normalized input and the previous user message
+      3. llm    - everything else (done by the caller, which stores the result with remember())
+    Rules only decide when their confidence reaches INTENT_CONFIDENCE_THRESHOLD.
+    """
+    def __init__(self, threshold=INTENT_CONFIDENCE_THRESHOLD, enabled=INTENT_FAST_PATH, cache_size=INTENT_CACHE_SIZE):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.counts = {tier: 0 for tier in TIERS}
+
+    @staticmethod
+    def rules(query, has_history):
+        """Heuristic decision: (search, keywords, confidence, reason) or None."""
+        q = normalize_query(query)
+        if GREETING_RE.match(q):
+            return False, "", 0.95, "small talk"
+        if MATH_RE.match(q) and OPERATOR_RE.search(q):
+            return False, "", 0.95, "arithmetic"
+        if has_history and FOLLOW_UP_RE.match(q):
+            return False, "", 0.9, "follow-up on the previous answer"
+        if FRESH_RE.search(q):
+            if has_history:
+                # "latest version?", "and the weather there today?": the topic may come from earlier turns
+                return True, query, 0.5, "fresh facts, may continue the conversation"
+            return True, query.strip().rstrip("?？"), 0.9, "asks for fresh facts"
+        return None
+
+    @staticmethod
+    def cache_key(query, history):
+        last_user = next((m['content'] for m in reversed(history) if m['role'] == 'user'), "")
+        return normalize_query(query), normalize_query(last_user)
+
+    def fast_path(self, query, history):
+        """(search, keywords, tier, reason) from the rules or the cache, or None when the LLM must decide."""
+        if not self.enabled:
+            return None
+        decision = self.rules(query, bool(history))
+        if decision and decision[2] >= self.threshold:
+            self.counts['rules'] += 1
+            return decision[0], decision[1], "rules", decision[3]
+        key = self.cache_key(query, history)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counts['cache'] += 1
+            search, keywords = self.cache[key]
+            return search, keywords, "cache", "same input after the same message"
+        return None
+
+    def remember(self, query, history, search, keywords):
+        """Store an LLM decision and count it."""
+        self.counts['llm'] += 1
+        if not self.enabled:
+            return
+        key = self.cache_key(query, history)
+        self.cache[key] = (search, keywords)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def stats_text(self):
+        total = sum(self.counts.values())
+        skipped = total - self.counts['llm']
+        share = f"{skipped / total:.0%}" if total else "n/a"
+        return " | ".join(f"{tier} {self.counts[tier]}" for tier in TIERS) + f" | LLM skipped {share}"
@@ -2,66 +2,555 @@
 """
 Memory management module
 """
+import contextlib
 import json
 import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
 import ollama
 from colorama import Fore, Style
 
-from config import MEMORY_FILE_PATH, SUMMARY_MODEL, OLLAMA_COMMON_OPTIONS, KEEP_ALIVE
+from context import estimate_tokens, truncate_to_tokens
+from rank import tokenize
+from tracing import tracer
+from config import (
+    MEMORY_FILE_PATH, MEMORY_DB_PATH, MEMORY_COMPACT_EVERY, HISTORY_LIMIT,
+    SUMMARY_MODEL, OLLAMA_COMMON_OPTIONS, KEEP_ALIVE, SUMMARY_ASYNC,
+    MEMORY_MMAP_SIZE, MEMORY_RECALL_TOP_K, MEMORY_RECALL_MAX_DF, MEMORY_RECALL_MIN_DF, MEMORY_RECALL_MAX_TOKENS, CONTEXT_HISTORY_MAX_MSGS,
+    MEMORY_COMPACTION, MEMORY_HOT_ROUNDS, MEMORY_BLOCK_ROUNDS, MEMORY_BLOCK_FANOUT, MEMORY_BLOCK_LEVELS,
+    MEMORY_BLOCK_SUMMARY_WORDS, MEMORY_DIGEST_MAX_TOKENS,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,  -- AUTOINCREMENT: ids are never reused after /clear
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    pending INTEGER NOT NULL DEFAULT 0     -- 1 = raw assistant reply still waiting for its zip summary
+);
+CREATE INDEX IF NOT EXISTS idx_messages_pending ON messages(pending) WHERE pending = 1;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+-- Recall index: one row per turn (rowid = id of the user message) holding the rank.tokenize() terms of the
+-- question and the full reply. Contentless, so only the inverted index is stored.
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(terms, content='', tokenize='unicode61');
+-- term -> number of indexed turns containing it (fts5vocab walks whole posting lists to count them)
+CREATE TABLE IF NOT EXISTS recall_df (term TEXT PRIMARY KEY, turns INTEGER NOT NULL) WITHOUT ROWID;
+-- Rolling summaries of compacted rounds. Level 1 covers MEMORY_BLOCK_ROUNDS rounds, level n + 1 folds
+-- MEMORY_BLOCK_FANOUT blocks of level n, which are then marked folded.
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    level INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,       -- message ids covered
+    last_id INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    source_tokens INTEGER NOT NULL,  -- estimated tokens that were summarized
+    seconds REAL NOT NULL,           -- time the summary took
+    folded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_blocks_open ON blocks(level, id) WHERE folded = 0;
+-- Cold storage: zlib-compressed originals of compacted messages and of replies replaced by their zip summary
+CREATE TABLE IF NOT EXISTS archive (id INTEGER PRIMARY KEY, role TEXT NOT NULL, content BLOB NOT NULL);
+"""
+DF_UPSERT = "INSERT INTO recall_df VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET turns = turns + excluded.turns"
+ARCHIVE_INSERT = "INSERT OR IGNORE INTO archive VALUES (?, ?, ?)"  # the first (most original) text wins
+
+COMPACT = "compact"  # summary queue job: run one compaction step
+BLOCK_PROMPT = ("Condense the following {what} into one factual summary of at most {words} words. Keep the topics, "
+                "questions, conclusions, names and numbers; leave out small talk.\n\n{text}\n\nSummary:")
+DIGEST_HEADER = "Summary of the earlier conversation (older rounds, oldest first):\n"
+
+# Question words that would match almost every stored turn
+RECALL_STOPWORDS = frozenset(
+    "a an the and or but of to in on at for with by from as is are was were be been it its this that these "
+    "those what which who whom how why when where do does did can could should would will i you we they he "
+    "she me my your our their about into more most some any please tell give show explain words".split())
 
 class HybridMemory:
-    """Hybrid memory manager"""
-    def __init__(self, mode="zip"):
+    """
+    Hybrid memory manager.
+    History lives in an append-only SQLite journal (WAL mode): each turn is one small transaction instead of
+    a rewrite of the whole file, a crash mid-write only loses the uncommitted turn, and only the rows a prompt
+    needs are read back. A legacy JSON memory file is imported on first start.
+    With MEMORY_COMPACTION, rounds older than the MEMORY_HOT_ROUNDS most recent ones are folded into rolling
+    block summaries by the background worker and moved to cold storage (the archive table), so the journal
+    and the prompt prefix stay bounded however long the conversation gets.
+    """
+    def __init__(self, mode="zip", path=MEMORY_DB_PATH, legacy_path=MEMORY_FILE_PATH):
         self.mode = mode
-        self.history = []
-        self.load()
+        self.path = path
+        self.lock = threading.RLock()  # one connection shared with the summary worker
+        self.summary_queue = queue.Queue()
+        self.closing = threading.Event()
+        self.worker_done = False  # set by the worker as it exits, under self.lock
+        self.close_pending = False  # close() timed out waiting: the worker closes the connection on exit
+        self.writes_since_compact = 0
+        self.llm_gate = contextlib.nullcontext()  # held around summary requests (server admission queue)
+        self.load(legacy_path)
 
-    def load(self):
-        if os.path.exists(MEMORY_FILE_PATH):
-            try:
-                with open(MEMORY_FILE_PATH, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.history = data.get('history', [])
-                    self.mode = data.get('mode', self.mode)
-                print(f"{Fore.GREEN}>> 📂 Loaded history memory ({len(self.history)} items){Style.RESET_ALL}")
-            except Exception as e:
-                print(f"{Fore.RED}>> ⚠️ Failed to load memory file: {e}. A new memory file will be created.{Style.RESET_ALL}")
-                self.history = [] # ensure the program can continue even if loading fails
+        pending = self.pending_ids()
+        self.worker = threading.Thread(target=self._summary_worker, daemon=True)
+        self.worker.start()
+        if pending:
+            print(f"{Fore.BLUE}>> 📉 Resuming {len(pending)} pending summaries in the background{Style.RESET_ALL}")
+            for msg_id in pending:
+                self._enqueue(msg_id)
+
+    def load(self, legacy_path=None):
+        is_new = not os.path.exists(self.path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: commits are atomic, fsync at checkpoints
+        self.conn.execute(f"PRAGMA mmap_size={int(MEMORY_MMAP_SIZE)}")
+        self.conn.executescript(SCHEMA)
+        if is_new and legacy_path and os.path.exists(legacy_path):
+            self._migrate_json(legacy_path)
+        self._index_backlog()
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'mode'").fetchone()
+        if row:
+            self.mode = row[0]
+        print(f"{Fore.GREEN}>> 📂 Loaded history memory ({self.count()} items){Style.RESET_ALL}")
+
+    def _migrate_json(self, legacy_path):
+        """One-time import of the old hybrid_memory.json (the file itself is left untouched)."""
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            history = data.get('history', [])
+            pending = set(data.get('pending', []))
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO messages (role, content, pending) VALUES (?, ?, ?)",
+                    [(m['role'], m['content'], 1 if i in pending else 0) for i, m in enumerate(history)],
+                )
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('mode', ?)", (data.get('mode', self.mode),))
+            print(f"{Fore.GREEN}>> 📂 Migrated {len(history)} items from {os.path.basename(legacy_path)}{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}>> ⚠️ Failed to migrate memory file: {e}. Starting with empty memory.{Style.RESET_ALL}")
 
-    def save(self):
-        with open(MEMORY_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump({'mode': self.mode, 'history': self.history}, f, ensure_ascii=False, indent=2)
+    def _set_indexed(self, last_id, added):
+        """Inside a transaction: record the last indexed user message id and the number of indexed turns."""
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('recall_indexed_id', ?)", (str(last_id),))
+        self.conn.execute("INSERT INTO meta VALUES ('recall_turns', ?) ON CONFLICT(key) "
+                          "DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value", (str(added),))
+
+    @staticmethod
+    def _terms(*texts):
+        return " ".join(tokenize("\n".join(texts)))
+
+    def _index_backlog(self):
+        """Add turns the recall index has not seen yet (migrated history, journals from before the index)."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'recall_indexed_id'").fetchone()
+        last = int(row[0]) if row else 0
+        rows = self.conn.execute(
+            "SELECT u.id, u.content, COALESCE(a.content, '') FROM messages u "
+            "LEFT JOIN messages a ON a.id = u.id + 1 AND a.role = 'assistant' "
+            "WHERE u.role = 'user' AND u.id > ? ORDER BY u.id", (last,)).fetchall()
+        if not rows:
+            return
+        indexed = [(msg_id, self._terms(q, a)) for msg_id, q, a in rows]
+        df = Counter()
+        for _, terms in indexed:
+            df.update(set(terms.split()))
+        with self.conn:
+            self.conn.executemany("INSERT INTO turns_fts (rowid, terms) VALUES (?, ?)", indexed)
+            self.conn.executemany(DF_UPSERT, df.items())
+            self._set_indexed(rows[-1][0], len(rows))
+        print(f"{Fore.GREEN}>> 🔎 Indexed {len(rows)} past turns for recall{Style.RESET_ALL}")
+
+    def _committed(self):
+        """Count a write and periodically fold the WAL back into the main database file."""
+        self.writes_since_compact += 1
+        if self.writes_since_compact >= MEMORY_COMPACT_EVERY:
+            self.compact()
+
+    def compact(self, vacuum=False):
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            if vacuum:
+                self.conn.execute("VACUUM")
+            self.writes_since_compact = 0
 
     def set_mode(self, new_mode):
         self.mode = new_mode
-        self.save()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('mode', ?)", (new_mode,))
         print(f"{Fore.BLUE}>> Mode switched to: {new_mode}{Style.RESET_ALL}")
 
+    def clear(self):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM messages")  # queued ids no longer exist and are skipped by the worker
+                self.conn.execute("INSERT INTO turns_fts (turns_fts) VALUES ('delete-all')")
+                self.conn.execute("DELETE FROM recall_df")
+                self.conn.execute("DELETE FROM blocks")
+                self.conn.execute("DELETE FROM archive")
+                self.conn.execute("DELETE FROM meta WHERE key IN ('recall_indexed_id', 'recall_turns')")
+            self.compact(vacuum=True)
+
+    def _append(self, user_text, ai_text, pending=False, full_ai_text=None):
+        """Append one round and index it for recall (by the full reply when a summary is stored)."""
+        with self.lock, tracer.span("memory.save", op="append"):
+            with self.conn:
+                user_id = self.conn.execute("INSERT INTO messages (role, content) VALUES ('user', ?)",
+                                            (user_text,)).lastrowid
+                cur = self.conn.execute("INSERT INTO messages (role, content, pending) VALUES ('assistant', ?, ?)",
+                                        (ai_text, 1 if pending else 0))
+                if full_ai_text and full_ai_text != ai_text:
+                    self.conn.execute(ARCHIVE_INSERT, (cur.lastrowid, 'assistant', self._pack(full_ai_text)))
+                terms = self._terms(user_text, full_ai_text or ai_text)
+                self.conn.execute("INSERT INTO turns_fts (rowid, terms) VALUES (?, ?)", (user_id, terms))
+                self.conn.executemany(DF_UPSERT, [(t, 1) for t in set(terms.split())])
+                self._set_indexed(user_id, 1)
+            self._committed()
+            return cur.lastrowid
+
+    def summarize(self, ai_text):
+        """Condense an AI reply with SUMMARY_MODEL; raises on Ollama errors."""
+        prompt = f"Please condense the following AI response into a factual summary within 100 characters, preserving key conclusions:\nContent: {ai_text}\nSummary:"
+        with self.llm_gate, tracer.span("summarize", model=SUMMARY_MODEL, chars=len(ai_text)):
+            resp = ollama.generate(
+                model=SUMMARY_MODEL,
+                prompt=prompt,
+                keep_alive=KEEP_ALIVE,
+                options=OLLAMA_COMMON_OPTIONS
+            )
+        return resp['response'].strip().split("</think>")[-1].strip()
+
     def add_turn(self, user_text, ai_text):
         if self.mode == 'raw':
             print(f"{Fore.BLUE}>> 📝 [raw mode] Recorded this conversation turn{Style.RESET_ALL}")
-            self.history.append({'role': 'user', 'content': user_text})
-            self.history.append({'role': 'assistant', 'content': ai_text})
+            self._append(user_text, ai_text)
+        elif SUMMARY_ASYNC:
+            # Store the raw reply now; the worker swaps in the summary when it is ready
+            print(f"{Fore.BLUE}>> 📉 [zip mode] Recorded this turn, condensing AI response in the background...{Style.RESET_ALL}")
+            msg_id = self._append(user_text, ai_text, pending=True)
+            self._enqueue(msg_id)
         else:
             print(f"{Fore.BLUE}>> 📉 [zip mode] Condensing AI response into a brief summary (keeping user text)...{Style.RESET_ALL}")
-            prompt = f"Please condense the following AI response into a factual summary within 100 characters, preserving key conclusions:\nContent: {ai_text}\nSummary:"
             try:
-                resp = ollama.generate(
-                    model=SUMMARY_MODEL, 
-                    prompt=prompt, 
-                    keep_alive=KEEP_ALIVE,
-                    options=OLLAMA_COMMON_OPTIONS
-                )
-                summary_ai = resp['response'].strip().split("</think>")[-1].strip()
+                summary_ai = self.summarize(ai_text)
                 print(f"{Fore.CYAN}   + Response condensed: {summary_ai[:30]}...{Style.RESET_ALL}")
-                
-                self.history.append({'role': 'user', 'content': user_text})
-                self.history.append({'role': 'assistant', 'content': summary_ai})
             except Exception as e:
                 print(f"{Fore.RED}>> Failed to summarize response: {e}. Saving AI response as original text.{Style.RESET_ALL}")
-                self.history.append({'role': 'user', 'content': user_text})
-                self.history.append({'role': 'assistant', 'content': ai_text})
-        self.save()
+                summary_ai = ai_text
+            self._append(user_text, summary_ai, full_ai_text=ai_text)
+        if MEMORY_COMPACTION:
+            self._enqueue(COMPACT)
+
+    def _enqueue(self, job):
+        """Queue a worker job; its spans count towards the turn (and server session) that queued it."""
+        self.summary_queue.put(tracer.bind(self._compact) if job == COMPACT else tracer.bind(self._summarize_pending, job))
+
+    def _summary_worker(self):
+        """Background thread: summarize pending replies and run compaction steps, one job at a time."""
+        try:
+            while True:
+                job = self.summary_queue.get()
+                try:
+                    if job is None or self.closing.is_set():
+                        return
+                    job()
+                finally:
+                    self.summary_queue.task_done()
+        finally:
+            with self.lock:
+                self.worker_done = True
+                if self.close_pending:
+                    self._close_conn()
+
+    def _summarize_pending(self, msg_id):
+        """Swap a pending raw reply for its summary; the raw text goes to cold storage."""
+        with self.lock:
+            row = self.conn.execute("SELECT content FROM messages WHERE id = ? AND pending = 1", (msg_id,)).fetchone()
+        if row is None:
+            return  # history was cleared since the reply was queued
+        try:
+            summary_ai = self.summarize(row[0])
+        except Exception as e:
+            print(f"{Fore.RED}>> Failed to summarize response: {e}. Keeping AI response as original text.{Style.RESET_ALL}")
+            summary_ai = ""
+        with self.lock, tracer.span("memory.save", op="summary"):
+            with self.conn:
+                if summary_ai:
+                    updated = self.conn.execute("UPDATE messages SET content = ?, pending = 0 WHERE id = ? AND pending = 1",
+                                                (summary_ai, msg_id)).rowcount
+                    if updated:
+                        self.conn.execute(ARCHIVE_INSERT, (msg_id, 'assistant', self._pack(row[0])))
+                else:
+                    self.conn.execute("UPDATE messages SET pending = 0 WHERE id = ?", (msg_id,))
+            self._committed()
+
+    # --- compaction ---
+    @staticmethod
+    def _pack(text):
+        return zlib.compress(text.encode('utf-8'))
+
+    @staticmethod
+    def _unpack(blob):
+        return zlib.decompress(blob).decode('utf-8')
+
+    def _summarize_block(self, what, text):
+        prompt = BLOCK_PROMPT.format(what=what, words=MEMORY_BLOCK_SUMMARY_WORDS, text=text)
+        with self.llm_gate:
+            resp = ollama.generate(
+                model=SUMMARY_MODEL,
+                prompt=prompt,
+                keep_alive=KEEP_ALIVE,
+                options={**OLLAMA_COMMON_OPTIONS, 'num_predict': MEMORY_BLOCK_SUMMARY_WORDS * 3},
+            )
+        return resp['response'].strip().split("</think>")[-1].strip()
+
+    def _compactable_rounds(self):
+        """
+        The oldest MEMORY_BLOCK_ROUNDS rounds between the pinned first round and the hot window, stopping at
+        the first reply still waiting for its zip summary (blocks must stay contiguous).
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT u.id, u.content, a.content, a.pending FROM messages u "
+                "LEFT JOIN messages a ON a.id = u.id + 1 AND a.role = 'assistant' "
+                "WHERE u.role = 'user' AND u.id > (SELECT id FROM messages ORDER BY id LIMIT 1 OFFSET 1) "
+                "AND u.id < (SELECT MIN(id) FROM (SELECT id FROM messages ORDER BY id DESC LIMIT ?)) "
+                "ORDER BY u.id LIMIT ?", (max(MEMORY_HOT_ROUNDS, 1) * 2, MEMORY_BLOCK_ROUNDS)).fetchall()
+        rounds = []
+        for user_id, question, answer, pending in rows:
+            if answer is None or pending:
+                break
+            rounds.append((user_id, question, answer))
+        return rounds
+
+    def _compact(self):
+        """
+        One compaction step: fold the oldest rounds outside the hot window into a level-1 block, then fold
+        every level that has MEMORY_BLOCK_FANOUT open blocks into the next. At most one level-1 block per
+        step, so a long backlog drains one block per turn instead of occupying the model at once.
+        """
+        rounds = self._compactable_rounds()
+        if len(rounds) >= MEMORY_BLOCK_ROUNDS and not self._fold_rounds(rounds):
+            return
+        for level in range(1, MEMORY_BLOCK_LEVELS):
+            with self.lock:
+                blocks = self.conn.execute(
+                    "SELECT id, first_id, last_id, rounds, content FROM blocks WHERE level = ? AND folded = 0 "
+                    "ORDER BY id LIMIT ?", (level, MEMORY_BLOCK_FANOUT)).fetchall()
+            if len(blocks) < MEMORY_BLOCK_FANOUT or not self._fold_blocks(level, blocks):
+                return
+
+    def _fold_rounds(self, rounds):
+        """Summarize rounds into a level-1 block and move their messages to cold storage."""
+        text = "\n\n".join(f"User: {q}\nAssistant: {a}" for _, q, a in rounds)
+        first_id, last_id = rounds[0][0], rounds[-1][0] + 1
+        t0 = time.perf_counter()
+        try:
+            with tracer.span("memory.compact", level=1, rounds=len(rounds)):
+                summary = self._summarize_block("conversation rounds", text)
+        except Exception as e:
+            print(f"{Fore.RED}>> Failed to compact old rounds: {e}. Will retry after the next turn.{Style.RESET_ALL}")
+            return False
+        seconds = time.perf_counter() - t0
+        if not summary:
+            return False
+        with self.lock, tracer.span("memory.save", op="compact"):
+            with self.conn:
+                rows = self.conn.execute("SELECT id, role, content FROM messages WHERE id BETWEEN ? AND ?",
+                                         (first_id, last_id)).fetchall()
+                if len(rows) != len(rounds) * 2:
+                    return False  # history was cleared meanwhile
+                self.conn.executemany(ARCHIVE_INSERT, [(i, role, self._pack(c)) for i, role, c in rows])
+                self.conn.execute("DELETE FROM messages WHERE id BETWEEN ? AND ?", (first_id, last_id))
+                self.conn.execute(
+                    "INSERT INTO blocks (level, first_id, last_id, rounds, content, source_tokens, seconds) "
+                    "VALUES (1, ?, ?, ?, ?, ?, ?)",
+                    (first_id, last_id, len(rounds), summary, estimate_tokens(text), seconds))
+            self._committed()
+        return True
+
+    def _fold_blocks(self, level, blocks):
+        """Summarize MEMORY_BLOCK_FANOUT consecutive blocks of `level` into one block of the next level."""
+        text = "\n\n".join(f"Part {i}: {content}" for i, (*_, content) in enumerate(blocks, 1))
+        t0 = time.perf_counter()
+        try:
+            with tracer.span("memory.compact", level=level + 1, rounds=sum(b[3] for b in blocks)):
+                summary = self._summarize_block("summaries of consecutive parts of one conversation", text)
+        except Exception as e:
+            print(f"{Fore.RED}>> Failed to fold level-{level} summaries: {e}. Will retry after the next turn.{Style.RESET_ALL}")
+            return False
+        seconds = time.perf_counter() - t0
+        if not summary:
+            return False
+        ids = [b[0] for b in blocks]
+        with self.lock, tracer.span("memory.save", op="compact"):
+            with self.conn:
+                updated = self.conn.execute(
+                    f"UPDATE blocks SET folded = 1 WHERE folded = 0 AND id IN ({','.join('?' * len(ids))})", ids).rowcount
+                if updated != len(ids):
+                    return False  # history was cleared meanwhile
+                self.conn.execute(
+                    "INSERT INTO blocks (level, first_id, last_id, rounds, content, source_tokens, seconds) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (level + 1, blocks[0][1], blocks[-1][2], sum(b[3] for b in blocks), summary,
+                     estimate_tokens(text), seconds))
+            self._committed()
+        return True
+
+    def digest(self, max_tokens=MEMORY_DIGEST_MAX_TOKENS):
+        """
+        The open block summaries as one prompt section (empty before the first compaction). Blocks are listed
+        oldest first with the rounds they cover; the oldest ones are left out when they exceed `max_tokens`.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT rounds, content FROM blocks WHERE folded = 0 ORDER BY first_id").fetchall()
+        lines, start = [], 2  # round 1 is pinned and never compacted
+        for rounds, content in rows:
+            lines.append(f"- Rounds {start}-{start + rounds - 1}: {content}")
+            start += rounds
+        kept, used = [], estimate_tokens(DIGEST_HEADER)
+        for line in reversed(lines):
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        return DIGEST_HEADER + "\n".join(reversed(kept)) if kept else ""
+
+    def compaction_stats(self):
+        """Blocks per level with their compression ratio and cost, plus the cold storage size."""
+        with self.lock:
+            blocks = self.conn.execute("SELECT level, rounds, source_tokens, content, seconds FROM blocks").fetchall()
+            archived, packed = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM archive").fetchone()
+        if not blocks:
+            return f"no compacted rounds yet | cold storage {archived} msgs, {packed / 1e3:.0f} KB"
+        parts = []
+        for level in sorted({b[0] for b in blocks}):
+            rows = [b for b in blocks if b[0] == level]
+            source = sum(b[2] for b in rows)
+            summary = sum(estimate_tokens(b[3]) for b in rows)
+            parts.append(f"L{level} {len(rows)} blocks ({sum(b[1] for b in rows)} rounds) {source:,} -> {summary:,} tokens "
+                         f"({source / max(summary, 1):.1f}x, {sum(b[4] for b in rows) / len(rows):.1f}s/block)")
+        parts.append(f"cold storage {archived} msgs, {packed / 1e3:.0f} KB")
+        return " | ".join(parts)
+
+    def wait_for_summaries(self):
+        """Block until every queued summary has been processed."""
+        self.summary_queue.join()
+
+    def close(self, timeout=5):
+        """
+        Stop the worker after its current job and close the journal; unfinished summaries stay pending.
+        The connection is only closed once the worker is out: if it is still inside an LLM call after
+        `timeout` seconds, it closes the connection itself when that call returns.
+        """
+        self.closing.set()
+        self.summary_queue.put(None)
+        self.worker.join(timeout)
+        with self.lock:
+            if self.worker_done:
+                self._close_conn()
+            else:
+                self.close_pending = True
+
+    def _close_conn(self):
+        try:
+            self.compact()
+        except sqlite3.Error:
+            pass
+        self.conn.close()
+
+    def pending_ids(self):
+        with self.lock:
+            return [r[0] for r in self.conn.execute("SELECT id FROM messages WHERE pending = 1 ORDER BY id")]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    @staticmethod
+    def _as_msgs(rows):
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    def get_recent_history(self, lookback=None):
+        """
+        The first round plus the last `lookback` messages (default: what get_limited_msgs keeps),
+        read straight from the journal without loading the rest of the history.
+        """
+        head, tail = self.get_recent_rows(lookback)
+        return head + self._as_msgs([r[1:] for r in tail])
+
+    def get_recent_rows(self, lookback=None):
+        """get_recent_history split in two: (first round as messages, later messages as (id, role, content) rows)."""
+        if lookback is None:
+            lookback = (HISTORY_LIMIT - 1) * 2
+        with self.lock:
+            head = self.conn.execute("SELECT id, role, content FROM messages ORDER BY id LIMIT 2").fetchall()
+            tail = self.conn.execute("SELECT id, role, content FROM messages ORDER BY id DESC LIMIT ?",
+                                     (max(lookback, 0),)).fetchall()
+        head_ids = {r[0] for r in head}
+        return self._as_msgs([r[1:] for r in head]), [r for r in reversed(tail) if r[0] not in head_ids]
+
+    def recall(self, query, k=MEMORY_RECALL_TOP_K, window=CONTEXT_HISTORY_MAX_MSGS):
+        """
+        The `k` older rounds most relevant to `query` (BM25 over the recall index), as chronological messages.
+        Only rounds outside the first round and the last `window` messages are searched: those are in the prompt already.
+        """
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t not in RECALL_STOPWORDS]
+        if not terms or k <= 0:
+            return []
+        with self.lock, tracer.span("memory.recall", k=k) as span:
+            # Terms found in more than MEMORY_RECALL_MAX_DF of all turns barely move BM25 but make it score
+            # most of the index; dropping them keeps lookups fast on long histories. Below MEMORY_RECALL_MIN_DF
+            # turns nothing is dropped: a topic the user keeps coming back to is what recall is for
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'recall_turns'").fetchone()
+            limit = max(int(int(row[0]) * MEMORY_RECALL_MAX_DF), MEMORY_RECALL_MIN_DF) if row else 0
+            df = dict(self.conn.execute(
+                f"SELECT term, turns FROM recall_df WHERE term IN ({','.join('?' * len(terms))})", terms).fetchall())
+            terms = [t for t in terms if 0 < df.get(t, 0) <= limit]
+            span['terms'] = len(terms)
+            if not terms:
+                return []
+            match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+            row = self.conn.execute("SELECT id FROM messages ORDER BY id LIMIT 1 OFFSET 1").fetchone()
+            if row is None:
+                return []
+            lo = row[0]
+            # compacted rounds left the journal, so the window is counted after the pinned round
+            hi = self.conn.execute("SELECT MIN(id) FROM (SELECT id FROM messages WHERE id > ? ORDER BY id DESC LIMIT ?)",
+                                   (lo, max(window, 1))).fetchone()[0]
+            if hi is None or hi <= lo + 1:
+                return []
+            ids = [r[0] for r in self.conn.execute(
+                "SELECT rowid FROM turns_fts WHERE turns_fts MATCH ? AND rowid > ? AND rowid < ? "
+                "ORDER BY bm25(turns_fts) LIMIT ?", (match, lo, hi - 1, k))]  # the reply (id + 1) must be older too
+            rows = []
+            share = MEMORY_RECALL_MAX_TOKENS // (2 * k)
+            for msg_id in sorted(ids):
+                pair = self._round(msg_id)
+                if [role for role, _ in pair] == ['user', 'assistant']:
+                    # originals from cold storage can be long: each message gets an equal share of the budget
+                    rows.extend((role, truncate_to_tokens(content, share)) for role, content in pair)
+            span['hits'] = len(rows) // 2
+        return self._as_msgs(rows)
+
+    def _round(self, user_id):
+        """Inside the lock: the (role, content) pair starting at `user_id`, from the journal or from cold storage."""
+        pair = self.conn.execute("SELECT role, content FROM messages WHERE id IN (?, ?) ORDER BY id",
+                                 (user_id, user_id + 1)).fetchall()
+        if len(pair) == 2:
+            return pair
+        return [(role, self._unpack(blob)) for role, blob in self.conn.execute(
+            "SELECT role, content FROM archive WHERE id IN (?, ?) ORDER BY id", (user_id, user_id + 1))]
 
     def get_full_history(self):
-        return self.history
+        # Replies still pending a summary are returned as their raw text; compacted rounds come from cold storage
+        with self.lock:
+            hot = {i: (role, content) for i, role, content in self.conn.execute("SELECT id, role, content FROM messages")}
+            cold = {i: (role, self._unpack(blob)) for i, role, blob in self.conn.execute(
+                "SELECT id, role, content FROM archive") if i not in hot}
+        merged = {**cold, **hot}
+        return self._as_msgs([merged[i] for i in sorted(merged)])
@@ -0,0 +1,339 @@
+# mock_server.py
+"""
+Local mock HTTP servers used by the benchmarks (no network access or GPU needed):
+canned SERP and article pages, and an Ollama API stand-in
+"""
+import contextlib
+import html
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+
+from context import estimate_tokens, QUESTION_SEPARATOR
+
+ARTICLE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Mock article {n}</title></head>
+<body>
+<nav>Home | News | About | Contact</nav>
+<article>
+<h1>Mock article {n}</h1>
+{paragraphs}
+</article>
+<footer>Copyright mock site</footer>
+</body></html>"""
+
+
+SPA_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Mock app {n}</title></head>
+<body><noscript>Please enable JavaScript to view this page.</noscript><div id="root"></div>
+<script>
+document.getElementById('root').innerHTML = {paragraphs!r};
+</script>
+</body></html>"""
+
+
+SERP_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{query} at Mock Search</title>
+<style>article {{ height: 120px; }}</style></head>
+<body>
+<section id="results"></section>
+<button id="more-results" style="display:none">More Results</button>
+<script>
+const total = {total}, perPage = {per_page}, loadDelay = {load_delay} * 1000, renderDelay = {render_delay} * 1000;
+const pageDelay = {page_delay};
+let shown = 0;
+const btn = document.getElementById('more-results');
+function addPage() {{
+    const box = document.getElementById('results');
+    for (let i = 0; i < perPage && shown < total; i++, shown++) {{
+        const art = document.createElement('article');
+        art.setAttribute('data-testid', 'result');
+        art.innerHTML = '<h2><a data-testid="result-title-a" href="/article/' + shown + (pageDelay ? '?delay=' + pageDelay : '') + '">Result ' + shown + '</a></h2>';
+        box.appendChild(art);
+    }}
+    btn.style.display = 'none';
+}}
+// The button only renders once the user scrolls near the bottom, like the real SERP
+window.addEventListener('scroll', () => {{
+    if (shown < total) setTimeout(() => {{ btn.style.display = 'block'; }}, renderDelay);
+}});
+btn.addEventListener('click', () => setTimeout(addPage, loadDelay));
+setTimeout(addPage, loadDelay);
+</script>
+</body></html>"""
+
+
+def serp_html(query, total=30, per_page=10, load_delay=0.3, render_delay=0.1, page_delay=0):
+    return SERP_TEMPLATE.format(query=html.escape(query), total=total, per_page=per_page,
+                                load_delay=load_delay, render_delay=render_delay, page_delay=page_delay)
+
+
+def article_html(n, paragraphs=8):
+    body = "\n".join(
+        f"<p>Paragraph {i} of mock article {n}: bearing fault diagnosis datasets record vibration "
+        f"and motor current signals under several operating conditions for benchmark purposes.</p>"
+        for i in range(1, paragraphs + 1)
+    )
+    return ARTICLE_TEMPLATE.format(n=n, paragraphs=body)
+
+
+def spa_html(n):
+    """Client-side rendered page: the article text only exists after scripts run."""
+    return SPA_TEMPLATE.format(n=n, paragraphs=article_html(n).split("<article>")[1].split("</article>")[0])
+
+
+def ddg_html(base, query, total=10, offset=0, lite=False):
+    """DuckDuckGo HTML (or Lite) result markup: redirect links to /article/<n>, led by one ad."""
+    link_class = "result-link" if lite else "result__a"
+    rows = ['<div class="result result--ad"><a class="%s" href="//duckduckgo.com/y.js?ad_domain=ads.example">Ad</a></div>'
+            % link_class]
+    for n in range(offset, offset + total):
+        target = quote(f"{base}/article/{n}", safe="")
+        rows.append(f'<div class="result"><a class="{link_class}" href="//duckduckgo.com/l/?uddg={target}&amp;rut=x">'
+                    f'Result {n} for {html.escape(query)}</a></div>')
+    return f"<!DOCTYPE html><html><body>{''.join(rows)}</body></html>"
+
+
+def searx_json(base, query, total=10, offset=0):
+    return json.dumps({'query': query, 'results': [
+        {'url': f"{base}/article/{n}", 'title': f"Result {n} for {query}", 'engine': "mock"}
+        for n in range(offset, offset + total)]})
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+      /article/<n>?delay=<s>   article page, response delayed by <s> seconds
+      /spa/<n>?delay=<s>       JS-rendered article (empty HTML until scripts run)
+      /dead                    closes the connection without a response
+      /serp?q=&total=&per_page=&load_delay=&render_delay=&page_delay=
+                               DuckDuckGo-like result page with a 'More Results' button;
+                               its result links carry ?delay=<page_delay>
+      /ddg_html?q=&total=&offset=&status=, /ddg_lite?...
+                               DuckDuckGo HTML/Lite markup linking to /article/<offset>...; status other
+                               than 200 returns an empty bot-check page
+      /searx?q=&total=&offset= SearXNG-style JSON results
+    """
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def _send(self, body, content_type="text/html; charset=utf-8", status=200):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        with contextlib.suppress(BrokenPipeError, ConnectionResetError):  # the client gave up (deadline)
+            self.wfile.write(data)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        delay = float(query.get('delay', ['0'])[0])
+        if delay:
+            time.sleep(delay)
+
+        if parsed.path.startswith("/article/"):
+            self._send(article_html(parsed.path.rsplit("/", 1)[-1]))
+        elif parsed.path.startswith("/spa/"):
+            self._send(spa_html(parsed.path.rsplit("/", 1)[-1]))
+        elif parsed.path == "/serp":
+            opts = {k: float(query[k][0]) for k in ('total', 'per_page', 'load_delay', 'render_delay', 'page_delay')
+                    if k in query}
+            for k in ('total', 'per_page'):
+                if k in opts:
+                    opts[k] = int(opts[k])
+            self._send(serp_html(query.get('q', [''])[0], **opts))
+        elif parsed.path in ("/ddg_html", "/ddg_lite", "/searx"):
+            q = query.get('q', [''])[0]
+            opts = {k: int(query[k][0]) for k in ('total', 'offset') if k in query}
+            status = int(query.get('status', ['200'])[0])
+            base = f"http://{self.headers.get('Host')}"
+            if status != 200:
+                self._send("<html><body>anomaly</body></html>", status=status)
+            elif parsed.path == "/searx":
+                self._send(searx_json(base, q, **opts), content_type="application/json")
+            else:
+                self._send(ddg_html(base, q, lite=parsed.path == "/ddg_lite", **opts))
+        elif parsed.path == "/dead":
+            self.close_connection = True
+        else:
+            self._send("not found", status=404)
+
+
+INTENT_INPUT_RE = re.compile(r"User current input: (.*?)\n\nRequirements:", re.S)
+WORD_TOKEN_RE = re.compile(r"\S+\s*")
+
+
+def common_prefix_len(a, b):
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:  # longest equal prefix, compared in C slices
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Ollama API with a simulated speed. Options (MockServer keyword arguments):
+      ttft            seconds before the first token, on top of prompt processing
+      prefill_tps     prompt tokens processed per second
+      tokens_per_s    generation speed
+      answer_tokens   length of generated answers without a recorded one
+      answers         {question: recorded answer}, streamed word by word
+      intents         {question: {'search': bool, 'keywords': str}}; other questions search for themselves
+      slots           requests processed at once, the rest wait (like OLLAMA_NUM_PARALLEL); 0 = unlimited
+      kv_slots        prompt caches kept like Ollama's per-slot KV cache: a request picks the free slot sharing the
+                      longest prefix with it and only the rest is prefilled (and counted in prompt_eval_count); 0 = off
+    Routes:
+      POST /api/chat       format='json' returns an intent decision, otherwise an answer (streamed or not)
+      POST /api/generate   short summary of the prompt (zip-mode memory)
+    """
+    DEFAULTS = {'ttft': 0.2, 'prefill_tps': 2000.0, 'tokens_per_s': 100.0, 'answer_tokens': 150,
+                'answers': {}, 'intents': {}, 'slots': 0, 'kv_slots': 4}
+
+    def log_message(self, format, *args):
+        pass
+
+    def option(self, name):
+        return getattr(self.server, 'options', {}).get(name, self.DEFAULTS[name])
+
+    @staticmethod
+    def _render(path, request):
+        if path == "/api/generate":
+            return request.get('prompt', "")
+        return "".join(f"<|{m.get('role')}|>{m.get('content', '')}" for m in request.get('messages', []))
+
+    def _take_slot(self, prompt):
+        """Free KV slot sharing the longest prefix with `prompt` (least recently used on ties); (slot, cached chars)."""
+        with self.server.kv_lock:
+            kv = self.server.kv
+            while len(kv) < self.option('kv_slots'):
+                kv.append({'text': "", 'busy': False, 'used': 0.0})
+            free = [slot for slot in kv if not slot['busy']]
+            if not free:
+                return None, 0
+            shared, slot = max(((common_prefix_len(slot['text'], prompt), -slot['used'], i)
+                                for i, slot in enumerate(kv) if not slot['busy']))[0::2]
+            kv[slot]['busy'] = True
+            return kv[slot], shared
+
+    def _reply_text(self, path, request):
+        if path == "/api/generate":
+            prompt = request.get('prompt', "")
+            return estimate_tokens(prompt), "Summary: " + " ".join(prompt.split("Content:", 1)[-1].split()[:12])
+        messages = request.get('messages', [])
+        prompt_tokens = sum(estimate_tokens(m.get('content', "")) + 4 for m in messages)
+        last = messages[-1].get('content', "") if messages else ""
+        if request.get('format') == 'json':
+            m = INTENT_INPUT_RE.search(last)
+            question = m.group(1).strip() if m else last.strip()
+            intent = self.option('intents').get(question, {'search': True, 'keywords': question})
+            return prompt_tokens, json.dumps(intent, ensure_ascii=False)
+        question = last.split(QUESTION_SEPARATOR)[-1].strip()
+        answer = self.option('answers').get(question)
+        if not answer:
+            answer = " ".join(f"token{i}" for i in range(self.option('answer_tokens')))
+        return prompt_tokens, answer
+
+    def _chunk(self, path, request, text, done, **stats):
+        chunk = {'model': request.get('model', "mock"),
+                 'created_at': datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"), 'done': done}
+        if path == "/api/generate":
+            chunk['response'] = text
+        else:
+            chunk['message'] = {'role': 'assistant', 'content': text}
+        if done:
+            chunk['done_reason'] = "stop"
+            chunk.update(stats)
+        return (json.dumps(chunk, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path not in ("/api/chat", "/api/generate"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        slots = getattr(self.server, 'slots', None)
+        try:
+            with slots or contextlib.nullcontext():
+                self._respond(path, request)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading (cancelled turn)
+
+    def _respond(self, path, request):
+        started = time.perf_counter()
+        prompt_tokens, text = self._reply_text(path, request)
+        tokens = WORD_TOKEN_RE.findall(text) or [""]
+        prompt = self._render(path, request)
+        slot, shared = self._take_slot(prompt)
+        try:
+            self._stream(path, request, started, text, tokens,
+                         max(prompt_tokens - estimate_tokens(prompt[:shared]), 1))
+        finally:
+            if slot is not None:  # the slot now holds this prompt and the generated reply
+                with self.server.kv_lock:
+                    slot.update(text=f"{prompt}<|assistant|>{text}", busy=False, used=time.perf_counter())
+
+    def _stream(self, path, request, started, text, tokens, prompt_tokens):
+        prefill = prompt_tokens / self.option('prefill_tps')
+        first = self.option('ttft') + prefill
+        step = 1 / self.option('tokens_per_s')
+
+        def stats():
+            return {'prompt_eval_count': prompt_tokens, 'prompt_eval_duration': int(prefill * 1e9),
+                    'eval_count': len(tokens), 'eval_duration': int(len(tokens) * step * 1e9),
+                    'total_duration': int((time.perf_counter() - started) * 1e9)}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        if not request.get('stream', True):
+            time.sleep(first + len(tokens) * step)
+            body = self._chunk(path, request, text, True, **stats())
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.end_headers()  # HTTP/1.0: the stream ends when the connection closes
+        for i, token in enumerate(tokens):
+            delay = started + first + i * step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.wfile.write(self._chunk(path, request, token, False))
+            self.wfile.flush()
+        self.wfile.write(self._chunk(path, request, "", True, **stats()))
+
+
+class MockServer:
+    """
+    Run a handler on a background thread: `with MockServer() as srv: srv.url('/article/1')`.
+    Extra keyword arguments are exposed to the handler as `self.server.options`.
+    """
+    def __init__(self, host="127.0.0.1", port=0, handler=MockHandler, **options):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.options = options
+        self.httpd.kv, self.httpd.kv_lock = [], threading.Lock()
+        if options.get('slots'):
+            self.httpd.slots = threading.Semaphore(options['slots'])
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,391 @@
+# providers.py
+"""
+Search providers: where result links come from, queried in parallel and merged
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from urllib.parse import quote_plus, urlparse, parse_qs
+from urllib.request import url2pathname
+import trafilatura
+import urllib3
+from bs4 import BeautifulSoup
+from colorama import Fore, Style
+
+from rank import tokenize, bm25_scores
+from tracing import tracer
+from config import (
+    MAX_SEARCH_RESULTS, SEARCH_PROVIDERS, SEARCH_PROVIDER_SELECT, SEARCH_PROVIDER_FANOUT, SEARCH_PROVIDER_DEADLINES,
+    SEARCH_PROVIDER_MIN_SUCCESS, SEARCH_PROVIDER_PROBES, SEARCH_PROVIDER_REPROBE, SEARCH_PROVIDER_STATS_FILE_PATH,
+    DDG_HTML_URL, DDG_LITE_URL, SEARXNG_URL, LOCAL_INDEX_DIR_PATH, DEEP_READ_HTTP_MAX_BYTES,
+)
+
+LOCAL_INDEX_SUFFIXES = (".txt", ".md", ".html", ".htm")
+STATS_EMA_ALPHA = 0.3  # weight of the newest search in a provider's moving averages
+DEFAULT_DEADLINE = 10
+
+
+class ProviderError(Exception):
+    pass
+
+
+def url_key(url):
+    """Dedup key of a result URL: scheme, 'www.', trailing slash and fragment do not matter."""
+    p = urlparse(url)
+    host = (p.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    key = host + (p.path.rstrip("/") or "/")
+    return f"{key}?{p.query}" if p.query else key
+
+
+def merge_links(lists):
+    """Round-robin over the providers' lists (best provider first at each rank), keeping the first of each URL."""
+    merged, seen = [], set()
+    for rank in range(max((len(links) for links in lists), default=0)):
+        for links in lists:
+            if rank < len(links):
+                key = url_key(links[rank]['url'])
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(links[rank])
+    return merged
+
+
+def local_path(url):
+    """Filesystem path of a file:// result inside LOCAL_INDEX_DIR, or None (other files are never read)."""
+    if not url.startswith("file:"):
+        return None
+    path = os.path.realpath(url2pathname(urlparse(url).path))
+    return path if path.startswith(os.path.realpath(LOCAL_INDEX_DIR_PATH) + os.sep) else None
+
+
+def read_local_file(path):
+    """Text of a local index file; HTML is extracted like a web page."""
+    with open(path, 'rb') as f:
+        body = f.read(DEEP_READ_HTTP_MAX_BYTES)
+    if path.lower().endswith((".html", ".htm")):
+        return trafilatura.extract(body) or ""
+    return body.decode('utf-8', errors='replace')
+
+
+class SearchProvider:
+    """One source of result links. `links(query, should_stop)` returns [{'title', 'url'}, ...], best first."""
+    name = ""
+    in_browser = False  # runs on the caller's thread (Playwright objects are bound to it)
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.deadline = SEARCH_PROVIDER_DEADLINES.get(self.name, DEFAULT_DEADLINE)
+
+    def available(self):
+        return True
+
+    def links(self, query, should_stop=None):
+        raise NotImplementedError
+
+
+class DuckDuckGoHtmlProvider(SearchProvider):
+    """DuckDuckGo's no-JavaScript result page: one GET, results already in the markup."""
+    name = "ddg_html"
+    url = DDG_HTML_URL
+    selector = "a.result__a"
+
+    def links(self, query, should_stop=None):
+        body = self.owner.fetch(self.url.format(query=quote_plus(query)), self.deadline)
+        soup = BeautifulSoup(body, "html.parser")
+        links, seen = [], set()
+        for a in soup.select(self.selector):
+            url = self._target(a.get('href', ""))
+            if not url or url in seen or a.find_parent(class_="result--ad"):
+                continue
+            seen.add(url)
+            links.append({'title': a.get_text(" ", strip=True), 'url': url})
+        return links
+
+    @staticmethod
+    def _target(href):
+        """Result URL behind DuckDuckGo's //duckduckgo.com/l/?uddg=... redirect; ads (y.js) are dropped."""
+        if href.startswith("//"):
+            href = "https:" + href
+        p = urlparse(href)
+        if p.path.startswith("/l/"):
+            href = parse_qs(p.query).get('uddg', [""])[0]
+            p = urlparse(href)
+        if p.scheme not in ("http", "https") or (p.hostname or "").endswith("duckduckgo.com"):
+            return None
+        return href
+
+
+class DuckDuckGoLiteProvider(DuckDuckGoHtmlProvider):
+    """DuckDuckGo Lite: table markup, even smaller than the HTML endpoint."""
+    name = "ddg_lite"
+    url = DDG_LITE_URL
+    selector = "a.result-link"
+
+
+class SearxngProvider(SearchProvider):
+    """A SearXNG instance's JSON API (SEARXNG_URL), which already merges several engines."""
+    name = "searxng"
+
+    def available(self):
+        return bool(SEARXNG_URL)
+
+    def links(self, query, should_stop=None):
+        data = json.loads(self.owner.fetch(SEARXNG_URL.format(query=quote_plus(query)), self.deadline))
+        return [{'title': r.get('title', ""), 'url': r['url']} for r in data.get('results', [])
+                if r.get('url', "").startswith(("http://", "https://"))]
+
+
+class LocalIndexProvider(SearchProvider):
+    """
+    BM25 over the files in LOCAL_INDEX_DIR (notes, exported docs). The tokenized files are kept
+    in memory and re-read when their modification time changes. Results are file:// URLs, read
+    by SearchEngine.search without HTTP.
+    """
+    name = "local"
+
+    def __init__(self, owner):
+        super().__init__(owner)
+        self.files = {}  # path -> (mtime, title, tokens)
+        self.lock = threading.Lock()
+
+    def available(self):
+        return os.path.isdir(LOCAL_INDEX_DIR_PATH)
+
+    def _refresh(self):
+        seen = set()
+        for root, _, names in os.walk(LOCAL_INDEX_DIR_PATH):
+            for name in names:
+                if not name.lower().endswith(LOCAL_INDEX_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                mtime = os.path.getmtime(path)
+                seen.add(path)
+                if path in self.files and self.files[path][0] == mtime:
+                    continue
+                text = read_local_file(path)
+                first = next((line.strip("# \t") for line in text.splitlines() if line.strip()), "")
+                title = first[:120] if not name.lower().endswith((".html", ".htm")) and first else Path(name).stem
+                self.files[path] = (mtime, title, tokenize(title + "\n" + text))
+        for path in set(self.files) - seen:
+            del self.files[path]
+
+    def links(self, query, should_stop=None):
+        with self.lock:
+            self._refresh()
+            items = list(self.files.items())
+        scores = bm25_scores(tokenize(query), [tokens for _, (_, _, tokens) in items])
+        ranked = sorted(((score, path, title) for score, (path, (_, title, _)) in zip(scores, items) if score > 0),
+                        reverse=True)
+        return [{'title': title, 'url': Path(path).as_uri()} for _, path, title in ranked[:MAX_SEARCH_RESULTS]]
+
+
+class BrowserProvider(SearchProvider):
+    """The Playwright scraper of the full DuckDuckGo page (SearchEngine._collect_links)."""
+    name = "browser"
+    in_browser = True
+
+    def available(self):
+        return self.owner.engine.browser_enabled
+
+    def links(self, query, should_stop=None):
+        engine = self.owner.engine
+        return engine._in_browser(engine._serp_links, query, should_stop=should_stop, within=self.deadline)
+
+
+PROVIDER_TYPES = {cls.name: cls for cls in (DuckDuckGoHtmlProvider, DuckDuckGoLiteProvider, SearxngProvider,
+                                            LocalIndexProvider, BrowserProvider)}
+
+
+class ProviderStats:
+    """
+    Per provider: call counts plus moving averages of latency, success (at least one link within the
+    deadline) and yield (links). Persisted as one JSON file; shared by all sessions in server mode.
+    """
+    def __init__(self, path=SEARCH_PROVIDER_STATS_FILE_PATH):
+        self.path = path
+        self.data = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except Exception as e:
+                print(f"{Fore.RED}>> ⚠️ Failed to load provider stats: {e}. Starting fresh.{Style.RESET_ALL}")
+
+    def record(self, name, seconds, links, status):
+        ok = status == "ok" and links > 0
+        with self.lock:
+            s = self.data.setdefault(name, {'calls': 0, 'ok': 0, 'timeouts': 0, 'errors': 0, 'links': 0,
+                                            'latency': None, 'success': None, 'yield': None, 'last': 0})
+            s['calls'] += 1
+            s['ok'] += ok
+            s['timeouts'] += status == "timeout"
+            s['errors'] += status not in ("ok", "timeout")
+            s['links'] += links
+            for key, value in (('latency', seconds), ('success', 1.0 if ok else 0.0), ('yield', links)):
+                s[key] = value if s[key] is None else s[key] + STATS_EMA_ALPHA * (value - s[key])
+            s['last'] = time.time()
+            self.dirty = True
+
+    def get(self, name):
+        with self.lock:
+            return dict(self.data.get(name, {}))
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or not self.path:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+class ProviderSet:
+    """
+    The configured SEARCH_PROVIDERS of one SearchEngine. links() queries a selection of them at once:
+    HTTP providers on worker threads, the browser on the calling thread. Each is waited for until its
+    own deadline, and the links are merged and deduplicated by URL.
+    """
+    def __init__(self, engine, headers, names=SEARCH_PROVIDERS):
+        self.engine = engine
+        self.headers = headers
+        self.providers = [PROVIDER_TYPES[name](self) for name in names]
+        self.stats = ProviderStats()
+        self.http = None
+        self.pool = None
+        self.running = {}  # provider name -> future of its latest call, which may outlive the search that made it
+        self.last = []  # (provider name, links, seconds, status) of the most recent links() call
+
+    def fetch(self, url, deadline):
+        """Worker thread: GET `url` within `deadline` seconds; raises ProviderError unless HTTP 200."""
+        if self.http is None:
+            self.http = urllib3.PoolManager(num_pools=8, maxsize=4)
+        resp = self.http.request("GET", url, headers=self.headers,
+                                 timeout=urllib3.Timeout(connect=min(5, deadline), read=deadline),
+                                 retries=urllib3.Retry(total=0, redirect=3, raise_on_redirect=False))
+        if resp.status != 200:  # DuckDuckGo answers bot checks with 202 and no results
+            raise ProviderError(f"HTTP {resp.status}")
+        return resp.data
+
+    def select(self):
+        """
+        The providers to query, best first. "all" takes every available one; "auto" takes the
+        SEARCH_PROVIDER_FANOUT fastest reliable ones, plus those still being probed or due for a re-probe.
+        """
+        usable = [p for p in self.providers if p.available()]
+        if SEARCH_PROVIDER_SELECT == "all":
+            return usable
+        stats = {p.name: self.stats.get(p.name) for p in usable}
+        now = time.time()
+        probing = [p for p in usable if stats[p.name].get('calls', 0) < SEARCH_PROVIDER_PROBES
+                   or now - stats[p.name].get('last', 0) > SEARCH_PROVIDER_REPROBE]
+        reliable = sorted((p for p in usable if p not in probing
+                           and stats[p.name]['success'] >= SEARCH_PROVIDER_MIN_SUCCESS),
+                          key=lambda p: stats[p.name]['latency'])
+        if not reliable:
+            return usable  # nothing has proven itself yet: ask everyone
+        picked = reliable[:SEARCH_PROVIDER_FANOUT]
+        return picked + [p for p in probing if p not in picked]
+
+    def _run(self, provider, query, should_stop, started):
+        t0 = time.monotonic()
+        with tracer.span("provider." + provider.name) as span:
+            try:
+                links, status = provider.links(query, should_stop) or [], "ok"
+            except ProviderError as e:
+                links, status = [], f"failed: {e}"
+            except Exception as e:  # MaxRetryError wraps the real cause (connection refused, timeout, ...)
+                links, status = [], f"failed: {getattr(e, 'reason', e).__class__.__name__}"
+            seconds = time.monotonic() - t0
+            if status == "ok" and time.monotonic() - started > provider.deadline:
+                status = "timeout"
+            span['links'] = len(links)
+            span['status'] = status
+        self.stats.record(provider.name, seconds, len(links), status)
+        return links, seconds, status
+
+    def links(self, query, should_stop=None):
+        """
+        Links for `query` from the selected providers, merged round-robin in selection order.
+        Waiting stops early once MAX_SEARCH_RESULTS unique links are in or `should_stop()` turns true;
+        providers still running then record their stats when they finish.
+        """
+        chosen = self.select()
+        if not chosen:
+            return []
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=max(len(self.providers), 1), thread_name_prefix="provider")
+        started = time.monotonic()
+        # a provider still busy with an earlier search (abandoned past its deadline) sits this one out
+        chosen = [p for p in chosen if p.in_browser or p.name not in self.running or self.running[p.name].done()]
+        futures = {}
+        for p in chosen:
+            if not p.in_browser:
+                future = self.running[p.name] = self.pool.submit(tracer.bind(self._run, p, query, None, started))
+                futures[future] = p
+        results = {}
+
+        def collected():
+            for future, p in futures.items():
+                if future.done() and p.name not in results:
+                    results[p.name] = future.result()
+            return merge_links([results[p.name][0] for p in chosen if p.name in results])
+
+        def stopped():
+            return bool(should_stop and should_stop())
+
+        for p in chosen:
+            if p.in_browser:
+                # the browser stops paginating at its deadline or once the HTTP providers have enough links
+                stop = lambda: (stopped() or time.monotonic() - started > p.deadline
+                                or len(collected()) >= MAX_SEARCH_RESULTS)
+                results[p.name] = self._run(p, query, stop, started)
+
+        pending = set(futures)
+        while pending and not stopped() and len(collected()) < MAX_SEARCH_RESULTS:
+            now = time.monotonic()
+            pending = {f for f in pending if not f.done() and now - started < futures[f].deadline}
+            if pending:
+                wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+        merged = collected()
+
+        self.last = [(p.name,) + results.get(p.name, ([], time.monotonic() - started, "abandoned")) for p in chosen]
+        summary = " | ".join(f"{name} {len(links)} ({seconds:.1f}s{'' if status == 'ok' else ', ' + status})"
+                             for name, links, seconds, status in self.last)
+        print(f"{Fore.LIGHTBLACK_EX}   🔎 Links: {summary} -> {len(merged)} unique{Style.RESET_ALL}")
+        try:
+            self.stats.save()
+        except Exception as e:
+            print(f"{Fore.RED}>> ⚠️ Failed to save provider stats: {e}{Style.RESET_ALL}")
+        return merged
+
+    def stats_text(self):
+        parts = []
+        for p in self.providers:
+            s = self.stats.get(p.name)
+            if not p.available():
+                parts.append(f"{p.name} off")
+            elif not s:
+                parts.append(f"{p.name} untried")
+            else:
+                parts.append(f"{p.name} {s['calls']} calls, {s['ok'] / s['calls']:.0%} ok, ~{s['latency']:.1f}s, "
+                             f"~{s['yield']:.0f} links")
+        picked = ", ".join(p.name for p in self.select()) or "none"
+        return f"{' | '.join(parts)} | next: {picked}"
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        try:
+            self.stats.save()
+        except Exception:
+            pass
@@ -0,0 +1,145 @@
+# rank.py
+"""
+Relevance ranking and near-duplicate removal for search documents (pure CPU, no model calls)
+"""
+import math
+import re
+from collections import Counter
+from colorama import Fore, Style
+
+from config import RANK_PASSAGE_CHARS, RANK_TOP_K, RANK_MAX_CHARS, RANK_DEDUP_THRESHOLD
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_DOC_RE = re.compile(r'^Source: "(?P<title>.*)"\nURL: (?P<url>.*)\nContent: (?P<content>.*)$', re.S)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+SHINGLE_SIZE = 5
+
+
+def tokenize(text):
+    """Lowercase word tokens; CJK runs become character bigrams so Chinese text is searchable without a segmenter."""
+    text = text.lower()
+    tokens = _WORD_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        tokens.extend(run[i:i + 2] for i in range(max(len(run) - 1, 1)))
+    return tokens
+
+
+def parse_doc(doc):
+    """Split a SearchEngine doc string back into (title, url, content)."""
+    m = _DOC_RE.match(doc.strip())
+    if not m:
+        return "", "", doc
+    return m.group('title'), m.group('url'), m.group('content')
+
+
+def format_doc(title, url, content):
+    return f"Source: \"{title}\"\nURL: {url}\nContent: {content}\n"
+
+
+def split_passages(content, target_chars=RANK_PASSAGE_CHARS):
+    """Group consecutive lines into passages of roughly `target_chars` characters."""
+    passages, current = [], []
+    size = 0
+    for line in content.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        current.append(line)
+        size += len(line)
+        if size >= target_chars:
+            passages.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def shingles(tokens, k=SHINGLE_SIZE):
+    if len(tokens) < k:
+        return {hash(tuple(tokens))} if tokens else set()
+    return {hash(tuple(tokens[i:i + k])) for i in range(len(tokens) - k + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def bm25_scores(query_tokens, passage_tokens):
+    """Okapi BM25 of every passage against the query, using the passages themselves as the corpus."""
+    n = len(passage_tokens)
+    if not n or not query_tokens:
+        return [0.0] * n
+    avg_len = sum(len(t) for t in passage_tokens) / n or 1.0
+    counts = [Counter(t) for t in passage_tokens]
+    terms = set(query_tokens)
+    df = {term: sum(1 for c in counts if term in c) for term in terms}
+    idf = {term: math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5)) for term in terms}
+    scores = []
+    for tokens, c in zip(passage_tokens, counts):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_len)
+        scores.append(sum(idf[t] * c[t] * (BM25_K1 + 1) / (c[t] + norm) for t in terms if t in c))
+    return scores
+
+
+def rank_docs(docs, query, top_k=RANK_TOP_K, max_chars=RANK_MAX_CHARS, dedup_threshold=RANK_DEDUP_THRESHOLD):
+    """
+    Chunk docs into passages, score them against `query` with BM25, drop near-duplicates
+    (shingle Jaccard >= dedup_threshold against an already selected passage) and keep the best
+    `top_k` passages within `max_chars`. Returns docs in the same string format, best source first,
+    each holding its selected passages in page order.
+    """
+    passages = []  # (doc index, position in doc, text)
+    sources = []
+    for d, doc in enumerate(docs):
+        title, url, content = parse_doc(doc)
+        sources.append((title, url))
+        for p, text in enumerate(split_passages(content)):
+            passages.append((d, p, text))
+    if not passages:
+        return docs
+
+    tokens = [tokenize(text) for _, _, text in passages]
+    scores = bm25_scores(tokenize(query), tokens)
+    # Stable sort: ties (e.g. no query overlap at all) keep crawl order
+    order = sorted(range(len(passages)), key=lambda i: -scores[i])
+
+    # Passages sharing no term with the query (menus, cookie banners, ...) only count when nothing matches
+    any_match = scores[order[0]] > 0
+
+    selected, selected_shingles = [], []
+    seen_exact = set()
+    used_chars = dropped = 0
+    for i in order:
+        if len(selected) >= top_k or (any_match and scores[i] <= 0):
+            break
+        d, p, text = passages[i]
+        key = " ".join(tokens[i])
+        sh = shingles(tokens[i])
+        if key in seen_exact or any(jaccard(sh, other) >= dedup_threshold for other in selected_shingles):
+            dropped += 1
+            continue
+        if used_chars + len(text) > max_chars:
+            continue  # a shorter passage further down may still fit
+        seen_exact.add(key)
+        selected.append(i)
+        selected_shingles.append(sh)
+        used_chars += len(text)
+
+    by_doc = {}
+    for i in selected:
+        by_doc.setdefault(passages[i][0], []).append(i)
+    best = {d: max(scores[i] for i in idx) for d, idx in by_doc.items()}
+    ranked = []
+    for d in sorted(by_doc, key=lambda d: (-best[d], d)):
+        title, url = sources[d]
+        content = "\n".join(passages[i][2] for i in sorted(by_doc[d], key=lambda i: passages[i][1]))
+        ranked.append(format_doc(title, url, content))
+
+    print(f"{Fore.LIGHTBLACK_EX}   📚 Ranked {len(passages)} passages from {len(docs)} docs: kept {len(selected)} "
+          f"({used_chars:,} chars) from {len(ranked)} sources, dropped {dropped} near-duplicates{Style.RESET_ALL}")
+    return ranked
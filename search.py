@@ -2,13 +2,285 @@
 """
 Web search module
 """
+import contextlib
+import os
+import queue
+import threading
 import time
-from playwright.sync_api import sync_playwright
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from urllib.parse import quote_plus, urlparse
+from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeoutError
 import trafilatura
+import urllib3
 # from bs4 import BeautifulSoup # If trafilatura is sufficient, bs4 may not be needed
 from colorama import Fore, Style
 
-from config import HEADLESS, HIDE_WINDOW, MAX_SEARCH_RESULTS, MAX_PAGES_TO_SCAN
+from cache import SearchCache
+from providers import ProviderSet, local_path, read_local_file
+from tracing import tracer, percentile
+from config import (
+    HEADLESS, HIDE_WINDOW, MAX_SEARCH_RESULTS, MAX_PAGES_TO_SCAN,
+    DEEP_READ_MODE, DEEP_READ_CONCURRENCY, DEEP_READ_URL_TIMEOUT,
+    DEEP_READ_TOTAL_TIMEOUT, DEEP_READ_TARGET_DOCS, DEEP_READ_SETTLE, SEARCH_CACHE_ENABLED,
+    SEARCH_URL, PAGINATION_RESULTS_TIMEOUT, PAGINATION_BUTTON_TIMEOUT, PAGINATION_LOAD_TIMEOUT,
+    PAGINATION_RETRY_TIMEOUT, DEEP_READ_HTTP_CONCURRENCY, DEEP_READ_HTTP_MIN_CHARS, DEEP_READ_HTTP_MAX_BYTES,
+    DOC_MAX_CHARS, BLOCK_RESOURCES, SERP_BLOCK_RESOURCE_TYPES, DEEP_READ_BLOCK_RESOURCE_TYPES, BLOCK_DOMAINS,
+    BROWSER_START, BROWSER_RECYCLE_PAGES, BROWSER_RECYCLE_RSS_MB, BROWSER_HOST_MAX_PAGES, BROWSER_CALL_TIMEOUT,
+    BROWSER_WAIT_SLICE,
+)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/125.0.0.0 Safari/537.36"
+HTTP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    'Accept-Language': "zh-CN,zh;q=0.9,en;q=0.8",
+}
+# Statuses that often mean "bot check / needs a real browser" rather than "page does not exist"
+HTTP_FALLBACK_STATUSES = {401, 403, 429, 503}
+# Markers of client-side rendered pages whose HTML carries little text until scripts run
+JS_RENDERED_MARKERS = (b"enable javascript", b"javascript is required", b"__next_data__",
+                       b'<div id="root"></div>', b'<div id="app"></div>')
+# Rough transfer size (bytes) of a blocked request, used to estimate the bytes avoided
+RESOURCE_SIZE_ESTIMATES = {'image': 60_000, 'media': 500_000, 'font': 40_000, 'stylesheet': 30_000,
+                           'script': 50_000, 'domain': 30_000}
+
+# SERP markup: result containers, result title links (preferred first) and 'More Results' buttons
+RESULT_SELECTOR = '[data-testid="result"]'
+RESULT_LINK_SELECTORS = ('a[data-testid="result-title-a"]', 'article h2 a')
+MORE_BUTTON_SELECTORS = ("button#more-results", "text='More Results'", "a.result--more__btn")
+
+# Anchors of the first selector that matches anything, skipping the first `start` already scanned
+COLLECT_LINKS_JS = """([selectors, start]) => {
+    for (const sel of selectors) {
+        const els = document.querySelectorAll(sel);
+        if (els.length) {
+            return Array.from(els).slice(start).map(a => ({url: a.href, title: a.innerText || ''}));
+        }
+    }
+    return [];
+}"""
+COUNT_LINKS_JS = """([selectors, seen]) => {
+    for (const sel of selectors) {
+        const n = document.querySelectorAll(sel).length;
+        if (n) return n > seen;
+    }
+    return false;
+}"""
+# Seconds between RSS checks of the browser processes (BROWSER_RECYCLE_RSS_MB)
+RSS_CHECK_INTERVAL = 30
+
+
+class LateDocs:
+    """
+    Background collector for the downloads still running when a progressive deep-read returned early.
+    Runs on its own thread without printing (the answer is streaming meanwhile) and stops once `needed`
+    docs are in, the deep-read deadline passes or cancel() is called.
+    """
+    def __init__(self, engine, executor, futures, pending, needed, deadline, on_doc=None):
+        self.engine = engine
+        self.executor = executor
+        self.futures = futures
+        self.pending = pending
+        self.needed = needed
+        self.deadline = deadline
+        self.on_doc = on_doc
+        self.items = []  # (link, clean text) in completion order
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="late-docs", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        pending = self.pending
+        try:
+            while pending and len(self.items) < self.needed and not self.stopped.is_set():
+                remaining = self.deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=min(remaining, 0.5), return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: self.futures[f][0]):
+                    _, link = self.futures[future]
+                    status, clean, _ = future.result()
+                    doc, clean = self.engine._build_doc(link, clean) if status == "ok" else (None, "")
+                    with self.lock:
+                        if doc:
+                            self.items.append((link, clean))
+                        else:
+                            self.failed += 1  # pages needing the browser are dropped: Playwright stays on the main thread
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def collect(self, timeout=0.0):
+        """Wait up to `timeout` seconds for the collector, then stop it and return what arrived."""
+        self.thread.join(timeout)
+        self.cancel()
+        with self.lock:
+            return self.items[:self.needed]
+
+    def cancel(self):
+        self.stopped.set()
+
+
+def launch_watched(playwright, lost, kind="cold"):
+    """Launch Chromium and trace the start; `lost` is set if it disconnects without close_browser()."""
+    t0 = time.perf_counter()
+    browser = SearchEngine.launch_browser(playwright)
+    browser.on("disconnected", lambda _: lost.set())
+    seconds = time.perf_counter() - t0
+    tracer.record("browser.launch", seconds, kind=kind)
+    return browser, seconds
+
+
+def close_browser(browser, lost):
+    """Close a browser on purpose (its disconnect is not a crash)."""
+    try:
+        browser.close()
+    except Exception:
+        pass
+    lost.clear()
+
+
+def browser_rss_mb():
+    """Resident memory (MB) of this process's descendants (Playwright driver and Chromium), or None without /proc."""
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        children, rss = {}, {}
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat", 'r') as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue  # process exited meanwhile
+            pid = int(entry.name)
+            children.setdefault(int(fields[1]), []).append(pid)
+            rss[pid] = int(fields[21]) * page_size
+    except (OSError, ValueError, IndexError):
+        return None
+    total, todo = 0, list(children.get(os.getpid(), []))
+    while todo:
+        pid = todo.pop()
+        total += rss.get(pid, 0)
+        todo.extend(children.get(pid, []))
+    return total / 1e6
+
+
+class BrowserHost:
+    """
+    Chromium on a dedicated thread. Playwright's sync API is bound to the thread that started it, so every
+    call on the browser or its contexts is queued here and runs on that thread in arrival order.
+    Used to warm the browser up in the background (BROWSER_START = "background") and, in server mode, to
+    share one browser between all sessions (each opens its own context).
+    Engines queue one Playwright call at a time (see HostBound), so the steps of concurrent sessions
+    interleave, and `pages` caps the pages open at once across all of them.
+    """
+    def __init__(self, max_pages=BROWSER_HOST_MAX_PAGES):
+        self.jobs = queue.Queue()
+        self.pages = threading.BoundedSemaphore(max_pages)
+        self.ready = threading.Event()
+        self.lost = threading.Event()  # Chromium disconnected while in use (crash, killed process)
+        self.error = None
+        self.playwright = None
+        self.browser = None
+        self.generation = 0  # bumped on every launch; contexts of older generations are gone
+        self.thread = threading.Thread(target=self._run, name="browser", daemon=True)
+
+    def start(self, wait=True):
+        self.thread.start()
+        if wait:
+            self.wait_ready()
+
+    def wait_ready(self):
+        self.ready.wait()
+        if self.error:
+            raise self.error
+
+    def _run(self):
+        try:
+            self.playwright = sync_playwright().start()
+            self.relaunch("cold")
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                fn, args, kwargs, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            if self.browser:
+                close_browser(self.browser, self.lost)
+            self.playwright.stop()
+
+    def relaunch(self, kind="restart"):
+        """Browser thread: replace Chromium (crashed, or recycled to release memory)."""
+        if self.browser is not None:
+            old, self.browser = self.browser, None
+            close_browser(old, self.lost)
+        self.browser, _ = launch_watched(self.playwright, self.lost, kind)
+        self.generation += 1
+
+    def relaunch_if_lost(self):
+        """Browser thread: restart a crashed Chromium once, however many sessions noticed the crash."""
+        if self.lost.is_set():
+            self.relaunch("restart")
+
+    def new_context(self, engine):
+        """Browser thread: a context for `engine` and the browser generation it belongs to."""
+        return engine._new_context(self.browser), self.generation
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue `fn` on the browser thread. Returns its Future."""
+        future = Future()
+        self.jobs.put((tracer.bind(fn), args, kwargs, future))  # browser spans keep the caller's turn
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn` on the browser thread and wait for its result (directly when already on it)."""
+        if threading.current_thread() is self.thread:
+            return fn(*args, **kwargs)
+        self.wait_ready()
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stop(self):
+        self.jobs.put(None)
+        self.thread.join(timeout=30)
+
+
+class HostBound:
+    """
+    A Playwright object living on a BrowserHost thread, used from another thread: every attribute read
+    and method call is its own job on the browser thread (waited for within the engine's deadline), and
+    Playwright objects it returns are wrapped the same way.
+    """
+    def __init__(self, engine, target):
+        self._engine = engine
+        self._target = target
+
+    def __getattr__(self, name):
+        engine = self._engine
+        value = engine._call(getattr, self._target, name)
+        if callable(value):
+            return lambda *args, **kwargs: engine._bound(engine._call(
+                value, *map(unbound, args), **{k: unbound(v) for k, v in kwargs.items()}))
+        return engine._bound(value)
+
+
+def unbound(obj):
+    """The Playwright object behind a HostBound wrapper (or `obj` itself)."""
+    return obj._target if isinstance(obj, HostBound) else obj
 
 
 class SearchEngine:
@@ -16,12 +288,36 @@ class SearchEngine:
         self.playwright = None
         self.browser = None
         self.context = None
+        self.cache = SearchCache() if SEARCH_CACHE_ENABLED else None
+        self.last_pagination_steps = []  # (step name, seconds) of the most recent SERP pagination
+        self.http = None  # keep-alive connection pool for the HTTP deep-read path, created on first use
+        self.fetch_stats = {'http': 0, 'browser': 0, 'failed': 0}  # pages per deep-read path this session
+        self.lean_pages = weakref.WeakSet()  # deep-read pages, routed with the lean block profile
+        self.block_stats = {}  # requests blocked during the current search, by resource type or 'domain'
+        self.late = None  # LateDocs of the last progressive search, until collect_late() is called
+        self.host = None  # BrowserHost running this engine's Playwright calls, see start()
+        self.owns_host = False  # True when the host is this engine's own background launch
+        self.browser_lost = threading.Event()  # inline Chromium disconnected while in use
+        self.context_generation = 0  # host browser generation the context was opened in
+        self.context_pages = 0  # pages opened in the current context (BROWSER_RECYCLE_PAGES)
+        self.rss_checked_at = 0.0
+        self.browser_stats = {'restarts': 0, 'recycled': 0, 'relaunched': 0}
+        self.browser_enabled = True
+        self.start_mode = None  # BROWSER_START mode (or "shared") given to start()
+        self.providers = ProviderSet(self, HTTP_HEADERS)  # where result links come from (SEARCH_PROVIDERS)
+        self.local = threading.local()  # .deadline: monotonic time the current browser step must finish by
 
-    def start(self):
-        self.playwright = sync_playwright().start()
+    @staticmethod
+    def launch_browser(playwright):
         args = [
             "--disable-blink-features=AutomationControlled",
             "--start-maximized",
+            # Lean browser: no background services competing with page loads or growing RSS
+            "--disable-extensions",
+            "--disable-background-networking",
+            "--disable-component-update",
+            "--disable-default-apps",
+            "--mute-audio",
         ]
         if HIDE_WINDOW:
             args.extend([
@@ -32,176 +328,840 @@ class SearchEngine:
         else:
             args.extend(["--window-position=0, 0"])
 
-        self.browser = self.playwright.chromium.launch(
+        return playwright.chromium.launch(
             headless=HEADLESS,
             args=args,
         )
-        self.context = self.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/125.0.0.0 Safari/537.36",
+
+    def _new_context(self, browser):
+        context = browser.new_context(
+            user_agent=USER_AGENT,
             locale="zh-CN",
+            service_workers="block",  # service workers bypass request interception and cache aggressively
         )
-        print(f"{Fore.GREEN}>> 🌐 Browser started successfully.{Style.RESET_ALL}")
+        if BLOCK_RESOURCES:
+            context.route("**/*", self._route_request)
+        return context
+
+    def start(self, host=None, mode=BROWSER_START):
+        """
+        Prepare Chromium according to `mode`:
+          eager      - launch now, before the first prompt
+          lazy       - launch when a search first needs the browser (never, if no search does)
+          background - launch on a BrowserHost thread now, so the cold start overlaps the first prompt
+          off        - never launch; only the search cache and the HTTP deep-read path are used
+        With `host` (server mode) the engine uses the host's shared browser; its context opens on first use.
+        """
+        if host is not None:
+            self.host = host
+        elif mode == "background":
+            self.host = BrowserHost()
+            self.owns_host = True
+            self.host.start(wait=False)
+        elif mode == "eager":
+            self._ensure_browser()
+        self.start_mode = "shared" if host is not None else mode
+        self.browser_enabled = mode != "off" or host is not None
+
+    def _launch_inline(self, kind):
+        if self.playwright is None:
+            self.playwright = sync_playwright().start()
+        self.browser, seconds = launch_watched(self.playwright, self.browser_lost, kind)
+        print(f"{Fore.GREEN}>> 🌐 Browser started in {seconds:.1f}s.{Style.RESET_ALL}")
+
+    def _ensure_browser(self):
+        """Open this engine's context, launching Chromium (or waiting for the background launch) first."""
+        if not self.browser_enabled:
+            raise RuntimeError("browser is disabled")
+        if self.host is not None:
+            if self.context is not None and self.context_generation == self.host.generation:
+                return
+            if not self.host.ready.is_set():
+                with tracer.span("browser.wait"):
+                    self.host.wait_ready()
+            with tracer.span("browser.context"):
+                self.context, self.context_generation = self._call(self.host.new_context, self)
+        else:
+            if self.context is not None:
+                return
+            if self.browser is None:
+                with tracer.span("browser.wait"):
+                    self._launch_inline("cold")
+            with tracer.span("browser.context"):
+                self.context = self._new_context(self.browser)
+        self.context_pages = 0
+
+    def _browser_lost(self):
+        if self.host is None:
+            return self.browser_lost.is_set()
+        # a shared browser may also have been restarted already by another session that noticed first
+        return self.host.lost.is_set() or self.context_generation != self.host.generation
+
+    def _close_context(self):
+        context, self.context = self.context, None
+        if self.host is not None:
+            self.host.submit(context.close)  # not waited for: a closing context must not hold up the caller
+            return
+        try:
+            context.close()
+        except Exception:
+            pass  # already gone with a crashed browser
+
+    def _restart(self):
+        """Chromium crashed: launch a new one and reopen this engine's context."""
+        self.browser_stats['restarts'] += 1
+        print(f"{Fore.RED}>> ⚠️ Browser crashed, restarting it...{Style.RESET_ALL}")
+        self.context = None
+        if self.host is not None:
+            self.host.call(self.host.relaunch_if_lost)
+        else:
+            old, self.browser = self.browser, None
+            close_browser(old, self.browser_lost)
+            try:
+                self._launch_inline("restart")
+            except Exception:
+                # the Playwright driver went down with it: start that again too
+                try:
+                    self.playwright.stop()
+                except Exception:
+                    pass
+                self.playwright = None
+                self._launch_inline("restart")
+        self._ensure_browser()
+
+    def _maybe_recycle(self):
+        """
+        Between browser steps: open a fresh context after BROWSER_RECYCLE_PAGES pages, and relaunch an
+        owned Chromium whose processes use more than BROWSER_RECYCLE_RSS_MB (a shared one is left alone).
+        """
+        if self.context is None:
+            return
+        if BROWSER_RECYCLE_PAGES and self.context_pages >= BROWSER_RECYCLE_PAGES:
+            print(f"{Fore.LIGHTBLACK_EX}   ♻️ Recycling the browser context after {self.context_pages} pages.{Style.RESET_ALL}")
+            self.browser_stats['recycled'] += 1
+            self._close_context()
+            return
+        if not BROWSER_RECYCLE_RSS_MB or (self.host is not None and not self.owns_host):
+            return
+        now = time.monotonic()
+        if now - self.rss_checked_at < RSS_CHECK_INTERVAL:
+            return
+        self.rss_checked_at = now
+        rss = browser_rss_mb()
+        if rss is None or rss < BROWSER_RECYCLE_RSS_MB:
+            return
+        print(f"{Fore.LIGHTBLACK_EX}   ♻️ Browser processes use {rss:.0f} MB, relaunching Chromium.{Style.RESET_ALL}")
+        self.browser_stats['relaunched'] += 1
+        self._close_context()
+        if self.host is not None:
+            self.host.call(self.host.relaunch, "recycle")
+        else:
+            old, self.browser = self.browser, None
+            close_browser(old, self.browser_lost)
+            self._launch_inline("recycle")
 
     def stop(self):
+        if self.late:
+            self.late.cancel()
+        self.providers.close()
+        if self.http:
+            self.http.clear()
         if self.context:
-            self.context.close()
+            self._close_context()
+        if self.owns_host:
+            self.host.stop()
         if self.browser:
-            self.browser.close()
+            close_browser(self.browser, self.browser_lost)
+            self.browser = None
         if self.playwright:
             self.playwright.stop()
-        print(f"{Fore.GREEN}>> 🌐 Browser closed.{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}>> 🌐 Browser closed.{Style.RESET_ALL}")
+
+    def _remaining(self):
+        """Seconds left before the current browser step's deadline."""
+        deadline = getattr(self.local, 'deadline', None)
+        return BROWSER_CALL_TIMEOUT if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+    @contextlib.contextmanager
+    def _within(self, seconds):
+        """Browser calls made inside the block give up (TimeoutError) once `seconds` have passed."""
+        outer = getattr(self.local, 'deadline', None)
+        deadline = time.monotonic() + seconds
+        self.local.deadline = deadline if outer is None else min(outer, deadline)
+        try:
+            yield
+        finally:
+            self.local.deadline = outer
 
-    def search(self, query):
+    def _call(self, fn, *args, **kwargs):
         """
-        Optimized pagination search based on screenshot feedback:
-        1. Simulate scrolling to the bottom to trigger the 'More Results' button.
-        2. Precisely click the 'More Results' button.
-        3. Add buffer wait time after clicking to ensure dynamic content loads.
+        Run one Playwright call: inline, or as a job on the host's browser thread. Waiting for the host
+        is bounded by the current deadline, so a browser busy with other sessions cannot stall this one.
         """
+        if self.host is None or threading.current_thread() is self.host.thread:
+            return fn(*args, **kwargs)
+        self.host.wait_ready()
+        future = self.host.submit(fn, *args, **kwargs)
+        try:
+            return future.result(self._remaining())
+        except FutureTimeout:
+            if not future.cancel():
+                future.add_done_callback(self._discard_late)
+            raise TimeoutError(f"browser busy: {getattr(fn, '__name__', 'call')} not done before the deadline")
+
+    def _discard_late(self, future):
+        """A page opened after its caller gave up is closed again."""
+        if not future.cancelled() and future.exception() is None and isinstance(future.result(), Page):
+            self.host.submit(future.result().close)
 
-        page = self.context.new_page()
+    def _bound(self, value):
+        """Wrap Playwright objects of a host's browser so their calls are queued on its thread."""
+        if self.host is not None and type(value).__module__.startswith("playwright."):
+            return HostBound(self, value)
+        return value
+
+    def _in_browser(self, fn, *args, within=BROWSER_CALL_TIMEOUT, **kwargs):
+        """
+        Run a browser step with the lifecycle managed around it: the browser is opened on first use,
+        recycled between steps once it has grown, and restarted (the step retried once) if it crashed.
+        `fn` runs on the calling thread; with a BrowserHost each of its Playwright calls is queued on the
+        browser thread and waited for at most until `within` seconds have passed.
+        """
+        with self._within(within):
+            self._maybe_recycle()
+            self._ensure_browser()
+            try:
+                result = fn(*args, **kwargs)
+                if not self._browser_lost():
+                    return result
+                # steps skip pages that fail, so a crash can also end in a short result instead of an error
+            except Exception:
+                if not self._browser_lost():
+                    raise
+            self._restart()
+            return fn(*args, **kwargs)
+
+    def browser_stats_text(self):
+        """/stats line: start mode, cold start, wait at first use, warm context opens and lifecycle counters."""
+        if not self.browser_enabled:
+            return "disabled"
+        cold_start = tracer.first('browser.launch')
+        first_wait = tracer.first('browser.wait')
+        contexts = tracer.recent('browser.context')
+        if not contexts:
+            return f"{self.start_mode or 'not started'}, not opened yet"
+        parts = [self.start_mode]
+        if cold_start is not None:
+            parts.append(f"cold start {cold_start:.2f}s")
+        parts.append(f"first use waited {first_wait or 0.0:.2f}s")
+        parts.append(f"context open p50 {percentile(contexts, 50) * 1000:.0f} ms")
+        parts.append(f"{self.context_pages} pages in context")
+        parts += [f"{k} {v}" for k, v in self.browser_stats.items()]
+        return " | ".join(parts)
+
+    def _new_page(self, wait=True):
+        """
+        Open a page in this engine's context. With a BrowserHost it takes one of the host's page slots,
+        waiting for one until the deadline (TimeoutError), or returning None at once when `wait` is false.
+        """
+        if self.host is not None and not self.host.pages.acquire(timeout=self._remaining() if wait else 0):
+            if wait:
+                raise TimeoutError("no free browser page before the deadline")
+            return None
+        try:
+            page = self._bound(self._call(self.context.new_page))
+        except BaseException:
+            if self.host is not None:
+                self.host.pages.release()
+            raise
+        self.context_pages += 1
+        return page
+
+    def _close_page(self, page):
+        """Close a page from _new_page and give its slot back (on a host, without waiting for the close)."""
+        if self.host is None:
+            with contextlib.suppress(Exception):
+                page.close()
+            return
+        self.host.submit(unbound(page).close).add_done_callback(lambda _: self.host.pages.release())
+
+    def _wait_sliced(self, wait, seconds):
+        """
+        Run a Playwright wait (`wait(timeout_ms)`) for up to `seconds`. On a shared browser it runs in
+        BROWSER_WAIT_SLICE slices so other sessions' steps get the browser thread in between.
+        Returns True once the condition is met, False on timeout.
+        """
+        end = time.monotonic() + seconds
+        while True:
+            left = end - time.monotonic()
+            if left <= 0:
+                return False
+            step = min(left, BROWSER_WAIT_SLICE) if self.host is not None else left
+            try:
+                wait(max(int(step * 1000), 1))  # a Playwright timeout of 0 would mean "wait forever"
+                return True
+            except PlaywrightTimeoutError:
+                if step >= left:
+                    return False
+
+    def _goto(self, page, url, timeout):
+        """Navigate `page` to `url` and wait for DOMContentLoaded (sliced on a shared browser)."""
+        if self.host is None:
+            return page.goto(url, timeout=timeout * 1000, wait_until="domcontentloaded")
+        page.goto(url, timeout=timeout * 1000, wait_until="commit")  # returns once the response starts
+        if not self._wait_sliced(lambda ms: page.wait_for_load_state("domcontentloaded", timeout=ms), timeout):
+            raise PlaywrightTimeoutError(f"{url} did not load within {timeout}s")
+
+    def _serp_links(self, query, should_stop=None):
+        page = self._new_page()
+        try:
+            return self._collect_links(page, query, should_stop=should_stop)
+        finally:
+            self._close_page(page)
+
+    def search(self, query, cache_mode="use", links=None, early=None):
+        """
+        Search the web and deep-read the result pages.
+        cache_mode: "use" = read and write the search cache, "refresh" = ignore cached entries but store
+        fresh ones, "bypass" = do not touch the cache. A full cache hit never opens a browser page.
+        links: result links fetched earlier (e.g. by prefetch_links); the SERP is then skipped.
+        early: (min docs, seconds) for progressive answers in http mode; see _deep_read_http.
+        """
+        if self.late:
+            self.late.cancel()  # late docs of the previous question were never collected
+            self.late = None
+        cache = self.cache if cache_mode != "bypass" else None
+        read_cache = cache is not None and cache_mode == "use"
         docs = []
-        unique_links = []
-        seen_urls = set()
+        self.block_stats = {}
 
-        max_scan_pages = MAX_PAGES_TO_SCAN  # Maximum pages to scan for pagination, read from config
+        def remember(link, clean):
+            if cache is not None:
+                cache.put_page(link['url'], clean)
 
         try:
-            print(f"{Fore.YELLOW}>> 🌐 Performing online search and simulating pagination: {query}{Style.RESET_ALL}")
-            page.goto(f"https://duckduckgo.com/?q={query}&ia=web", timeout=20000)
+            unique_links = links
+            if unique_links is None and read_cache:
+                unique_links = cache.get_links(query)
+                if unique_links is not None:
+                    print(f"{Fore.YELLOW}>> 💾 Search cache hit for: {query} ({len(unique_links)} links){Style.RESET_ALL}")
+            if unique_links is None:
+                unique_links = self.providers.links(query)
+                if cache is not None and unique_links:
+                    cache.put_links(query, unique_links)
+
+            # 4. Deep-read stage (take a limited number)
+            final_links = unique_links[:MAX_SEARCH_RESULTS]
+            print(f"{Fore.YELLOW}>> 🔍 Decided to deep-read {len(final_links)} web pages...{Style.RESET_ALL}")
+
+            to_read = []
+            for link in final_links:
+                text = cache.get_page(link['url']) if read_cache else None
+                path = local_path(link['url'])
+                if path and not text:  # local index results are read from disk, never over HTTP
+                    with contextlib.suppress(OSError):
+                        text = read_local_file(path)
+                doc = self._build_doc(link, text)[0] if text else None
+                if doc:
+                    docs.append(doc)
+                else:
+                    to_read.append(link)
+            if docs:
+                print(f"{Fore.LIGHTBLACK_EX}   💾 {len(docs)} pages served from cache or the local index, {len(to_read)} left to read.{Style.RESET_ALL}")
 
-            pages_clicked = 0
-            while len(unique_links) < MAX_SEARCH_RESULTS and pages_clicked < max_scan_pages:
-                # 1. Wait for initial results to load
+            target = DEEP_READ_TARGET_DOCS if DEEP_READ_TARGET_DOCS > 0 else len(final_links)
+            if to_read and len(docs) < target:
+                if DEEP_READ_MODE == "http":
+                    early_left = (max(early[0] - len(docs), 1), early[1]) if early else None
+                    docs += self._deep_read_http(to_read, target - len(docs), on_doc=remember, early=early_left)
+                else:
+                    docs += self._in_browser(self._deep_read_browser, to_read, target - len(docs), on_doc=remember,
+                                             within=DEEP_READ_TOTAL_TIMEOUT)
+
+        except Exception as e:
+            print(f"{Fore.RED}Search exception: {e}{Style.RESET_ALL}")
+        finally:
+            if cache is not None:
                 try:
-                    page.wait_for_selector('[data-testid="result"]', timeout=8000)
-                except:
-                    print(f"{Fore.LIGHTBLACK_EX}   [-] No search results found or load timed out, stopping pagination.{Style.RESET_ALL}")
-                    break
+                    cache.save()
+                except Exception as e:
+                    print(f"{Fore.RED}>> ⚠️ Failed to save search cache: {e}{Style.RESET_ALL}")
+            if self.block_stats:
+                blocked = sum(self.block_stats.values())
+                by_kind = ", ".join(f"{k} {v}" for k, v in sorted(self.block_stats.items()))
+                print(f"{Fore.LIGHTBLACK_EX}   🚫 Blocked {blocked} requests (~{self.blocked_bytes_estimate() / 1e6:.1f} MB avoided): {by_kind}{Style.RESET_ALL}")
+        return docs
 
-                # 2. Extract all currently loaded links
-                # Prefer using the data-testid attribute, fallback to article h2 a
-                locs = page.locator('a[data-testid="result-title-a"]').all()
-                if not locs:
-                    locs = page.locator('article h2 a').all()
+    def _route_request(self, route):
+        """
+        Context-wide request interception. The SERP page keeps stylesheets (the 'More Results' button
+        must be laid out to be clicked); deep-read pages use the leaner profile. Main-frame navigations
+        are never blocked.
+        """
+        request = route.request
+        try:
+            frame = request.frame
+            if request.is_navigation_request() and frame.parent_frame is None:
+                return route.continue_()
+            lean = frame.page in self.lean_pages
+        except Exception:
+            lean = False  # e.g. service worker requests have no frame
 
-                for l in locs:
-                    try:
-                        url = l.get_attribute('href')
-                        title = l.inner_text().strip()
-                        if url and "http" in url and url not in seen_urls:
-                            # Filter out DuckDuckGo's own links
-                            if "duckduckgo.com" not in url and "start.duckduckgo.com" not in url:
-                                unique_links.append({'title': title, 'url': url})
-                                seen_urls.add(url)
-                    except Exception:
-                        # Ignore elements whose attributes cannot be retrieved
-                        # print(f"{Fore.RED}   [!] Error extracting link attributes: {e}{Style.RESET_ALL}")
-                        pass
-
-                # If current count meets the target, exit early
-                if len(unique_links) >= MAX_SEARCH_RESULTS:
-                    break
+        kind = None
+        if request.resource_type in (DEEP_READ_BLOCK_RESOURCE_TYPES if lean else SERP_BLOCK_RESOURCE_TYPES):
+            kind = request.resource_type
+        else:
+            host = urlparse(request.url).hostname or ""
+            if any(host == d or host.endswith("." + d) for d in BLOCK_DOMAINS):
+                kind = 'domain'
+        if kind is None:
+            return route.continue_()
+        self.block_stats[kind] = self.block_stats.get(kind, 0) + 1
+        return route.abort("blockedbyclient")
+
+    def blocked_bytes_estimate(self):
+        return sum(RESOURCE_SIZE_ESTIMATES.get(kind, 10_000) * n for kind, n in self.block_stats.items())
+
+    def prefetch_links(self, query, cache_mode="use", should_stop=None):
+        """
+        Speculative SERP fetch: collect result links only (no deep-read). `should_stop` is polled
+        between pagination steps; returns None if it fired before any links were collected.
+        """
+        cache = self.cache if cache_mode != "bypass" else None
+        if cache is not None and cache_mode == "use":
+            links = cache.get_links(query)
+            if links is not None:
+                return links
+        try:
+            links = self.providers.links(query, should_stop=should_stop)
+            if links and cache is not None:
+                cache.put_links(query, links)
+                cache.save()
+            return links or None
+        except Exception as e:
+            print(f"{Fore.RED}Speculative search exception: {e}{Style.RESET_ALL}")
+            return None
+
+    def _collect_links(self, page, query, should_stop=None):
+        """
+        Event-driven DuckDuckGo pagination:
+        1. Wait for the first results instead of sleeping.
+        2. Scroll to the bottom and wait (bounded) for the 'More Results' button to become visible.
+        3. Click it and wait until the number of results grows, with one scroll-and-wait retry.
+        Links are gathered by a single incremental collector that only looks at results added since the last scan.
+        Per-step durations are kept in self.last_pagination_steps. If `should_stop()` turns true,
+        pagination ends early with whatever has been collected.
+        """
+        unique_links = []
+        seen_urls = set()
+        scanned = {'count': 0}
+        steps = []
+        self.last_pagination_steps = steps
 
-                # 3. Simulate the actions from the screenshot: scroll to the bottom and click
-                print(f"{Fore.CYAN}   [Paginate] Retrieved {len(unique_links)} items, scrolling down to find button...{Style.RESET_ALL}")
+        def step(name, t0):
+            seconds = time.perf_counter() - t0
+            steps.append((name, seconds))
+            tracer.record("serp." + name.split(" #")[0], seconds, step=name)
 
-                # Remember current count before attempting to load more
-                count_before = len(unique_links)
+        def collect():
+            # One round trip returns only the anchors added since the previous scan
+            found = page.evaluate(COLLECT_LINKS_JS, [list(RESULT_LINK_SELECTORS), scanned['count']])
+            scanned['count'] += len(found)
+            new = 0
+            for item in found:
+                url, title = item['url'], item['title'].strip()
+                if url and "http" in url and url not in seen_urls:
+                    # Filter out DuckDuckGo's own links
+                    if "duckduckgo.com" not in url and "start.duckduckgo.com" not in url:
+                        unique_links.append({'title': title, 'url': url})
+                        seen_urls.add(url)
+                        new += 1
+            return new
 
-                # Scroll to the bottom
+        def wait_for_more(timeout):
+            # Resolve as soon as more result anchors exist than have been scanned
+            try:
+                return self._wait_sliced(lambda ms: page.wait_for_function(
+                    COUNT_LINKS_JS, arg=[list(RESULT_LINK_SELECTORS), scanned['count']], timeout=ms), timeout)
+            except Exception:
+                return False
+
+        print(f"{Fore.YELLOW}>> 🌐 Performing online search and simulating pagination: {query}{Style.RESET_ALL}")
+        t0 = time.perf_counter()
+        self._goto(page, SEARCH_URL.format(query=quote_plus(query)), 20)
+        step("load", t0)
+
+        # 1. Wait for initial results to load
+        if should_stop and should_stop():
+            return unique_links
+        t0 = time.perf_counter()
+        try:
+            found = self._wait_sliced(lambda ms: page.wait_for_selector(RESULT_SELECTOR, timeout=ms),
+                                      PAGINATION_RESULTS_TIMEOUT)
+        except Exception:
+            found = False
+        if not found:
+            print(f"{Fore.LIGHTBLACK_EX}   [-] No search results found or load timed out, stopping pagination.{Style.RESET_ALL}")
+            step("results", t0)
+            return unique_links
+        collect()
+        step("results", t0)
+
+        more_button = page.locator(MORE_BUTTON_SELECTORS[0])
+        for selector in MORE_BUTTON_SELECTORS[1:]:
+            more_button = more_button.or_(page.locator(selector))
+        more_button = more_button.first
+
+        pages_clicked = 0
+        while len(unique_links) < MAX_SEARCH_RESULTS and pages_clicked < MAX_PAGES_TO_SCAN:
+            if should_stop and should_stop():
+                print(f"{Fore.LIGHTBLACK_EX}   [-] Pagination stopped early on request.{Style.RESET_ALL}")
+                break
+            # 2. Scroll to the bottom and wait for the button to render
+            print(f"{Fore.CYAN}   [Paginate] Retrieved {len(unique_links)} items, scrolling down to find button...{Style.RESET_ALL}")
+            t0 = time.perf_counter()
+            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            try:
+                if not self._wait_sliced(lambda ms: more_button.wait_for(state="visible", timeout=ms),
+                                         PAGINATION_BUTTON_TIMEOUT):
+                    raise PlaywrightTimeoutError("button not visible")
+                more_button.scroll_into_view_if_needed()
+                more_button.click()
+            except Exception:
+                step("button", t0)
+                print(f"{Fore.LIGHTBLACK_EX}   [-] No more results button found or cannot be clicked; search finished.{Style.RESET_ALL}")
+                break
+            pages_clicked += 1
+            step(f"click #{pages_clicked}", t0)
+            print(f"{Fore.CYAN}   [√] Successfully clicked 'More Results' (#{pages_clicked}){Style.RESET_ALL}")
+
+            # 3. Wait for the result count to grow; scroll once more to trigger lazy-loading if it does not
+            t0 = time.perf_counter()
+            grew = wait_for_more(PAGINATION_LOAD_TIMEOUT)
+            if not grew:
                 page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                time.sleep(1.5)  # wait for button to render
-
-                # Try clicking the 'More Results' button (text selector based on screenshot)
-                btn_selectors = [
-                    "button#more-results",
-                    "text='More Results'",
-                    "a.result--more__btn",
-                ]
-
-                clicked = False
-                for selector in btn_selectors:
-                    btn = page.locator(selector).first
-                    if btn.count() > 0 and btn.is_visible() and btn.is_enabled():
-                        try:
-                            btn.scroll_into_view_if_needed()  # ensure visible
-                            btn.click()
-                            pages_clicked += 1
-                            print(f"{Fore.CYAN}   [√] Successfully clicked 'More Results' (#{pages_clicked}){Style.RESET_ALL}")
-                            clicked = True
-                            # Important: wait after clicking to let new results load
-                            time.sleep(2.5)
-                            break
-                        except Exception:
-                            # print(f"{Fore.RED}   [!] Click failed for {selector}: {click_err}{Style.RESET_ALL}")
-                            continue
+                grew = wait_for_more(PAGINATION_RETRY_TIMEOUT)
+            new_count = collect()
+            step(f"results #{pages_clicked}", t0)
+            if not grew or new_count == 0:
+                print(f"{Fore.LIGHTBLACK_EX}   [-] No new content loaded after click or second scroll; may have reached results limit.{Style.RESET_ALL}")
+                break
 
-                # If button not found, or clicking doesn't increase links, we've likely reached the end
-                if not clicked:
-                    print(f"{Fore.LIGHTBLACK_EX}   [-] No more results button found or cannot be clicked; search finished.{Style.RESET_ALL}")
-                    break
+        return unique_links
 
-                # Extra check: if clicked but results didn't change, it may be blocked or ended
-                new_links_after_click = len(unique_links)
-                if new_links_after_click <= count_before:  # no new links after click
-                    # Try scrolling again to trigger lazy-loading
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    time.sleep(1.0)
-                    # Re-extract links to see if any new ones appeared
-                    locs_after_scroll = page.locator('a[data-testid="result-title-a"]').all()
-                    if not locs_after_scroll:
-                        locs_after_scroll = page.locator('article h2 a').all()
-
-                    temp_new_count = 0
-                    for l in locs_after_scroll:
-                        try:
-                            url = l.get_attribute('href')
-                            title = l.inner_text().strip()
-                            if url and "http" in url and url not in seen_urls:
-                                if "duckduckgo.com" not in url and "start.duckduckgo.com" not in url:
-                                    unique_links.append({'title': title, 'url': url})
-                                    seen_urls.add(url)
-                                    temp_new_count += 1
-                        except Exception:
-                            pass
+    @staticmethod
+    def _build_doc(link, text):
+        """Clean extracted text and format it as a reference doc. Returns (doc or None if too short, clean text)."""
+        clean = "\n".join([t.strip() for t in text.split('\n') if len(t.strip()) > 10])
+        clean = clean[:DOC_MAX_CHARS]  # truncate to avoid too long
+        if len(clean) > 50:
+            return f"Source: \"{link['title']}\"\nURL: {link['url']}\nContent: {clean}\n", clean
+        return None, clean
 
-                    if temp_new_count == 0:
-                        print(f"{Fore.LIGHTBLACK_EX}   [-] No new content loaded after click or second scroll; may have reached results limit.{Style.RESET_ALL}")
+    def _deep_read_browser(self, links, target, on_doc=None):
+        """Deep-read through Playwright, using the page pool when concurrency is enabled."""
+        if DEEP_READ_MODE != "sequential" and DEEP_READ_CONCURRENCY > 1:
+            docs = self._deep_read_concurrent(links, target, on_doc=on_doc)  # opens a page per slot
+        else:
+            page = self._new_page()
+            self.lean_pages.add(unbound(page))
+            try:
+                docs = self._deep_read_sequential(page, links, on_doc=on_doc)
+            finally:
+                self._close_page(page)
+        self.fetch_stats['browser'] += len(docs)
+        return docs
+
+    def _download(self, url):
+        """Worker thread: GET `url` through the keep-alive pool. Returns (status, body bytes)."""
+        try:
+            resp = self.http.request(
+                "GET", url, headers=HTTP_HEADERS, preload_content=False,
+                timeout=urllib3.Timeout(connect=5, read=DEEP_READ_URL_TIMEOUT),
+                retries=urllib3.Retry(total=1, redirect=5, raise_on_redirect=False),
+            )
+        except Exception as e:
+            # MaxRetryError wraps the real cause (connection refused, timeout, ...)
+            return f"failed: {getattr(e, 'reason', e).__class__.__name__}", b""
+        try:
+            if resp.status in HTTP_FALLBACK_STATUSES:
+                return f"fallback: HTTP {resp.status}", b""
+            if resp.status >= 400:
+                return f"failed: HTTP {resp.status}", b""
+            content_type = resp.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type:
+                return f"failed: not HTML ({content_type.split(';')[0]})", b""
+            return "ok", resp.read(DEEP_READ_HTTP_MAX_BYTES + 1)
+        except Exception as e:
+            return f"failed: {e.__class__.__name__}", b""
+        finally:
+            resp.release_conn()
+
+    def _fetch_http(self, link):
+        """
+        Worker thread: download one page over the shared keep-alive pool and extract its text.
+        Returns (status, clean text, raw body) where status is "ok", "fallback: <reason>" or "failed: <reason>".
+        """
+        with tracer.span("fetch.http", url=link['url']) as span:
+            status, body = self._download(link['url'])
+            span['status'] = status
+            span['bytes'] = len(body)
+        if status != "ok":
+            return status, "", b""
+
+        body = body[:DEEP_READ_HTTP_MAX_BYTES]
+        with tracer.span("extract", path="http"):
+            text = trafilatura.extract(body) or ""
+        _, clean = self._build_doc(link, text)
+        if len(clean) < DEEP_READ_HTTP_MIN_CHARS:
+            lowered = body[:200000].lower()
+            reason = "looks JS-rendered" if any(m in lowered for m in JS_RENDERED_MARKERS) else "text too short"
+            return f"fallback: {reason}", clean, body
+        return "ok", clean, body
+
+    def _deep_read_http(self, links, target, on_doc=None, early=None):
+        """
+        Lightweight deep-read: fetch pages with a pooled keep-alive HTTP client (DEEP_READ_HTTP_CONCURRENCY
+        workers) and hand the HTML straight to trafilatura. Pages that come back too short, look JS-rendered
+        or hit a bot wall are re-read through the browser afterwards, only if the target is not reached yet.
+        early: (min docs, seconds) - return as soon as min docs are read, or once the seconds have passed and
+        at least one doc exists; the remaining downloads keep running in the background (see collect_late).
+        """
+        if self.http is None:
+            self.http = urllib3.PoolManager(num_pools=32, maxsize=DEEP_READ_HTTP_CONCURRENCY, block=True)
+        total = len(links)
+        results = {}
+        fallback = []
+        failed = 0
+        started = time.monotonic()
+        deadline = started + DEEP_READ_TOTAL_TIMEOUT
+
+        executor = ThreadPoolExecutor(max_workers=DEEP_READ_HTTP_CONCURRENCY)
+        futures = {executor.submit(tracer.bind(self._fetch_http, link)): (i, link) for i, link in enumerate(links, 1)}
+        pending = set(futures)
+        handed_off = False
+        try:
+            while pending and len(results) < target:
+                now = time.monotonic()
+                if now >= deadline:
+                    print(f"{Fore.LIGHTBLACK_EX}   [-] HTTP deep-read deadline reached, continuing with {len(results)} docs.{Style.RESET_ALL}")
+                    break
+                wait_for = deadline - now
+                if early:
+                    early_at = started + early[1]
+                    if results and (len(results) >= early[0] or now >= early_at):
+                        self.late = LateDocs(self, executor, futures, pending, target - len(results), deadline, on_doc)
+                        handed_off = True
+                        print(f"{Fore.LIGHTBLACK_EX}   ⏩ Answering with {len(results)} docs after {now - started:.1f}s, "
+                              f"{len(pending)} pages still loading in the background{Style.RESET_ALL}")
                         break
+                    if now < early_at:
+                        wait_for = min(wait_for, early_at - now)
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: futures[f][0]):
+                    index, link = futures[future]
+                    status, clean, _ = future.result()
+                    title = link['title'][:30].strip()
+                    if status == "ok":
+                        doc, clean = self._build_doc(link, clean)
+                        results[index] = doc
+                        if on_doc:
+                            on_doc(link, clean)
+                        print(f"[{index}/{total}] Fetched: {title}...{Fore.GREEN} √{Style.RESET_ALL}")
+                        print(f"{Fore.LIGHTBLACK_EX}   📝 Summary: {clean[:80].replace(chr(10), ' ')}...{Style.RESET_ALL}")
+                    elif status.startswith("fallback"):
+                        fallback.append((index, link))
+                        print(f"[{index}/{total}] Fetched: {title}...{Fore.YELLOW} ~ ({status[10:]}, will use browser){Style.RESET_ALL}")
+                    else:
+                        failed += 1
+                        print(f"[{index}/{total}] Fetched: {title}...{Fore.RED} x ({status[8:]}){Style.RESET_ALL}")
+        finally:
+            if not handed_off:
+                executor.shutdown(wait=False, cancel_futures=True)
 
-            # 4. Deep-read stage (take a limited number)
-            final_links = unique_links[:MAX_SEARCH_RESULTS]
-            print(f"{Fore.YELLOW}>> 🔍 Decided to deep-read {len(final_links)} web pages...{Style.RESET_ALL}")
+        docs = [results[i] for i in sorted(results)][:target]
+        self.fetch_stats['http'] += len(docs)
+        self.fetch_stats['failed'] += failed
 
-            for i, link in enumerate(final_links, 1):
-                try:
-                    print(f"[{i}/{len(final_links)}] Reading: {link['title'][:30].strip()}...", end="", flush=True)
-                    page.goto(link['url'], timeout=15000, wait_until="domcontentloaded")
+        browser_docs = []
+        if fallback and not handed_off and len(docs) < target and time.monotonic() < deadline:
+            print(f"{Fore.YELLOW}>> 🌐 Re-reading {len(fallback)} pages in the browser...{Style.RESET_ALL}")
+            fallback_links = [link for _, link in sorted(fallback, key=lambda item: item[0])]
+            browser_docs = self._in_browser(self._deep_read_browser, fallback_links, target - len(docs), on_doc=on_doc,
+                                            within=deadline - time.monotonic())
+        print(f"{Fore.LIGHTBLACK_EX}   📊 Deep-read paths: {len(docs)} via HTTP, {len(browser_docs)} via browser, "
+              f"{failed} failed (session: {self.fetch_stats}){Style.RESET_ALL}")
+        return docs + browser_docs
+
+    def collect_late(self, timeout=0.0):
+        """
+        Docs that finished after a progressive deep-read returned, waiting up to `timeout` seconds for the
+        background downloads. They are added to the search cache here, on the caller's thread.
+        """
+        late, self.late = self.late, None
+        if late is None:
+            return []
+        items = late.collect(timeout)
+        if late.on_doc and items:
+            for link, clean in items:
+                late.on_doc(link, clean)
+        if self.cache is not None and items:
+            try:
+                self.cache.save()
+            except Exception as e:
+                print(f"{Fore.RED}>> ⚠️ Failed to save search cache: {e}{Style.RESET_ALL}")
+        self.fetch_stats['http'] += len(items)
+        return [self._build_doc(link, clean)[0] for link, clean in items]
+
+    def _deep_read_sequential(self, page, links, on_doc=None):
+        """Original deep-read: open each link in turn on the search page."""
+        docs = []
+        for i, link in enumerate(links, 1):
+            try:
+                print(f"[{i}/{len(links)}] Reading: {link['title'][:30].strip()}...", end="", flush=True)
+                with tracer.span("fetch.browser", url=link['url']):
+                    self._goto(page, link['url'], DEEP_READ_URL_TIMEOUT)
 
                     # Simulate reading scroll
                     page.mouse.wheel(0, 2000)
                     time.sleep(1)
 
-                    # Use trafilatura to extract main content
+                # Use trafilatura to extract main content
+                with tracer.span("extract", path="browser"):
                     text = trafilatura.extract(page.content()) or page.inner_text("body")
+                doc, clean = self._build_doc(link, text)
+
+                if doc:
+                    docs.append(doc)
+                    if on_doc:
+                        on_doc(link, clean)
+                    print(f"{Fore.GREEN} √{Style.RESET_ALL}")
+                    print(f"{Fore.LIGHTBLACK_EX}   📝 Summary: {clean[:80].replace(chr(10), ' ')}...{Style.RESET_ALL}")
+                else:
+                    print(f"{Fore.RED} x (content too short or empty){Style.RESET_ALL}")
+            except Exception as e:
+                print(f"{Fore.RED} x (load or extract failed: {e}){Style.RESET_ALL}")
+                continue
+        return docs
+
+    def _open_slot(self, index, link, wait=True):
+        """
+        Open a fresh page in the shared context and start navigating to the link without blocking.
+        Page events mark the slot ready (DOMContentLoaded) or failed (main navigation request failed).
+        Returns None if `wait` is false and the shared browser has no free page.
+        """
+        page = self._new_page(wait=wait)
+        if page is None:
+            return None
+        self.lean_pages.add(unbound(page))
+        slot = {'page': page, 'index': index, 'link': link,
+                'started': time.monotonic(), 'ready_at': None, 'scrolled': False, 'error': None}
+
+        def on_ready(p):
+            if slot['ready_at'] is None and p.url != "about:blank":
+                slot['ready_at'] = time.monotonic()
+
+        def on_failed(req):
+            # events arrive on the browser thread: compare frames without going through HostBound
+            if slot['error'] is None and req.is_navigation_request() and req.frame.parent_frame is None:
+                slot['error'] = req.failure or "navigation failed"
+
+        try:
+            page.on("domcontentloaded", on_ready)
+            page.on("requestfailed", on_failed)
+            # location.href returns immediately, unlike page.goto which blocks until the page loads
+            page.evaluate("url => { window.location.href = url; }", link['url'])
+        except BaseException:
+            self._close_page(page)
+            raise
+        return slot
+
+    def _deep_read_concurrent(self, links, target=None, on_doc=None):
+        """
+        Concurrent deep-read: keep up to DEEP_READ_CONCURRENCY pages of the shared context loading at once.
+        - A slow or dead site only holds its own slot until DEEP_READ_URL_TIMEOUT expires.
+        - The whole stage is bounded by DEEP_READ_TOTAL_TIMEOUT.
+        - Returns early once `target` (default DEEP_READ_TARGET_DOCS) good documents have been extracted.
+        Docs are returned in crawl order, in the same format as the sequential path.
+        """
+        total = len(links)
+        pending = list(enumerate(links, 1))
+        slots = []
+        results = {}
+        if target is None:
+            target = DEEP_READ_TARGET_DOCS if DEEP_READ_TARGET_DOCS > 0 else total
+        deadline = time.monotonic() + DEEP_READ_TOTAL_TIMEOUT
+
+        def finish(slot, status):
+            loaded = (slot['ready_at'] or time.monotonic()) - slot['started']
+            tracer.record("fetch.browser", loaded, url=slot['link']['url'], status=status.split(" ", 1)[-1])
+            title = slot['link']['title'][:30].strip()
+            print(f"[{slot['index']}/{total}] Read: {title}...{status}{Style.RESET_ALL}")
+            self._close_page(slot['page'])
+            slots.remove(slot)
 
-                    # Simple cleaning and truncation
-                    clean = "\n".join([t.strip() for t in text.split('\n') if len(t.strip()) > 10])
-                    clean = clean[:2500]  # truncate to avoid too long
+        try:
+            while (pending or slots) and len(results) < target:
+                now = time.monotonic()
+                if now > deadline:
+                    print(f"{Fore.LIGHTBLACK_EX}   [-] Deep-read deadline reached, continuing with {len(results)} docs.{Style.RESET_ALL}")
+                    break
 
-                    if len(clean) > 50:
-                        docs.append(f"Source: \"{link['title']}\"\nURL: {link['url']}\nContent: {clean}\n")
-                        print(f"{Fore.GREEN} √{Style.RESET_ALL}")
+                # Fill free slots (on a shared browser, only as far as its page pool allows)
+                while pending and len(slots) < DEEP_READ_CONCURRENCY:
+                    index, link = pending[0]
+                    try:
+                        slot = self._open_slot(index, link, wait=not slots)
+                    except Exception as e:
+                        pending.pop(0)
+                        print(f"[{index}/{total}] Read: {link['title'][:30].strip()}...{Fore.RED} x (open failed: {e}){Style.RESET_ALL}")
+                        continue
+                    if slot is None:
+                        break  # the page pool is full: retry on the next round
+                    pending.pop(0)
+                    slots.append(slot)
+
+                for slot in list(slots):
+                    if slot['error']:
+                        finish(slot, f"{Fore.RED} x (load failed: {slot['error']})")
+                        continue
+                    if slot['ready_at'] is None:
+                        if now - slot['started'] > DEEP_READ_URL_TIMEOUT:
+                            finish(slot, f"{Fore.RED} x (timed out after {DEEP_READ_URL_TIMEOUT}s)")
+                        continue
+                    if not slot['scrolled']:
+                        # Simulate reading scroll, then give lazy content DEEP_READ_SETTLE seconds
+                        try:
+                            slot['page'].mouse.wheel(0, 2000)
+                        except Exception:
+                            pass
+                        slot['scrolled'] = True
+                        continue
+                    if now - slot['ready_at'] < DEEP_READ_SETTLE:
+                        continue
+                    try:
+                        with tracer.span("extract", path="browser"):
+                            text = trafilatura.extract(slot['page'].content()) or slot['page'].inner_text("body", timeout=2000)
+                        doc, clean = self._build_doc(slot['link'], text)
+                    except Exception as e:
+                        finish(slot, f"{Fore.RED} x (extract failed: {e})")
+                        continue
+                    if doc:
+                        results[slot['index']] = doc
+                        if on_doc:
+                            on_doc(slot['link'], clean)
+                        finish(slot, f"{Fore.GREEN} √")
                         print(f"{Fore.LIGHTBLACK_EX}   📝 Summary: {clean[:80].replace(chr(10), ' ')}...{Style.RESET_ALL}")
                     else:
-                        print(f"{Fore.RED} x (content too short or empty){Style.RESET_ALL}")
-                except Exception as e:
-                    print(f"{Fore.RED} x (load or extract failed: {e}){Style.RESET_ALL}")
-                    continue
+                        finish(slot, f"{Fore.RED} x (content too short or empty)")
 
-        except Exception as e:
-            print(f"{Fore.RED}Search exception: {e}{Style.RESET_ALL}")
+                # Yield to Playwright so page events (load, failure) get dispatched
+                if slots:
+                    slots[0]['page'].wait_for_timeout(50)
         finally:
-            page.close()
-        return docs
+            for slot in slots:
+                self._close_page(slot['page'])
+
+        if len(results) >= target and (pending or slots):
+            print(f"{Fore.LIGHTBLACK_EX}   [-] Collected {len(results)} good docs, skipping remaining pages.{Style.RESET_ALL}")
+        return [results[i] for i in sorted(results)]
@@ -0,0 +1,439 @@
+# server.py
+"""
+Multi-session server: ChatAgent over a local HTTP/WebSocket API.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8765] [--no-browser]
+
+API:
+    POST   /sessions                  {"session": optional id} -> {"session": id}
+    POST   /sessions/{id}/messages    {"message": text} -> NDJSON event stream
+    GET    /sessions/{id}/ws          WebSocket: send {"message": text}, receive the same events as JSON frames
+    DELETE /sessions/{id}
+    GET    /stats
+Events: {"type": "token", "text"} | {"type": "revision"} (a revised answer follows) |
+        {"type": "done", "answer", "ms"} | {"type": "error", "error"}
+Messages are handled like console input, so /s, /n, /raw, /zip and /clear work per session.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from aiohttp import web, WSMsgType
+from colorama import init, Fore, Style
+
+from agent import ChatAgent
+from cache import SearchCache
+from memory import HybridMemory
+from providers import ProviderStats
+from search import BrowserHost, SearchEngine
+from tracing import tracer, percentile
+from config import (
+    SERVER_HOST, SERVER_PORT, SERVER_SESSION_DIR_PATH, SERVER_MAX_SESSIONS, SERVER_MAX_INFLIGHT_TURNS,
+    SERVER_LLM_CONCURRENCY, SERVER_MAX_LLM_QUEUE, SERVER_TURN_TIMEOUT, SERVER_SESSION_IDLE_TIMEOUT,
+    SERVER_STREAM_BUFFER, SEARCH_CACHE_ENABLED,
+)
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class TurnCancelled(Exception):
+    """Raised in a turn's worker thread once the turn timed out or its client went away."""
+
+
+class LLMGate:
+    """
+    Admission queue for Ollama: at most `limit` requests run at once and the rest wait. Installed as the
+    `llm_gate` of every session's agent and memory; the wait is traced as the `llm.queue` span.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.slots = threading.Semaphore(limit)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def __enter__(self):
+        t0 = time.perf_counter()
+        with self.lock:
+            self.waiting += 1
+        self.slots.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.active += 1
+        tracer.record("llm.queue", time.perf_counter() - t0)
+        return self
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.active -= 1
+        self.slots.release()
+
+
+class Session:
+    def __init__(self, sid, agent):
+        self.id = sid
+        self.agent = agent
+        self.busy = False  # one turn at a time per session
+        self.cancel = threading.Event()
+        self.turn = None  # pool future of the running turn
+        self.closed = False  # removed from the server: refuse new turns
+        self.last_used = time.monotonic()
+
+
+class ChatServer:
+    """
+    aiohttp application serving one ChatAgent per session. Turns run on a bounded thread pool
+    (SERVER_MAX_INFLIGHT_TURNS); tokens reach the client through a bounded queue. Generation never waits
+    for a slow reader while it holds an LLM slot: tokens the queue cannot take are merged in a per-turn
+    backlog (at most one answer long) that is drained once the model is done.
+    engine_factory: builds each session's SearchEngine (the benchmark passes a mock-backed one).
+    """
+    def __init__(self, engine_factory=SearchEngine, use_browser=True, session_dir=SERVER_SESSION_DIR_PATH):
+        self.engine_factory = engine_factory
+        self.host = BrowserHost() if use_browser else None
+        self.session_dir = session_dir
+        self.cache = SearchCache() if SEARCH_CACHE_ENABLED else None
+        self.provider_stats = ProviderStats()  # latency/yield per search provider, learned across sessions
+        self.sessions = {}
+        self.sessions_lock = asyncio.Lock()
+        self.gate = LLMGate(SERVER_LLM_CONCURRENCY)
+        self.pool = ThreadPoolExecutor(max_workers=SERVER_MAX_INFLIGHT_TURNS, thread_name_prefix="turn")
+        self.inflight = 0
+        self.counters = {'turns': 0, 'rejected': 0, 'timeouts': 0, 'cancelled': 0, 'errors': 0}
+        self.counters_lock = threading.Lock()
+        self.reaper = None
+
+        self.app = web.Application()
+        self.app.add_routes([
+            web.post("/sessions", self.create_session),
+            web.post("/sessions/{sid}/messages", self.post_message),
+            web.get("/sessions/{sid}/ws", self.websocket),
+            web.delete("/sessions/{sid}", self.delete_session),
+            web.get("/stats", self.stats),
+        ])
+        self.app.on_startup.append(self._startup)
+        self.app.on_cleanup.append(self._cleanup)
+
+    def _count(self, key):
+        with self.counters_lock:
+            self.counters[key] += 1
+
+    # --- lifecycle ---
+    async def _startup(self, app):
+        os.makedirs(self.session_dir, exist_ok=True)
+        if self.host:
+            t0 = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, self.host.start)
+            print(f"{Fore.GREEN}>> 🌐 Shared browser started in {time.perf_counter() - t0:.1f}s.{Style.RESET_ALL}")
+        self.reaper = asyncio.create_task(self._reap_idle())
+
+    async def _cleanup(self, app):
+        self.reaper.cancel()
+        loop = asyncio.get_running_loop()
+        sessions = list(self.sessions.values())
+        for session in sessions:
+            session.closed = True
+            session.cancel.set()
+        # a cancelled turn stops at its next token; all of them get one shared deadline
+        running = {s.turn for s in sessions if s.turn and not s.turn.done()}
+        if running:
+            await asyncio.wait(running, timeout=SERVER_TURN_TIMEOUT)
+        for session in sessions:
+            if session.turn and not session.turn.done():
+                continue  # stuck in a model call: its memory and engine are left to the process exit
+            await loop.run_in_executor(None, self._close_session, session)
+        self.sessions.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.host:
+            await loop.run_in_executor(None, self.host.stop)
+        if self.cache:
+            self.cache.close()
+        tracer.close()
+
+    async def _reap_idle(self):
+        """Close sessions that have been idle for SERVER_SESSION_IDLE_TIMEOUT."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(SERVER_SESSION_IDLE_TIMEOUT / 2, 30))
+            now = time.monotonic()
+            for sid, session in list(self.sessions.items()):
+                if not session.busy and now - session.last_used > SERVER_SESSION_IDLE_TIMEOUT:
+                    self.sessions.pop(sid, None)
+                    session.closed = True
+                    await loop.run_in_executor(None, self._close_session, session)
+                    print(f"{Fore.LIGHTBLACK_EX}   💤 Closed idle session {sid}{Style.RESET_ALL}")
+
+    def _open_session(self, sid):
+        memory = HybridMemory(path=os.path.join(self.session_dir, f"{sid}.db"), legacy_path=None)
+        memory.llm_gate = self.gate
+        engine = self.engine_factory()
+        engine.cache = self.cache
+        engine.providers.stats = self.provider_stats
+        engine.start(host=self.host, mode="lazy" if self.host else "off")
+        agent = ChatAgent(memory=memory, searcher=engine)
+        agent.echo = False
+        agent.session = sid
+        agent.llm_gate = self.gate
+        return Session(sid, agent)
+
+    @staticmethod
+    def _close_session(session):
+        memory = session.agent.memory
+        memory.close()  # unfinished summaries stay pending in the journal
+        session.agent.searcher.stop()
+
+    # --- turns ---
+    def _admit(self, session):
+        """Reserve a turn slot, or return (HTTP status, reason) when the turn must be refused."""
+        if session.closed:
+            return 404, "unknown session"
+        if session.busy:
+            return 409, "a turn is already running in this session"
+        if self.inflight >= SERVER_MAX_INFLIGHT_TURNS or self.gate.waiting >= SERVER_MAX_LLM_QUEUE:
+            self._count('rejected')
+            return 503, "server busy, retry later"
+        session.busy = True
+        session.cancel.clear()
+        self.inflight += 1
+        return None
+
+    def _release(self, session):
+        session.busy = False
+        session.last_used = time.monotonic()
+        self.inflight -= 1
+
+    def _turn_worker(self, session, message, events, loop):
+        """Pool thread: run one turn through the agent and push its events onto the turn's queue."""
+        agent = session.agent
+        answers = {}
+        current = []
+        backlog = []  # events the client's queue had no room for, oldest first
+
+        def offer(event):
+            """Put `event` on the queue without waiting for the client. Returns False if it is full."""
+            async def put():
+                try:
+                    events.put_nowait(event)
+                    return True
+                except asyncio.QueueFull:
+                    return False
+            return asyncio.run_coroutine_threadsafe(put(), loop).result()
+
+        def emit(event):
+            future = asyncio.run_coroutine_threadsafe(events.put(event), loop)
+            while True:
+                try:
+                    return future.result(timeout=0.5)
+                except FutureTimeout:  # queue full: the client is reading slowly
+                    if session.cancel.is_set():
+                        future.cancel()
+                        raise TurnCancelled()
+
+        def on_token(label, text):
+            if session.cancel.is_set():
+                raise TurnCancelled()
+            if label not in answers:
+                if answers:
+                    backlog.append({'type': 'revision'})
+                answers[label] = ""
+                current.append(label)
+            answers[label] += text
+            # called while the LLM slot is held: never block on the client here
+            if backlog and backlog[-1]['type'] == 'token':
+                backlog[-1]['text'] += text
+            else:
+                backlog.append({'type': 'token', 'text': text})
+            while backlog and offer(backlog[0]):
+                backlog.pop(0)
+
+        def flush():
+            while backlog:
+                emit(backlog.pop(0))
+
+        agent.on_token = on_token
+        t0 = time.perf_counter()
+        try:
+            agent.handle_input(message)
+            self._count('turns')
+            flush()
+            emit({'type': 'done', 'answer': answers[current[-1]] if current else "",
+                  'ms': round((time.perf_counter() - t0) * 1000, 1)})
+        except TurnCancelled:
+            self._count('cancelled')
+        except Exception as e:
+            self._count('errors')
+            try:
+                flush()
+                emit({'type': 'error', 'error': str(e)})
+            except TurnCancelled:
+                pass
+        finally:
+            agent.on_token = None
+
+    async def _run_turn(self, session, message, send):
+        """Run a reserved turn on the pool and forward its events with `send` until done, error or timeout."""
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue(maxsize=SERVER_STREAM_BUFFER)
+        worker = None
+        finished = False
+        try:
+            worker = session.turn = loop.run_in_executor(self.pool, self._turn_worker, session, message, events, loop)
+            deadline = loop.time() + SERVER_TURN_TIMEOUT
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    self._count('timeouts')
+                    await send({'type': 'error', 'error': f"turn timed out after {SERVER_TURN_TIMEOUT}s"})
+                    break
+                if event['type'] in ('done', 'error'):
+                    finished = True
+                    await worker  # the worker only returns after its last event
+                    await send(event)
+                    break
+                await send(event)
+        finally:
+            if worker is None or finished:
+                self._release(session)
+            else:
+                # timed out or the client left: stop the turn, the slot stays taken until the worker returns
+                session.cancel.set()
+                worker.add_done_callback(lambda _: self._release(session))
+
+    # --- HTTP handlers ---
+    @staticmethod
+    async def _json(request):
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise web.HTTPBadRequest(text="body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="body must be a JSON object")
+        return body
+
+    def _session(self, request):
+        session = self.sessions.get(request.match_info['sid'])
+        if session is None:
+            raise web.HTTPNotFound(text="unknown session")
+        return session
+
+    async def create_session(self, request):
+        body = await self._json(request) if request.can_read_body else {}
+        sid = body.get('session') or secrets.token_hex(8)
+        if not isinstance(sid, str) or not SESSION_ID_RE.match(sid):
+            raise web.HTTPBadRequest(text="session ids use letters, digits, '-' and '_' (max 64)")
+        async with self.sessions_lock:
+            if sid not in self.sessions:
+                if len(self.sessions) >= SERVER_MAX_SESSIONS:
+                    self._count('rejected')
+                    return web.json_response({'error': "too many sessions"}, status=503, headers={'Retry-After': "30"})
+                loop = asyncio.get_running_loop()
+                self.sessions[sid] = await loop.run_in_executor(None, self._open_session, sid)
+        return web.json_response({'session': sid})
+
+    async def delete_session(self, request):
+        session = self._session(request)
+        if session.busy:  # its turn still uses the memory and the engine
+            return web.json_response({'error': "a turn is running in this session"}, status=409,
+                                     headers={'Retry-After': "1"})
+        self.sessions.pop(session.id, None)
+        session.closed = True
+        await asyncio.get_running_loop().run_in_executor(None, self._close_session, session)
+        return web.json_response({'closed': session.id})
+
+    async def post_message(self, request):
+        session = self._session(request)
+        message = str((await self._json(request)).get('message', "")).strip()
+        if not message:
+            raise web.HTTPBadRequest(text="message is empty")
+        refused = self._admit(session)
+        if refused:
+            status, reason = refused
+            return web.json_response({'error': reason}, status=status,
+                                     headers={'Retry-After': "1"} if status == 503 else None)
+
+        response = web.StreamResponse(headers={'Content-Type': "application/x-ndjson"})
+
+        async def send(event):
+            if not response.prepared:
+                await response.prepare(request)
+            await response.write((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+
+        try:
+            await self._run_turn(session, message, send)
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # client went away; the turn was cancelled
+        return response
+
+    async def websocket(self, request):
+        session = self._session(request)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    message = str(json.loads(msg.data).get('message', "")).strip()
+                except (json.JSONDecodeError, AttributeError):
+                    message = msg.data.strip()
+                if not message:
+                    continue
+                refused = self._admit(session)
+                if refused:
+                    await ws.send_json({'type': 'error', 'error': refused[1], 'status': refused[0]})
+                    continue
+                await self._run_turn(session, message, ws.send_json)
+        except ConnectionResetError:
+            pass
+        return ws
+
+    async def stats(self, request):
+        spans = {name: {'count': count, 'p50_ms': round(percentile(recent, 50) * 1000, 1),
+                        'p95_ms': round(percentile(recent, 95) * 1000, 1)}
+                 for name, (count, _, _, recent) in tracer.snapshot().items()}
+        with self.counters_lock:
+            counters = dict(self.counters)
+        with self.provider_stats.lock:
+            providers = {name: dict(s) for name, s in self.provider_stats.data.items()}
+        prefill = {'prompt_tokens_est': 0, 'prompt_eval_count': 0}  # open sessions: estimated prompt vs Ollama's count
+        for session in list(self.sessions.values()):
+            for key in prefill:
+                prefill[key] += session.agent.prefill[key]
+        return web.json_response({
+            'sessions': len(self.sessions),
+            'inflight': self.inflight,
+            'llm': {'limit': self.gate.limit, 'active': self.gate.active, 'waiting': self.gate.waiting},
+            'browser_queue': self.host.jobs.qsize() if self.host else None,
+            'browser_launches': self.host.generation if self.host else None,
+            'counters': counters,
+            'prefill': prefill,
+            'providers': providers,
+            'spans': spans,
+        })
+
+
+def main():
+    init(autoreset=True)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--no-browser", action="store_true",
+                        help="do not start Chromium (searches are then served from the search cache only)")
+    args = parser.parse_args()
+
+    server = ChatServer(use_browser=not args.no_browser)
+    print(f"{Fore.CYAN}=== Smart Online Assistant server on http://{args.host}:{args.port} ==={Style.RESET_ALL}")
+    web.run_app(server.app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
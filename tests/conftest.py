@@ -0,0 +1,8 @@
+# conftest.py
+"""
+The modules live at the repository root and import each other by name
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,110 @@
+# test_browser_host.py
+"""
+Shared browser thread (server mode): bounded waits and the page pool, with Playwright faked out
+"""
+import threading
+import time
+
+import pytest
+
+import search
+from search import BrowserHost, SearchEngine
+from tracing import tracer
+
+
+class FakePlaywright:
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+
+@pytest.fixture
+def host(monkeypatch):
+    monkeypatch.setattr(tracer, 'enabled', False)
+    monkeypatch.setattr(search, 'sync_playwright', FakePlaywright)
+    monkeypatch.setattr(BrowserHost, 'relaunch', lambda self, kind="restart": None)
+    host = BrowserHost(max_pages=2)
+    host.start()
+    yield host
+    host.stop()
+
+
+def engine_on(host):
+    engine = SearchEngine()
+    engine.cache = None
+    engine.host = host
+    engine.context = FakeContext()
+    return engine
+
+
+def test_a_busy_browser_thread_times_out_instead_of_stalling_the_caller(host):
+    release = threading.Event()
+    ran = []
+    busy = host.submit(release.wait, 5)  # another session's long step
+    engine = engine_on(host)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError), engine._within(0.2):
+        engine._call(ran.append, "late")
+    assert time.monotonic() - t0 < 1
+    release.set()
+    busy.result(1)
+    host.call(lambda: None)  # everything queued before has run
+    assert ran == []  # the abandoned step was cancelled, not run late
+
+
+def test_page_pool_is_shared_across_engines(host):
+    first, second = engine_on(host), engine_on(host)
+    pages = [first._new_page(), second._new_page()]
+    assert second._new_page(wait=False) is None
+    with pytest.raises(TimeoutError), second._within(0.1):
+        second._new_page()
+    first._close_page(pages[0])
+    host.call(lambda: None)
+    assert pages[0].closed
+    assert second._new_page(wait=False) is not None
+    assert first.context_pages == 1 and second.context_pages == 2
+
+
+def test_dom_waits_run_in_slices_on_a_shared_browser(host):
+    engine = engine_on(host)
+    timeouts = []
+
+    def wait(ms):
+        timeouts.append(ms)
+        if len(timeouts) < 3:
+            raise search.PlaywrightTimeoutError("not yet")
+
+    assert engine._wait_sliced(wait, 5)
+    assert timeouts == [search.BROWSER_WAIT_SLICE * 1000] * 3
+
+
+def test_sliced_wait_gives_up_at_its_deadline(host):
+    engine = engine_on(host)
+    calls = []
+
+    def never(ms):
+        calls.append(ms)
+        time.sleep(ms / 1000)
+        raise search.PlaywrightTimeoutError("never")
+
+    assert not engine._wait_sliced(never, 0.6)
+    assert 2 <= len(calls) <= 3 and all(0 < ms <= search.BROWSER_WAIT_SLICE * 1000 for ms in calls)
@@ -0,0 +1,78 @@
+# test_cache.py
+"""
+Search cache persistence (one SQLite row per entry)
+"""
+import json
+import time
+
+from cache import SearchCache
+
+
+def make_cache(tmp_path, legacy=None):
+    return SearchCache(path=str(tmp_path / "search_cache.db"), legacy_path=legacy)
+
+
+def test_entries_survive_a_restart_in_lru_order(tmp_path):
+    c = make_cache(tmp_path)
+    c.put_page("https://a", "A")
+    c.put_page("https://b", "B")
+    c.put_links("Some  Query", [{'title': 't', 'url': 'https://a'}])
+    c.save()
+    time.sleep(0.01)
+    assert c.get_page("https://a") == "A"  # a is now the most recently used page
+    c.close()
+
+    c = make_cache(tmp_path)
+    assert list(c.layers['pages']) == ["https://b", "https://a"]
+    assert c.get_links("some query") == [{'title': 't', 'url': 'https://a'}]
+    c.close()
+
+
+def test_save_writes_only_the_changed_entries(tmp_path):
+    c = make_cache(tmp_path)
+    for i in range(50):
+        c.put_page(f"https://p{i}", "x" * 100)
+    c.save()
+    before = c.conn.total_changes
+    c.put_page("https://new", "y")
+    c.save()
+    assert c.conn.total_changes - before == 1
+    c.save()  # nothing pending: no write
+    assert c.conn.total_changes - before == 1
+    c.close()
+
+
+def test_evicted_and_expired_entries_are_deleted(tmp_path):
+    c = make_cache(tmp_path)
+    c.cap['pages'] = 2
+    for url in ("https://1", "https://2", "https://3"):
+        c.put_page(url, url)
+    c.put_links("q", [])
+    c.save()
+    c.ttl['links'] = -1
+    assert c.get_links("q") is None
+    c.close()
+
+    c = make_cache(tmp_path)
+    assert list(c.layers['pages']) == ["https://2", "https://3"]
+    assert not c.layers['links']
+    c.close()
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "search_cache.json"
+    now = time.time()
+    legacy.write_text(json.dumps({
+        'links': {'q': {'t': now, 'v': [{'title': 't', 'url': 'u'}]}},
+        'pages': {'u': {'t': now - 10, 'a': now, 'v': "page"}, 'w': {'t': now - 5, 'v': "other"}},
+    }), encoding='utf-8')
+    c = make_cache(tmp_path, legacy=str(legacy))
+    assert c.get_links("q") == [{'title': 't', 'url': 'u'}]
+    assert list(c.layers['pages']) == ["w", "u"]
+    c.clear()
+    c.close()
+
+    c = make_cache(tmp_path, legacy=str(legacy))  # the database exists now: no second import
+    assert not c.layers['pages']
+    c.close()
+
@@ -0,0 +1,94 @@
+# test_deep_read.py
+"""
+HTTP deep-read on fixture HTML: trafilatura extraction, and the pages handed back to the browser
+"""
+import pytest
+
+from config import DEEP_READ_HTTP_MIN_CHARS, DEEP_READ_TOTAL_TIMEOUT, DOC_MAX_CHARS
+from search import SearchEngine
+from tracing import tracer
+
+PARAGRAPH = ("Bearing faults in induction motors show up as characteristic frequencies in the stator current, "
+             "which makes motor current signature analysis a cheap alternative to vibration sensors. ")
+ARTICLE_HTML = f"""<!DOCTYPE html>
+<html><head><title>Motor current signature analysis</title></head>
+<body>
+<nav><a href="/">Home</a> <a href="/blog">Blog</a></nav>
+<article>
+<h1>Motor current signature analysis</h1>
+{"".join(f"<p>{PARAGRAPH}Section {i} looks at one more fault type.</p>" for i in range(8))}
+</article>
+<footer>Copyright 2024</footer>
+</body></html>""".encode('utf-8')
+SPA_HTML = b"""<!DOCTYPE html>
+<html><head><title>Dashboard</title></head>
+<body><noscript>You need to enable JavaScript to run this app.</noscript><div id="root"></div>
+<script src="/static/js/main.js"></script></body></html>"""
+STUB_HTML = b"""<!DOCTYPE html>
+<html><head><title>Moved</title></head><body><p>This page has moved to a new address.</p></body></html>"""
+
+
+def link(name):
+    return {'title': f"{name} page", 'url': f"http://fixture.test/{name}"}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(tracer, 'enabled', False)
+    engine = SearchEngine()
+    engine.cache = None
+    pages = {'article': ("ok", ARTICLE_HTML), 'spa': ("ok", SPA_HTML), 'stub': ("ok", STUB_HTML),
+             'blocked': ("fallback: HTTP 403", b""), 'missing': ("failed: HTTP 404", b"")}
+    monkeypatch.setattr(engine, '_download', lambda url: pages[url.rsplit("/", 1)[-1]])
+    yield engine
+    engine.providers.close()
+
+
+def test_article_is_read_over_http(engine):
+    status, clean, body = engine._fetch_http(link('article'))
+    assert status == "ok"
+    assert len(clean) >= DEEP_READ_HTTP_MIN_CHARS
+    assert "stator current" in clean
+    assert "Copyright" not in clean  # boilerplate is left out by trafilatura
+    doc, _ = engine._build_doc(link('article'), clean)
+    assert doc.startswith('Source: "article page"\nURL: http://fixture.test/article\nContent: ')
+
+
+@pytest.mark.parametrize("name, status", [
+    ('spa', "fallback: looks JS-rendered"),
+    ('stub', "fallback: text too short"),
+    ('blocked', "fallback: HTTP 403"),
+    ('missing', "failed: HTTP 404"),
+])
+def test_pages_without_enough_text_go_to_the_browser(engine, name, status):
+    assert engine._fetch_http(link(name))[0] == status
+
+
+def test_build_doc_drops_short_text_and_truncates():
+    assert SearchEngine._build_doc(link('article'), "too short")[0] is None
+    doc, clean = SearchEngine._build_doc(link('article'), "\n".join(["a long enough line of page text"] * 1000))
+    assert len(clean) == DOC_MAX_CHARS
+    assert doc.endswith(clean + "\n")
+
+
+def test_deep_read_http_rereads_fallbacks_in_the_browser(engine, monkeypatch):
+    reread = []
+
+    def in_browser(fn, links, target, on_doc=None, within=None):
+        assert 0 < within <= DEEP_READ_TOTAL_TIMEOUT  # the browser gets what is left of the stage's deadline
+        reread.extend(links)
+        return [f"browser doc for {item['url']}" for item in links[:target]]
+
+    monkeypatch.setattr(engine, '_in_browser', in_browser)
+    links = [link('article'), link('spa'), link('missing'), link('blocked')]
+    docs = engine._deep_read_http(links, target=3)
+    assert [item['url'] for item in reread] == [link('spa')['url'], link('blocked')['url']]
+    assert docs[0].startswith('Source: "article page"')
+    assert docs[1:] == ["browser doc for http://fixture.test/spa", "browser doc for http://fixture.test/blocked"]
+    assert engine.fetch_stats == {'http': 1, 'browser': 0, 'failed': 1}
+
+
+def test_deep_read_http_skips_the_browser_once_the_target_is_met(engine, monkeypatch):
+    monkeypatch.setattr(engine, '_in_browser', lambda *a, **kw: pytest.fail("browser should not be used"))
+    docs = engine._deep_read_http([link('article'), link('spa')], target=1)
+    assert len(docs) == 1
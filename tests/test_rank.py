@@ -0,0 +1,65 @@
+# test_rank.py
+"""
+Passage ranking on fixture pages: chunking, near-duplicate removal, BM25 order and the prompt budget
+"""
+from rank import format_doc, parse_doc, rank_docs, split_passages
+
+BEARING = [
+    "The Paderborn bearing dataset records motor current and vibration signals from damaged bearings.",
+    "Artificial damage was made by electric discharge machining, drilling and manual engraving of the bearing rings.",
+    "Real damage comes from accelerated lifetime tests, so the bearing faults grow as they would in service.",
+]
+MENU = ["Home | About | Contact | Subscribe to our newsletter for weekly updates",
+        "Accept all cookies to continue browsing this website and see personalised offers"]
+WEATHER = ["Tomorrow will be sunny with a light breeze in the afternoon and clear skies at night across the region."]
+
+
+def page(name, lines):
+    return format_doc(f"{name} page", f"http://fixture.test/{name}", "\n".join(lines))
+
+
+def contents(ranked):
+    return [parse_doc(doc)[2] for doc in ranked]
+
+
+def test_split_passages_groups_lines_up_to_the_target_size():
+    lines = [f"line {i} " + "x" * 40 for i in range(10)]
+    passages = split_passages("\n\n".join(lines), target_chars=100)
+    assert passages[0].split("\n") == lines[:3]
+    assert "\n".join(passages).split("\n") == lines  # nothing lost or reordered
+    assert all(len(p) >= 100 for p in passages[:-1])
+
+
+def test_relevant_source_ranks_first_and_menus_are_dropped():
+    docs = [page("weather", WEATHER), page("menu", MENU), page("bearing", BEARING)]
+    ranked = rank_docs(docs, "paderborn bearing damage dataset", max_chars=10000)
+    assert [parse_doc(doc)[1] for doc in ranked] == ["http://fixture.test/bearing"]
+
+
+def test_passages_keep_page_order_within_a_source():
+    # lines longer than RANK_PASSAGE_CHARS: one passage each
+    lines = [f"{text} " + " ".join(f"note{n}word{i}" for i in range(50)) for n, text in enumerate(BEARING)]
+    ranked = rank_docs([page("bearing", lines)], "real damage accelerated lifetime electric discharge", max_chars=10000)
+    assert contents(ranked) == ["\n".join(lines[1:])]  # best passage is the last one, but the doc reads in page order
+
+
+def test_near_duplicate_passages_from_mirrors_are_dropped():
+    mirror = BEARING[:2] + [BEARING[2] + " Mirrored from the original site."]
+    docs = [page("bearing", BEARING), page("mirror", mirror)]
+    ranked = rank_docs(docs, "paderborn bearing dataset", max_chars=10000)
+    assert [parse_doc(doc)[1] for doc in ranked] == ["http://fixture.test/bearing"]
+    assert len(rank_docs(docs, "paderborn bearing dataset", max_chars=10000, dedup_threshold=1.01)) == 2
+
+
+def test_top_k_and_char_budget_are_respected():
+    docs = [page(f"copy{i}", [f"Report {i}: " + BEARING[i % 3]]) for i in range(6)]
+    assert sum(len(contents([d])[0].split("\n")) for d in rank_docs(docs, "bearing", top_k=2)) == 2
+    kept = rank_docs(docs, "bearing", max_chars=250)  # passages are 100-125 chars: two fit
+    assert len(kept) == 2
+    assert sum(len(c) for c in contents(kept)) <= 250
+
+
+def test_no_query_overlap_keeps_crawl_order():
+    docs = [page("weather", WEATHER), page("bearing", BEARING)]
+    ranked = rank_docs(docs, "zzz unrelated", max_chars=10000)
+    assert [parse_doc(doc)[1] for doc in ranked][0] == "http://fixture.test/weather"
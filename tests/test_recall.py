@@ -0,0 +1,41 @@
+# test_recall.py
+"""
+Recall over past turns (BM25 on the SQLite journal)
+"""
+import os
+
+import pytest
+
+from memory import HybridMemory
+from tracing import tracer
+
+FILLER = ["how do I boil an egg", "best way to learn french", "tips for running in the rain",
+          "what is a good houseplant", "how to fix a squeaky door", "recommend a board game"]
+
+
+@pytest.fixture
+def memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer, 'enabled', False)
+    memory = HybridMemory(mode='raw', path=os.path.join(tmp_path, "memory.db"), legacy_path=None)
+    yield memory
+    memory.close()
+
+
+def fill(memory, turns, topic_at, topic):
+    for i in range(turns):
+        if i in topic_at:
+            memory._append(f"question {i} about the {topic}", f"answer {i}: notes on the {topic}")
+        else:
+            memory._append(f"question {i}: {FILLER[i % len(FILLER)]}", f"answer {i}: {FILLER[i % len(FILLER)]}")
+
+
+def test_recurring_topic_is_recalled_in_a_short_history(memory):
+    fill(memory, 44, topic_at={3, 9, 15}, topic="paderborn bearing dataset")
+    msgs = memory.recall("tell me again about the paderborn dataset", k=3, window=10)
+    questions = [m['content'] for m in msgs if m['role'] == 'user']
+    assert questions == [f"question {i} about the paderborn bearing dataset" for i in (3, 9, 15)]
+
+
+def test_recent_turns_are_not_recalled(memory):
+    fill(memory, 20, topic_at={17}, topic="paderborn bearing dataset")
+    assert memory.recall("paderborn dataset", k=3, window=10) == []
@@ -0,0 +1,53 @@
+# test_server.py
+"""
+Server turn streaming: a slow reader must not keep the LLM slot of its turn
+"""
+import asyncio
+import threading
+
+from server import ChatServer, Session
+
+
+class ScriptedAgent:
+    """Streams `tokens` inside the LLM gate, like ChatAgent.stream_answer, then an answer revision."""
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.on_token = None
+        self.gate_released = threading.Event()
+
+    def handle_input(self, message):
+        for label in ("AI", "AI (revised)"):
+            for text in self.tokens:
+                self.on_token(label, text)
+        self.gate_released.set()
+
+
+def run_turn(agent, buffer):
+    server = ChatServer.__new__(ChatServer)  # only the counters are used by the turn worker
+    server.counters = {'turns': 0, 'cancelled': 0, 'errors': 0}
+    server.counters_lock = threading.Lock()
+    session = Session("test", agent)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue(maxsize=buffer)
+        worker = loop.run_in_executor(None, server._turn_worker, session, "hi", events, loop)
+        # nobody reads yet: the model must still finish and give its slot back
+        released = await loop.run_in_executor(None, agent.gate_released.wait, 5)
+        received = []
+        while not received or received[-1]['type'] not in ('done', 'error'):
+            received.append(await asyncio.wait_for(events.get(), 5))
+        await worker
+        return released, received
+
+    return asyncio.run(main())
+
+
+def test_slow_reader_does_not_hold_the_llm_slot():
+    agent = ScriptedAgent([f"t{i} " for i in range(200)])
+    released, events = run_turn(agent, buffer=4)
+    assert released
+    text = "".join(e['text'] for e in events if e['type'] == 'token')
+    assert text == "".join(agent.tokens) * 2  # nothing lost, only merged
+    assert [e['type'] for e in events].count('revision') == 1
+    assert events[-1] == {'type': 'done', 'answer': "".join(agent.tokens), 'ms': events[-1]['ms']}
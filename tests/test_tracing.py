@@ -0,0 +1,25 @@
+# test_tracing.py
+"""
+Span aggregates stay bounded in a long-running process
+"""
+from tracing import SpanStats, Tracer
+
+
+def test_span_stats_keep_totals_but_only_a_window_of_durations():
+    stats = SpanStats(window=10)
+    for i in range(1, 1001):
+        stats.add(i / 1000)
+    assert (stats.count, round(stats.total, 3), stats.first, stats.max) == (1000, 500.5, 0.001, 1.0)
+    assert list(stats.recent) == [i / 1000 for i in range(991, 1001)]
+
+
+def test_summary_table_uses_whole_run_counts(tmp_path):
+    tracer = Tracer(path=str(tmp_path / "trace.jsonl"))
+    for _ in range(3):
+        tracer.record("fetch.http", 0.2)
+    tracer.record("turn", 1.5)
+    lines = tracer.summary_table().splitlines()
+    assert lines[1].split()[:3] == ["turn", "1", "1.50"]
+    assert lines[2].split()[:3] == ["fetch.http", "3", "0.60"]
+    assert tracer.first("turn") == 1.5 and tracer.recent("missing") == []
+    tracer.close()
@@ -0,0 +1,162 @@
+# tracing.py
+"""
+Per-turn latency tracing: spans are appended to a JSONL trace file and aggregated for /stats
+"""
+import contextvars
+import functools
+import json
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from config import TRACE_ENABLED, TRACE_FILE_PATH, TRACE_STATS_WINDOW
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+class TurnTrace:
+    """The spans of one turn; `session` names the server session the turn belongs to."""
+    def __init__(self, number, session=None):
+        self.number = number
+        self.session = session
+        self.spans = []  # (span name, seconds, attrs)
+
+
+class SpanStats:
+    """
+    Aggregates of one span name: count, total, first and max since start, plus the latest
+    `window` durations for percentiles, so a long-running server keeps constant memory per name.
+    """
+    def __init__(self, window=TRACE_STATS_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.first = None
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.first is None:
+            self.first = seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+
+_current_turn = contextvars.ContextVar("trace_turn", default=None)
+
+
+class Tracer:
+    """
+    Records named spans (duration + attributes). Each span becomes one JSONL line:
+    {"ts": unix time, "turn": n, "session": id, "span": name, "ms": duration, "thread": name, ...attributes}
+    The current turn lives in a context variable, so concurrent server sessions keep their own turns;
+    work handed to other threads keeps the caller's turn when it is wrapped with bind().
+    """
+    def __init__(self, path=TRACE_FILE_PATH, enabled=TRACE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.stats = {}  # span name -> SpanStats over the process
+        self._file = None
+
+    def begin_turn(self, session=None):
+        """Start a turn in the current context and return its TurnTrace."""
+        with self.lock:
+            self.turns += 1
+            turn = TurnTrace(self.turns, session)
+        _current_turn.set(turn)
+        return turn
+
+    @staticmethod
+    def bind(fn, *args):
+        """Wrap `fn(*args)` to run in a copy of the caller's context, for pool and worker threads."""
+        return functools.partial(contextvars.copy_context().run, fn, *args)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block; the yielded dict can be filled with extra attributes."""
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - t0, **attrs)
+
+    def record(self, name, seconds, **attrs):
+        """Record a span measured elsewhere."""
+        if not self.enabled:
+            return
+        turn = _current_turn.get()
+        event = {'ts': round(time.time(), 3), 'turn': turn.number if turn else None}
+        if turn and turn.session:
+            event['session'] = turn.session
+        event.update({'span': name, 'ms': round(seconds * 1000, 2), 'thread': threading.current_thread().name})
+        event.update(attrs)
+        with self.lock:
+            if name not in self.stats:
+                self.stats[name] = SpanStats()
+            self.stats[name].add(seconds)
+            if turn:
+                turn.spans.append((name, seconds, attrs))
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+            except OSError:
+                pass  # tracing must never break a turn
+
+    def turn_summary(self, turn=None):
+        """One line: total seconds per span name in `turn` (default: the current one), slowest first."""
+        turn = turn or _current_turn.get()
+        with self.lock:
+            totals = defaultdict(float)
+            for name, seconds, _ in (turn.spans if turn else []):
+                totals[name] += seconds
+        return " | ".join(f"{name} {secs:.2f}s" for name, secs in sorted(totals.items(), key=lambda kv: -kv[1]))
+
+    def recent(self, name):
+        """The latest (up to TRACE_STATS_WINDOW) durations of span `name`, oldest first."""
+        with self.lock:
+            stats = self.stats.get(name)
+            return list(stats.recent) if stats else []
+
+    def first(self, name):
+        """Duration of the first `name` span recorded, or None."""
+        with self.lock:
+            stats = self.stats.get(name)
+            return stats.first if stats else None
+
+    def snapshot(self):
+        """{span name: (count, total s, max s, [recent seconds])}, copied under the lock."""
+        with self.lock:
+            return {name: (s.count, s.total, s.max, list(s.recent)) for name, s in self.stats.items()}
+
+    def summary_table(self):
+        """Session table per span name: count, total, mean, p50, p95 (latest spans) and max."""
+        items = sorted(self.snapshot().items(), key=lambda kv: -kv[1][1])
+        lines = [f"{'span':<22}{'count':>7}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, (count, total, longest, recent) in items:
+            lines.append(f"{name:<22}{count:>7}{total:>10.2f}{total / count * 1000:>10.1f}"
+                         f"{percentile(recent, 50) * 1000:>10.1f}{percentile(recent, 95) * 1000:>10.1f}"
+                         f"{longest * 1000:>10.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        with self.lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+tracer = Tracer()